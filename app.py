@@ -25,17 +25,30 @@ REQUIREMENTS:
 
 import streamlit as st
 import pandas as pd
-import cv2
-import numpy as np
-from pyzbar import pyzbar
 import base64
 import io
 from datetime import datetime
+from itertools import islice
 import time
+import uuid
 from streamlit_webrtc import webrtc_streamer, WebRtcMode, RTCConfiguration
 import av
 from typing import Set, List, Dict, Optional
 import PIL.Image
+from scanner_core import (
+    ScanLedger, VALID, DUPLICATE, INVALID,
+    load_manifest, format_stats,
+    draw_barcode_box,
+    classify_detections, DecodeWorker, RoiTracker, luma_view,
+    decode_cascade, CascadeStats, decode_images, result_rows,
+    scan_video, record_video_events, ResultChannel, ScanGate,
+    AdaptiveController, METRICS, serve_metrics, ManifestWatcher, FILTER_REASONS
+)
+from scanner_core.amend import WATCH_ROOT
+from manifest_session import (
+    active_id_filter, manifest_id_filter, manifest_near_miss, open_manifest, restricted_decoder,
+    sync_manifest
+)
 
 # Page configuration
 st.set_page_config(
@@ -50,193 +63,391 @@ def initialize_session_state():
     """Initialize all session state variables"""
     if 'valid_barcodes' not in st.session_state:
         st.session_state.valid_barcodes = set()
-    if 'scanned_barcodes' not in st.session_state:
-        st.session_state.scanned_barcodes = []
+    if 'scan_ledger' not in st.session_state:
+        st.session_state.scan_ledger = ScanLedger()
     if 'last_scanned' not in st.session_state:
         st.session_state.last_scanned = None
     if 'scan_status' not in st.session_state:
         st.session_state.scan_status = None
     if 'file_uploaded' not in st.session_state:
         st.session_state.file_uploaded = False
-# Audio functions
-def get_success_sound():
-    """Generate base64 encoded success sound (simple beep)"""
-    # Simple success sound as base64
-    return "data:audio/wav;base64,UklGRnoGAABXQVZFZm10IBAAAAABAAEAQB8AAEAfAAABAAgAZGF0YQoGAACBhYqFbF1fdJivrJBhNjVgodDbq2EcBj+a2/LDciUFLIHO8tiJNwgZaLvt559NEAxQp+PwtmMcBjiR1/LMeSwFJHfH8N2QQAoUXrTp66hVFApGn+DyvmsdCTGH0fPTgjMGHm7A7+OZSA0PVqzn77BdGAg+ltryxnkpBSl+zPLaizsIGGS57OihUgwLTKXh8bllHgg2jdXzzn0vBSF1xe/glEILElyx5+2qWBUIQ5zd8sFuIAUuhM/z2YU2Bhxqvu7mnEoODlOq5O+zYBoGPJPY88p9KwUme8rx3I4+CRZiturqpVITC0ml4PK8aB4GM4nU8tGAMQYfcsLu45ZFDBFYr+ftrVoXCECY3PLEcSEELIHO8tiJOQcZZ7zs4Z9NEAxPqOPwtmQcBjiS2fHNeSsFJHfH8N2QQAoUXrTp66hVFApGnt/yvmwdCTCG0fPTgzQGHW/A7eSaRw0PVqzl8LJeGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdT0z3wvBSJ0xe/glEILElyx5+2qWRUIQ5zd8sFuIAUug8/y2oU2Bhxqvu3mnEoPDlOq5O+zYRsGPJLZ8sp9KgUme8rx3I4+CRVht+vtpVMSC0mk4PK8aB4GMojU8tGAMQYfccPu45ZFDBFYruftrVwWCECY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHG/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4SC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHG/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4SC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqnl8LJfGQc6lPvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqrl8LJfGQc6ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0X"
+    if 'cascade_stats' not in st.session_state:
+        st.session_state.cascade_stats = CascadeStats()
+    if 'last_upload' not in st.session_state:
+        st.session_state.last_upload = None
+    if 'last_bulk' not in st.session_state:
+        st.session_state.last_bulk = None
+    if 'last_video' not in st.session_state:
+        st.session_state.last_video = None
+    if 'ledger_file' not in st.session_state:
+        st.session_state.ledger_file = None
+    if 'claimed_by' not in st.session_state:
+        st.session_state.claimed_by = None
+    if 'suggestion' not in st.session_state:
+        st.session_state.suggestion = None
+    if 'station' not in st.session_state:
+        st.session_state.station = f"Station {uuid.uuid4().hex[:4].upper()}"
+    if 'manifest_sources' not in st.session_state:
+        st.session_state.manifest_sources = set()
+    if 'amendment' not in st.session_state:
+        st.session_state.amendment = None
+    if 'manifest_watcher' not in st.session_state:
+        st.session_state.manifest_watcher = None
+# Audio feedback: tones are served once from ./static (browser-cached), and
+# each scan only sends a short <audio> tag that points at them.
+# Needs server.enableStaticServing (see .streamlit/config.toml).
+SOUND_URLS = {
+    'success': "app/static/success.wav",
+    'failure': "app/static/failure.wav",
+    'duplicate': "app/static/duplicate.wav",
+}
 
-def get_failure_sound():
-    """Generate base64 encoded failure sound"""
-    return "data:audio/wav;base64,UklGRnoGAABXQVZFZm10IBAAAAABAAEAQB8AAEAfAAABAAgAZGF0YSoGAACFhYqFbF1fdJivrJBhNjVgodDbq2EcBj+a2/LDciUFLIHO8tiJNwgZaLvt559NEAxQp+PwtmMcBjiR1/LMeSwFJHfH8N2QQAoUXrTp66hVFApGn+DyvmsdCTGH0fPTgjMGHm7A7+OZSA0PVqzn77BdGAg+ltryxnkpBSl+zPLaizsIGGS57OihUgwLTKXh8bllHgg2jdXzzn0vBSF1xe/glEILElyx5+2qWBUIQ5zd8sFuIAUuhM/z2YU2Bhxqvu7mnEoODlOq5O+zYBoGPJPY88p9KwUme8rx3I4+CRZiturqpVITC0ml4PK8aB4GM4nU8tGAMQYfcsLu45ZFDBFYr+ftrVoXCECY3PLEcSEELIHO8tiJOQcZZ7zs4Z9NEAxPqOPwtmQcBjiS2fHNeSsFJHfH8N2QQAoUXrTp66hVFApGnt/yvmwdCTCG0fPTgzQGHW/A7eSaRw0PVqzl8LJeGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdT0z3wvBSJ0xe/glEILElyx5+2qWRUIQ5zd8sFuIAUug8/y2oU2Bhxqvu3mnEoPDlOq5O+zYRsGPJLZ8sp9KgUme8rx3I4+CRVht+vtpVMSC0mk4PK8aB4GMojU8tGAMQYfccPu45ZFDBFYruftrVwWCECY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHG/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4SC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHG/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4SC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqrl8LJfGQc9ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqnl8LJfGQc6lPvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0XB0CY3PLEcSEGK4DN8tiIOQcZZ7vs4Z9OEAxOpePxtmQdBTiS2fHNeSsFJHbH8N2QQAoUXrPq66hWFAlFnt/yv2wdCTCG0fPTgzQHHW/A7eSaSQ0PVqrl8LJfGQc6ltvyxnkpBSh+zPDaizsIGGS56+mjUgwLTKXh8bllHgg2jdTy0H4wBiFzxu7glEQKElux5+2qWRUJQprd8sFuIAUug8/y2oU2Bhxqvu3mnEwODVKp5e+zYRsGOpPX8sp9KgUmecnw3Y9ACRVdt+vupl4TC0mk4PK8aB4GMojS89GAMgUfccLt45dGCxFYruftrV0X"
-
-def play_sound(sound_data: str):
-    """Play sound using HTML audio element"""
-    audio_html = f"""
-    <audio autoplay>
-        <source src="{sound_data}" type="audio/wav">
-    </audio>
-    """
-    st.markdown(audio_html, unsafe_allow_html=True)
+def play_sound(sound: str):
+    """Play one of the cached feedback tones ('success', 'failure' or 'duplicate')"""
+    st.markdown(f'<audio autoplay src="{SOUND_URLS[sound]}"></audio>', unsafe_allow_html=True)
 
 # File handling functions
 def load_barcodes_from_file(uploaded_file) -> Set[str]:
     """Load barcodes from uploaded Excel or CSV file"""
     try:
-        # Determine file type and read accordingly
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError("Unsupported file format. Please upload CSV or Excel file.")
-        
-        # Get first column and convert to string set
-        if df.empty:
-            raise ValueError("The uploaded file is empty.")
-        
-        # Check for 'tracking-id' column first, then fall back to first column
-        if 'tracking-id' in df.columns:
-            st.info("✅ Found 'tracking-id' column - using that for barcodes!")
-            barcode_column = df['tracking-id'].dropna().astype(str).str.strip()
-        elif 'tracking_id' in df.columns:
-            st.info("✅ Found 'tracking_id' column - using that for barcodes!")
-            barcode_column = df['tracking_id'].dropna().astype(str).str.strip()
-        elif 'Tracking ID' in df.columns:
-            st.info("✅ Found 'Tracking ID' column - using that for barcodes!")
-            barcode_column = df['Tracking ID'].dropna().astype(str).str.strip()
-        else:
-            st.warning("⚠️ No 'tracking-id' column found - using first column instead")
-            st.info(f"Available columns: {', '.join(df.columns.tolist())}")
-            barcode_column = df.iloc[:, 0].dropna().astype(str).str.strip()
-        
-        barcode_set = set(barcode_column.tolist())
-        
-        # Remove empty strings
-        barcode_set.discard('')
-        
-        return barcode_set
-        
+        manifest = load_manifest(uploaded_file)
     except Exception as e:
         st.error(f"Error reading file: {str(e)}")
         return set()
-
-# Barcode scanning functions
-def detect_barcodes(frame):
-    """Detect and decode barcodes in the given frame"""
-    barcodes = pyzbar.decode(frame)
-    detected_codes = []
     
-    for barcode in barcodes:
-        # Extract barcode data and type
-        barcode_data = barcode.data.decode('utf-8')
-        barcode_type = barcode.type
-        
-        # Get barcode location
-        (x, y, w, h) = barcode.rect
-        
-        detected_codes.append({
-            'data': barcode_data,
-            'type': barcode_type,
-            'location': (x, y, w, h)
-        })
-    
-    return detected_codes
-
-def draw_barcode_box(frame, barcode_info, is_valid=False):
-    """Draw bounding box around detected barcode"""
-    x, y, w, h = barcode_info['location']
-    
-    # Choose color based on validity
-    color = (0, 255, 0) if is_valid else (0, 0, 255)  # Green if valid, Red if invalid
-    
-    # Draw rectangle
-    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+    if manifest.matched:
+        st.info(f"✅ Found '{manifest.column}' column - using that for barcodes!")
+    else:
+        st.warning("⚠️ No 'tracking-id' column found - using first column instead")
+        st.info(f"Available columns: {', '.join(manifest.columns)}")
     
-    # Add text
-    text = f"{barcode_info['data']} ({'✓' if is_valid else '✗'})"
-    cv2.putText(frame, text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    st.caption(f"⏱️ {format_stats(manifest.stats)}")
+    if manifest.stats.get('rejected'):
+        st.warning(f"⚠️ {manifest.stats['rejected']} IDs were in scientific notation (like 1.23E+16) and "
+                   f"were skipped - format the tracking ID column as text and export again")
     
-    return frame
+    return manifest.barcodes
+
+# Watched manifest folder
+WATCH_SECONDS = 5.0
+
+def manifest_watch():
+    """Apply new or amended manifests saved to the watched folder"""
+    path = st.session_state.get('watch_path', '').strip()
+    if not path:
+        return
+    watcher = st.session_state.manifest_watcher
+    if watcher is None or watcher.path != path:
+        try:
+            watcher = st.session_state.manifest_watcher = ManifestWatcher(path)
+        except ValueError as e:  # outside the server's watch root
+            st.error(f"❌ {e}")
+            return
+    found = watcher.poll()
+    if watcher.error:
+        st.error(f"Error reading watched manifest {watcher.error}")
+    if found is None:
+        st.caption(f"👀 Watching {watcher.current() or path}")
+        return
+    source, manifest = found
+    # Fragment reruns skip main(): take up other stations' amendments before applying this one
+    sync_manifest()
+    open_manifest(source, manifest.barcodes)
+    st.rerun()
+
+def show_amendment():
+    """What the last amended manifest changed, and scanned parcels it withdrew"""
+    delta = st.session_state.amendment
+    if delta is None:
+        return
+    st.info(f"📝 Amended list applied: {delta.summary()} - scan progress kept")
+    if delta.withdrawn:
+        st.warning("⚠️ Scanned but withdrawn from the list - pull these parcels: "
+                   + ", ".join(delta.withdrawn[:20])
+                   + (f" … and {len(delta.withdrawn) - 20} more" if len(delta.withdrawn) > 20 else ""))
 
 # WebRTC callback class
 class BarcodeProcessor:
     def __init__(self):
-        self.last_scan_time = 0
-        self.scan_cooldown = 1.5  # Reduced from 2.0 for faster response
         self.frame_count = 0
-        self.process_every_n_frames = 3  # Process every 3rd frame to reduce lag
-    
-    def recv(self, frame):
-        img = frame.to_ndarray(format="bgr24")
+        self.process_every_n_frames = 1  # set by the controller below
+        self.overlay_ttl = 0.5  # Seconds to keep drawing the last boxes
+        self.overlay = []
+        self.overlay_time = 0
         
-        # Skip frames to improve performance
-        self.frame_count += 1
-        if self.frame_count % self.process_every_n_frames != 0:
-            return av.VideoFrame.from_ndarray(img, format="bgr24")
+        # Decode only around the last barcode while it stays in view
+        self.tracker = RoiTracker()
         
-        # Only process every few frames to improve performance
+        # Adjusts frame-skip and analysis width to hold a target latency
+        self.controller = AdaptiveController()
+        
+        # Per-code repeat suppression (and optional K-of-M confirmation)
+        self.gate = ScanGate(ttl=1.5, consensus=2, window=3)
+        
+        # Set by the script on every run; worker threads never touch st.session_state
+        self.valid_barcodes = set()
+        self.ledger = None
+        self.station = None
+        self.near_miss = None
+        self.channel = ResultChannel()
+        
+        # Decode off the WebRTC thread; newest frame wins, stale ones are dropped
+        self.worker = DecodeWorker(on_result=self.handle_detections, decode=self.tracker)
+    
+    def handle_detections(self, detected_barcodes, submitted_at):
+        """Classify decoded barcodes (runs on the decode worker thread)"""
         current_time = time.time()
-        if current_time - self.last_scan_time > self.scan_cooldown:
-            # Resize frame for faster processing (reduces resolution but improves speed)
-            height, width = img.shape[:2]
-            if width > 640:  # Only resize if larger than 640px
-                scale = 640 / width
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                img_small = cv2.resize(img, (new_width, new_height))
-            else:
-                img_small = img
-            
-            # Detect barcodes on smaller image
-            detected_barcodes = detect_barcodes(img_small)
-            
-            # Scale back coordinates if we resized
-            if width > 640:
-                for barcode_info in detected_barcodes:
-                    x, y, w, h = barcode_info['location']
-                    barcode_info['location'] = (
-                        int(x / scale), int(y / scale), 
-                        int(w / scale), int(h / scale)
-                    )
+        latency = time.perf_counter() - submitted_at
+        METRICS.observe('latency', latency)
+        METRICS.inc('decodes')
+        METRICS.set('frames_dropped', self.worker.dropped)
+        if detected_barcodes:
+            METRICS.inc('hits')
+        if self.controller.observe(latency, bool(detected_barcodes)):
+            self.tracker.max_width = self.controller.width
+            self.process_every_n_frames = self.controller.skip
+        if self.ledger is None:
+            return
+        
+        # Only codes that aren't repeats (and have enough reads) become scans
+        new_scans = self.gate(detected_barcodes, current_time)
+        if new_scans:
+            # Classify and record each scan (O(1) duplicate check)
+            start = time.perf_counter()
+            classify_detections(new_scans, self.valid_barcodes, self.ledger,
+                                station=self.station, near_miss=self.near_miss)
+            METRICS.observe('classify', time.perf_counter() - start)
+            METRICS.inc('scans', len(new_scans))
             
+            # Publish results for the script's status panel
+            for barcode_info in new_scans:
+                self.channel.put({
+                    'barcode': barcode_info['data'],
+                    'status': barcode_info['status'],
+                    'claimed_by': barcode_info.get('claimed_by'),
+                    'suggestion': barcode_info.get('suggestion'),
+                    'timestamp': current_time
+                })
+        
+        if detected_barcodes:
+            # Boxes for repeats are coloured by their current status, without recording
             for barcode_info in detected_barcodes:
-                barcode_data = barcode_info['data']
-                
-                # Check if barcode is valid
-                if (barcode_data in st.session_state.valid_barcodes and 
-                    barcode_data not in [scan['barcode'] for scan in st.session_state.scanned_barcodes]):
-                    
-                    # Valid and new barcode
-                    st.session_state.scanned_barcodes.append({
-                        'barcode': barcode_data,
-                        'timestamp': datetime.now(),
-                        'status': 'Valid'
-                    })
-                    st.session_state.scan_status = 'success'
-                    st.session_state.last_scanned = barcode_data
-                    self.last_scan_time = current_time
-                    
-                elif barcode_data in st.session_state.valid_barcodes:
-                    # Already scanned
-                    st.session_state.scan_status = 'duplicate'
-                    st.session_state.last_scanned = barcode_data
-                    self.last_scan_time = current_time
-                    
-                else:
-                    # Invalid barcode
-                    st.session_state.scan_status = 'invalid'
-                    st.session_state.last_scanned = barcode_data
-                    self.last_scan_time = current_time
-                
-                # Draw bounding box on original resolution image
-                is_valid = barcode_data in st.session_state.valid_barcodes
-                img = draw_barcode_box(img, barcode_info, is_valid)
+                if 'status' not in barcode_info:
+                    barcode_info['status'] = self.ledger.classify(barcode_info['data'], self.valid_barcodes)
+            self.overlay = detected_barcodes
+            self.overlay_time = current_time
+    
+    def recv(self, frame):
+        # Skip frames to improve performance
+        self.frame_count += 1
+        METRICS.inc('frames_in')
+        current_time = time.time()
+        if self.frame_count % self.process_every_n_frames == 0:
+            # Hand the Y plane (a view, no copy) to the decode worker and return immediately
+            start = time.perf_counter()
+            self.worker.submit(luma_view(frame))
+            METRICS.observe('luma_submit', time.perf_counter() - start)
+            METRICS.inc('frames_processed')
+            METRICS.set('decode_queue_depth', self.worker.depth)
+        
+        # Frames without an overlay go back untouched
+        if current_time - self.overlay_time >= self.overlay_ttl:
+            return frame
+        
+        # Convert to BGR only when there are fresh boxes to draw
+        start = time.perf_counter()
+        img = frame.to_ndarray(format="bgr24")
+        METRICS.observe('to_ndarray', time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        for barcode_info in self.overlay:
+            img = draw_barcode_box(img, barcode_info, barcode_info['status'] != INVALID)
+        METRICS.observe('draw', time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        output = av.VideoFrame.from_ndarray(img, format="bgr24")
+        METRICS.observe('from_ndarray', time.perf_counter() - start)
+        return output
+    
+    def on_ended(self):
+        self.worker.stop()
+
+# Live scan confirmation: label -> (reads needed, within frames)
+CONSENSUS_OPTIONS = {
+    "1 read (instant)": (1, 1),
+    "2 reads in 3 frames": (2, 3),
+    "3 reads in 5 frames": (3, 5),
+}
+
+# Camera capture constraints; changing the preset renegotiates the stream
+CAPTURE_PRESETS = {
+    "Standard (640x480, 15 fps)": {
+        "width": {"ideal": 640, "max": 1280},
+        "height": {"ideal": 480, "max": 720},
+        "frameRate": {"ideal": 15, "max": 30}
+    },
+    "HD (1280x720, 30 fps)": {
+        "width": {"ideal": 1280},
+        "height": {"ideal": 720},
+        "frameRate": {"ideal": 30}
+    },
+    "Low (320x240, 10 fps)": {
+        "width": {"ideal": 320, "max": 640},
+        "height": {"ideal": 240, "max": 480},
+        "frameRate": {"ideal": 10, "max": 15}
+    },
+}
+
+# Scan history page size
+HISTORY_PAGE_SIZE = 200
+
+# Scan status panel
+STATUS_EVENTS = {VALID: 'success', DUPLICATE: 'duplicate', INVALID: 'invalid'}
+STATUS_REFRESH_SECONDS = 0.5
+
+def scan_status_panel():
+    """Show the latest scan result and progress (reruns on its own timer in live mode)"""
+    # Pick up results published by the live camera's decode worker
+    channel = st.session_state.live_channel
+    if channel is not None:
+        for event in channel.drain():
+            st.session_state.scan_status = STATUS_EVENTS[event['status']]
+            st.session_state.last_scanned = event['barcode']
+            st.session_state.claimed_by = event['claimed_by']
+            st.session_state.suggestion = event['suggestion']
+    
+    # Status display
+    status_placeholder = st.empty()
+    
+    # Handle scan status
+    if st.session_state.scan_status == 'success':
+        with status_placeholder.container():
+            st.success(f"✅ Valid Barcode Scanned!")
+            st.code(st.session_state.last_scanned)
+            st.balloons()
+            # Play success sound
+            play_sound('success')
+        # Reset status after showing
+        st.session_state.scan_status = None
+        
+    elif st.session_state.scan_status == 'invalid':
+        with status_placeholder.container():
+            st.error(f"❌ Invalid Barcode!")
+            st.code(st.session_state.last_scanned)
+            if st.session_state.suggestion:
+                st.info(f"🔁 Closest on the list: {st.session_state.suggestion} - likely a misread, rescan")
+            # Play failure sound
+            play_sound('failure')
+        # Reset status after showing
+        st.session_state.scan_status = None
         
-        return av.VideoFrame.from_ndarray(img, format="bgr24")
+    elif st.session_state.scan_status == 'duplicate':
+        with status_placeholder.container():
+            claimed_by = st.session_state.claimed_by
+            st.warning(f"⚠️ Already Scanned{f' at {claimed_by}' if claimed_by else ''}!")
+            st.code(st.session_state.last_scanned)
+            play_sound('duplicate')
+        # Reset status after showing
+        st.session_state.scan_status = None
+    
+    # Live decode settings chosen by the adaptive controller
+    controller = st.session_state.live_controller
+    if controller is not None and controller.samples:
+        settings = controller.settings()
+        st.caption(f"⚙️ Analysing {settings['width']} px, every {settings['skip']} frame(s) - "
+                   f"{settings['latency_ms']:.0f} ms latency (target {settings['target_ms']:.0f} ms), "
+                   f"{settings['hit_rate']:.0%} frames with a barcode")
+        if controller.saturated:
+            st.caption("🐢 Still over target at the lowest settings - try the Low camera capture")
+    
+    # Frames the decode worker failed on (details in the server log)
+    worker = st.session_state.live_worker
+    if worker is not None and worker.last_error:
+        st.caption(f"🛑 {worker.errors} frame(s) failed to decode - last: {worker.last_error}")
+    
+    # Scan history that can't be saved to the database (retried in the background)
+    store = st.session_state.scan_ledger.store
+    if store is not None and store.last_error:
+        st.error(f"💾 Scans aren't being saved ({store.pending} waiting): {store.last_error}")
+    
+    # Statistics
+    if st.session_state.file_uploaded:
+        st.markdown("### 📈 Statistics")
+        total_valid = len(st.session_state.valid_barcodes)
+        # Scans of IDs withdrawn by an amended list don't count towards progress
+        total_scanned = st.session_state.scan_ledger.on_list_count
+        withdrawn = st.session_state.scan_ledger.valid_count - total_scanned
+        progress = (total_scanned / total_valid) * 100 if total_valid > 0 else 0
+        
+        st.metric("Total Valid Barcodes", total_valid)
+        st.metric("Scanned", total_scanned)
+        st.metric("Progress", f"{progress:.1f}%")
+        
+        # Progress bar
+        st.progress(progress / 100)
+        if withdrawn:
+            st.caption(f"⚠️ {withdrawn} scanned parcel(s) withdrawn from the list")
+        
+        # Every station scanning this manifest shares the ledger
+        station_counts = st.session_state.scan_ledger.station_counts()
+        if len(station_counts) > 1:
+            st.caption(" · ".join(
+                f"{station or 'Unnamed'}: {counts[VALID]}"
+                for station, counts in sorted(station_counts.items(), key=lambda item: str(item[0]))
+            ))
+
+# Diagnostics panel
+DIAGNOSTICS_REFRESH_SECONDS = 2.0
+METRICS_PORT = 9464
+
+def diagnostics_panel():
+    """Per-stage timings and pipeline counters from the live path"""
+    st.markdown("### 🩺 Diagnostics")
+    if not METRICS.enabled:
+        st.caption("Measuring is off on this server (SCANNER_METRICS=1 turns it on at startup)")
+        if st.button("▶ Start measuring", help="Times the live path for every station and the /metrics endpoint"):
+            METRICS.enabled = True
+            st.rerun()
+        return
+    if st.button("⏹ Stop measuring", help="Stops timing the live path for every station"):
+        METRICS.enabled = False
+        st.rerun()
+    rows = METRICS.stage_rows()
+    if not rows:
+        st.caption("No live frames measured yet - start the camera")
+        return
+    
+    st.dataframe(
+        pd.DataFrame(rows),
+        column_config={
+            'stage': 'Stage',
+            'count': 'Count',
+            'mean_ms': st.column_config.NumberColumn('Mean ms', format="%.2f"),
+            'p50_ms': st.column_config.NumberColumn('p50 ms', format="%.2f"),
+            'p95_ms': st.column_config.NumberColumn('p95 ms', format="%.2f"),
+            'p99_ms': st.column_config.NumberColumn('p99 ms', format="%.2f"),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    counters = METRICS.totals()
+    st.caption(" · ".join(f"{name}: {value:,}" for name, value in sorted(counters.items())))
+    
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.download_button("📥 CSV", METRICS.to_csv(), file_name="scanner_metrics.csv", mime="text/csv")
+    with col_b:
+        if st.button("↺ Reset"):
+            METRICS.reset()
 
 # Main application
 def main():
     # Initialize session state
     initialize_session_state()
+    sync_manifest()
+    st.session_state.live_channel = None
+    st.session_state.live_controller = None
+    st.session_state.live_worker = None
     
     # Header
     st.title("📱 Barcode Scanner App")
@@ -250,44 +461,73 @@ def main():
     with st.sidebar:
         st.header("📁 Upload Barcode List")
         
+        st.text_input("🚪 Station", key='station',
+                      help="Name shown to other stations scanning the same list")
+        
         uploaded_file = st.file_uploader(
             "Choose Excel or CSV file",
             type=['xlsx', 'xls', 'csv'],
             help="Upload file with 'tracking-id' column or barcodes in first column"
         )
         
-        if uploaded_file is not None:
+        # Each upload is parsed once; uploading an amended list applies it as a delta
+        if uploaded_file is not None and uploaded_file.file_id not in st.session_state.manifest_sources:
             with st.spinner("Loading barcodes..."):
                 valid_barcodes = load_barcodes_from_file(uploaded_file)
                 
             if valid_barcodes:
-                st.session_state.valid_barcodes = valid_barcodes
-                st.session_state.file_uploaded = True
-                st.success(f"✅ Loaded {len(valid_barcodes)} valid barcodes!")
-                
-                # Show first few barcodes as preview
-                with st.expander("Preview loaded barcodes"):
-                    preview_list = list(valid_barcodes)[:10]
-                    for i, barcode in enumerate(preview_list, 1):
-                        st.text(f"{i}. {barcode}")
-                    if len(valid_barcodes) > 10:
-                        st.text(f"... and {len(valid_barcodes) - 10} more")
+                open_manifest(uploaded_file.file_id, valid_barcodes)
+        
+        st.text_input("📂 Watch folder", key='watch_path', disabled=WATCH_ROOT is None,
+                      help="Folder (or file) the carrier's amended manifests are saved to - the newest "
+                           "is loaded, and each change applied, automatically. Relative to "
+                           + (WATCH_ROOT or "the SCANNER_WATCH_ROOT folder, which isn't set on this server"))
+        st.fragment(manifest_watch, run_every=WATCH_SECONDS if st.session_state.watch_path.strip() else None)()
+        
+        if st.session_state.file_uploaded:
+            valid_barcodes = st.session_state.valid_barcodes
+            show_amendment()
+            st.success(f"✅ Loaded {len(valid_barcodes)} valid barcodes!")
+            
+            # Skip symbologies and payloads that can't be on this list
+            id_filter = manifest_id_filter()
+            if st.toggle("🔎 Only read tracking-ID barcodes", value=True, key='restrict_decode',
+                         help="Ignore QR, SKU and postal codes that can't match the list - faster "
+                              "decoding and no invalid-scan noise. Reads failing the IDs' check digit "
+                              "are re-read instead of reported (in live mode they never show a closest "
+                              "ID). Turn off to read every code.") and id_filter is not None:
+                shapes = id_filter.describe()
+                st.caption(f"Reading {', '.join(id_filter.symbologies)} · IDs like "
+                           f"{'; '.join(shapes[:3])}{' …' if len(shapes) > 3 else ''}")
+            
+            # Show first few barcodes as preview
+            with st.expander("Preview loaded barcodes"):
+                preview_list = list(islice(valid_barcodes, 10))
+                for i, barcode in enumerate(preview_list, 1):
+                    st.text(f"{i}. {barcode}")
+                if len(valid_barcodes) > 10:
+                    st.text(f"... and {len(valid_barcodes) - 10} more")
         
         st.markdown("---")
         
         # Controls
         st.header("🎛️ Controls")
         
-        if st.button("🗑️ Clear Scan History", type="secondary"):
-            st.session_state.scanned_barcodes = []
-            st.session_state.scan_status = None
-            st.session_state.last_scanned = None
-            st.success("History cleared!")
+        # The ledger is shared: clearing it wipes every station's scans, so ask first
+        with st.popover("🗑️ Clear Scan History"):
+            stations = len(st.session_state.scan_ledger.station_counts())
+            st.warning(f"⚠️ This deletes all {len(st.session_state.scan_ledger)} scans of this manifest "
+                       f"for every station ({stations} so far), including the saved history.")
+            if st.button("Yes, clear for everyone", type="primary", key="confirm_clear"):
+                st.session_state.scan_ledger.clear()
+                st.session_state.scan_status = None
+                st.session_state.last_scanned = None
+                st.success("History cleared!")
         
         # Export functionality
-        if st.session_state.scanned_barcodes:
+        if len(st.session_state.scan_ledger):
             if st.button("📥 Export Scanned Barcodes", type="secondary"):
-                df_export = pd.DataFrame(st.session_state.scanned_barcodes)
+                df_export = pd.DataFrame(st.session_state.scan_ledger.snapshot())
                 csv = df_export.to_csv(index=False)
                 st.download_button(
                     label="Download CSV",
@@ -295,6 +535,17 @@ def main():
                     file_name=f"scanned_barcodes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv"
                 )
+        
+        # Hot-path instrumentation: measuring is one server-wide switch (see
+        # diagnostics_panel); this toggle only shows the panel on this station
+        st.toggle("🩺 Diagnostics", key='show_diagnostics',
+                  help="Show per-stage timings of the live pipeline")
+        if METRICS.enabled:
+            try:
+                port = serve_metrics(port=METRICS_PORT)
+                st.caption(f"Prometheus: http://localhost:{port}/metrics · CSV: /metrics.csv")
+            except OSError as e:
+                st.caption(f"⚠️ Metrics endpoint unavailable: {e}")
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -318,7 +569,7 @@ def main():
                 # Desktop: Show both options
                 scan_mode = st.radio(
                     "Choose scanning method:",
-                    ["📷 Live Camera", "📁 Upload Image"],
+                    ["📷 Live Camera", "📁 Upload Image", "📚 Bulk Upload", "🎞️ Video File"],
                     horizontal=True,
                     help="Live camera works best on desktop. Use image upload for mobile."
                 )
@@ -348,41 +599,177 @@ def main():
                     image = PIL.Image.open(uploaded_image)
                     st.image(image, caption="Uploaded Image", use_column_width=True)
                     
-                    # Convert PIL image to cv2 format
-                    import numpy as np
-                    opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+                    # Detect barcodes with the fallback cascade (once per upload)
+                    cached = st.session_state.last_upload
+                    if cached and cached[0] == uploaded_image.file_id:
+                        result = cached[1]
+                    else:
+                        with st.spinner("Scanning image for barcodes..."):
+                            result = decode_cascade(image, decode=restricted_decoder())
+                            id_filter = active_id_filter()
+                            if id_filter is not None and not result['detections']:
+                                result['filtered'] = id_filter.explain(image)
+                        st.session_state.cascade_stats.add(result)
+                        st.session_state.last_upload = (uploaded_image.file_id, result)
+                    detected_barcodes = result['detections']
                     
-                    # Detect barcodes in uploaded image
-                    with st.spinner("Scanning image for barcodes..."):
-                        detected_barcodes = detect_barcodes(opencv_image)
-                        
                     if detected_barcodes:
+                        st.caption(f"🔎 Found at stage '{result['stage']}' in {result['elapsed'] * 1000:.0f} ms")
+                        
+                        # Classify and record each scan (O(1) duplicate check)
+                        classify_detections(
+                            detected_barcodes,
+                            st.session_state.valid_barcodes,
+                            st.session_state.scan_ledger,
+                            source=uploaded_image.file_id,
+                            station=st.session_state.station,
+                            near_miss=manifest_near_miss()
+                        )
+                        
                         for barcode_info in detected_barcodes:
                             barcode_data = barcode_info['data']
+                            status = barcode_info['status']
                             
-                            # Check if barcode is valid
-                            if (barcode_data in st.session_state.valid_barcodes and 
-                                barcode_data not in [scan['barcode'] for scan in st.session_state.scanned_barcodes]):
-                                
-                                # Valid and new barcode
-                                st.session_state.scanned_barcodes.append({
-                                    'barcode': barcode_data,
-                                    'timestamp': datetime.now(),
-                                    'status': 'Valid'
-                                })
+                            if status == VALID:
                                 st.success(f"✅ Valid barcode found: {barcode_data}")
                                 st.balloons()
-                                play_sound(get_success_sound())
+                                play_sound('success')
                                 
-                            elif barcode_data in st.session_state.valid_barcodes:
-                                st.warning(f"⚠️ Already scanned: {barcode_data}")
+                            elif status == DUPLICATE:
+                                st.warning(f"⚠️ Already scanned: {barcode_data}"
+                                           f"{' at ' + barcode_info['claimed_by'] if barcode_info['claimed_by'] else ''}")
+                                play_sound('duplicate')
                                 
                             else:
                                 st.error(f"❌ Invalid barcode: {barcode_data}")
-                                play_sound(get_failure_sound())
+                                if barcode_info.get('suggestion'):
+                                    st.info(f"🔁 Closest on the list: {barcode_info['suggestion']}")
+                                play_sound('failure')
+                    elif result.get('filtered'):
+                        # Codes were read, just none that can be a tracking ID on this list
+                        st.warning("⚠️ No tracking-ID barcode - the list filter skipped these codes:")
+                        for barcode_info in result['filtered']:
+                            st.text(f"{barcode_info['data']} ({barcode_info['type']}): "
+                                    f"{FILTER_REASONS[barcode_info['filtered']]}")
+                            if barcode_info.get('suggestion'):
+                                st.info(f"🔁 Closest on the list: {barcode_info['suggestion']} - rescan")
+                        st.caption("Turn off '🔎 Only read tracking-ID barcodes' in the sidebar to scan them anyway")
                     else:
                         st.error("❌ No barcodes detected in the image")
+                        st.caption(f"🔎 Tried {len(result['attempts'])} stages in {result['elapsed'] * 1000:.0f} ms")
                         st.info("💡 Try: Better lighting, clearer image, different angle")
+                    
+                    # Which cascade stages are paying off this session
+                    stats = st.session_state.cascade_stats
+                    with st.expander("🔬 Decode cascade statistics"):
+                        st.caption(f"{stats.images} images, first-stage hit rate "
+                                   f"{stats.first_hit_rate * 100:.0f}%, mean {stats.mean_latency * 1000:.0f} ms")
+                        st.dataframe(pd.DataFrame(stats.rows()), use_container_width=True, hide_index=True)
+                
+            elif scan_mode == "📚 Bulk Upload":
+                st.subheader("📚 Bulk Image Upload")
+                st.markdown("Select all photos of a pallet at once - they are decoded in parallel on every CPU core.")
+                
+                uploaded_images = st.file_uploader(
+                    "Choose images with barcodes",
+                    type=['png', 'jpg', 'jpeg', 'bmp'],
+                    accept_multiple_files=True,
+                    help="Select 50-200 label photos in one go"
+                )
+                
+                if uploaded_images:
+                    # Decode each batch once; reruns reuse the results
+                    batch_key = tuple(f.file_id for f in uploaded_images)
+                    cached = st.session_state.last_bulk
+                    if cached and cached[0] == batch_key:
+                        rows, elapsed = cached[1], cached[2]
+                    else:
+                        rows = []
+                        total = len(uploaded_images)
+                        progress_bar = st.progress(0.0)
+                        counter = st.empty()
+                        start = time.perf_counter()
+                        sources = ((f, f.getvalue()) for f in uploaded_images)
+                        
+                        # Stream results into the ledger as each image completes
+                        for done, (image_file, result) in enumerate(decode_images(sources, id_filter=active_id_filter()), 1):
+                            classify_detections(
+                                result['detections'],
+                                st.session_state.valid_barcodes,
+                                st.session_state.scan_ledger,
+                                source=image_file.file_id,
+                                station=st.session_state.station,
+                                near_miss=manifest_near_miss()
+                            )
+                            rows.extend(result_rows(image_file.name, result))
+                            elapsed = time.perf_counter() - start
+                            progress_bar.progress(done / total)
+                            counter.text(f"🔍 {done}/{total} images - {done / elapsed:.1f} images/sec")
+                        
+                        st.session_state.last_bulk = (batch_key, rows, elapsed)
+                    
+                    df_bulk = pd.DataFrame(rows)
+                    status_counts = df_bulk['status'].value_counts()
+                    col_a, col_b, col_c, col_d = st.columns(4)
+                    col_a.metric("🖼️ Images", len(uploaded_images))
+                    col_b.metric("✅ Valid", int(status_counts.get(VALID, 0)))
+                    col_c.metric("❌ Invalid", int(status_counts.get(INVALID, 0)))
+                    col_d.metric("⚡ Images/sec", f"{len(uploaded_images) / elapsed:.1f}" if elapsed else "-")
+                    st.dataframe(df_bulk, use_container_width=True, hide_index=True)
+                
+            elif scan_mode == "🎞️ Video File":
+                st.subheader("🎞️ Reconcile a Recorded Video")
+                st.markdown("Upload a conveyor recording - repeated reads of the same parcel count as one scan.")
+                
+                uploaded_video = st.file_uploader(
+                    "Choose a video file",
+                    type=['mp4', 'mov', 'mkv', 'avi'],
+                    help="Recorded station camera footage"
+                )
+                stride = st.slider("Decode every Nth frame", 1, 10, 2,
+                                   help="Higher is faster; keep it low for fast-moving conveyors")
+                
+                if uploaded_video is not None:
+                    # Ingest each video once; reruns reuse the results
+                    cached = st.session_state.last_video
+                    if cached and cached[0] == (uploaded_video.file_id, stride):
+                        result = cached[1]
+                    else:
+                        progress_bar = st.progress(0.0)
+                        
+                        def show_progress(seconds, duration):
+                            if duration:
+                                progress_bar.progress(min(seconds / duration, 1.0))
+                        
+                        tracker = RoiTracker()
+                        tracker.id_filter = active_id_filter()
+                        with st.spinner("Decoding video..."):
+                            result = scan_video(uploaded_video, stride=stride, decode=tracker,
+                                                progress=show_progress)
+                        progress_bar.progress(1.0)
+                        record_video_events(result, st.session_state.valid_barcodes, st.session_state.scan_ledger,
+                                            station=st.session_state.station, source=uploaded_video.file_id)
+                        st.session_state.last_video = ((uploaded_video.file_id, stride), result)
+                    
+                    st.caption(f"⏱️ {result['frames']} frames, {result['video_seconds']:.1f}s of video in "
+                               f"{result['elapsed']:.1f}s ({result['speed']:.1f}x real time)")
+                    if result['events']:
+                        df_video = pd.DataFrame(result['events'])
+                        st.dataframe(
+                            df_video[['first_seen', 'last_seen', 'barcode', 'type', 'reads', 'status']],
+                            column_config={
+                                'first_seen': st.column_config.NumberColumn('First Seen (s)', format="%.2f"),
+                                'last_seen': st.column_config.NumberColumn('Last Seen (s)', format="%.2f"),
+                                'barcode': 'Barcode',
+                                'type': 'Type',
+                                'reads': 'Reads',
+                                'status': 'Status'
+                            },
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    else:
+                        st.error("❌ No barcodes detected in the video")
                 
             else:  # Live Camera mode - Desktop only
                 st.subheader("📷 Live Camera Scanning")
@@ -390,6 +777,27 @@ def main():
                 # Warning for mobile users who somehow get here
                 st.info("💻 **Desktop Camera Mode** - For best results use a desktop/laptop")
                 
+                # Scan acceptance: per-code repeat window and optional multi-frame confirmation
+                col_a, col_b, col_c = st.columns(3)
+                with col_a:
+                    confirmation = st.selectbox(
+                        "✔️ Confirm a code after",
+                        list(CONSENSUS_OPTIONS),
+                        index=1,
+                        help="Requiring several matching reads rejects one-frame misreads"
+                    )
+                with col_b:
+                    repeat_window = st.slider(
+                        "🔁 Ignore repeats of a code for (s)", 0.5, 5.0, 1.5, 0.5,
+                        help="Counted from the last time the code was seen; other codes scan immediately"
+                    )
+                with col_c:
+                    target_ms = st.slider(
+                        "🎯 Target latency (ms)", 50, 300, 120, 10,
+                        help="Frame skipping and analysis resolution adapt to stay near this"
+                    )
+                capture = st.selectbox("📐 Camera capture", list(CAPTURE_PRESETS))
+                
                 try:
                     # WebRTC streamer for camera with optimized settings for laptop cameras
                     st.info("🔧 **Debug Info:** Check if camera is detecting anything...")
@@ -402,16 +810,27 @@ def main():
                         ),
                         video_processor_factory=BarcodeProcessor,
                         media_stream_constraints={
-                            "video": {
-                                "width": {"ideal": 640, "max": 1280},  # Lower resolution for better performance
-                                "height": {"ideal": 480, "max": 720},
-                                "frameRate": {"ideal": 15, "max": 30}  # Lower framerate to reduce lag
-                            }, 
+                            "video": CAPTURE_PRESETS[capture],
                             "audio": False
                         },
                         async_processing=True,
                     )
                     
+                    # Hand the processor what it needs and pick up its result channel
+                    if webrtc_ctx.video_processor:
+                        webrtc_ctx.video_processor.valid_barcodes = st.session_state.valid_barcodes
+                        webrtc_ctx.video_processor.ledger = st.session_state.scan_ledger
+                        webrtc_ctx.video_processor.station = st.session_state.station
+                        webrtc_ctx.video_processor.near_miss = manifest_near_miss()
+                        webrtc_ctx.video_processor.tracker.id_filter = active_id_filter()
+                        gate = webrtc_ctx.video_processor.gate
+                        gate.consensus, gate.window = CONSENSUS_OPTIONS[confirmation]
+                        gate.ttl = repeat_window
+                        webrtc_ctx.video_processor.controller.target_latency = target_ms / 1000
+                        st.session_state.live_controller = webrtc_ctx.video_processor.controller
+                        st.session_state.live_channel = webrtc_ctx.video_processor.channel
+                        st.session_state.live_worker = webrtc_ctx.video_processor.worker
+                    
                     st.info("💡 **Laptop Camera Tips:**")
                     st.markdown("""
                     - **Hold barcode steady** in camera view (5-10 cm from camera)
@@ -460,85 +879,65 @@ def main():
     with col2:
         st.header("📊 Scan Status")
         
-        # Status display
-        status_placeholder = st.empty()
-        
-        # Handle scan status
-        if st.session_state.scan_status == 'success':
-            with status_placeholder.container():
-                st.success(f"✅ Valid Barcode Scanned!")
-                st.code(st.session_state.last_scanned)
-                st.balloons()
-                # Play success sound
-                play_sound(get_success_sound())
-            # Reset status after showing
-            st.session_state.scan_status = None
-            
-        elif st.session_state.scan_status == 'invalid':
-            with status_placeholder.container():
-                st.error(f"❌ Invalid Barcode!")
-                st.code(st.session_state.last_scanned)
-                # Play failure sound
-                play_sound(get_failure_sound())
-            # Reset status after showing
-            st.session_state.scan_status = None
-            
-        elif st.session_state.scan_status == 'duplicate':
-            with status_placeholder.container():
-                st.warning(f"⚠️ Already Scanned!")
-                st.code(st.session_state.last_scanned)
-            # Reset status after showing
-            st.session_state.scan_status = None
-        
-        # Statistics
-        if st.session_state.file_uploaded:
-            st.markdown("### 📈 Statistics")
-            total_valid = len(st.session_state.valid_barcodes)
-            total_scanned = len(st.session_state.scanned_barcodes)
-            progress = (total_scanned / total_valid) * 100 if total_valid > 0 else 0
-            
-            st.metric("Total Valid Barcodes", total_valid)
-            st.metric("Scanned", total_scanned)
-            st.metric("Progress", f"{progress:.1f}%")
-            
-            # Progress bar
-            st.progress(progress / 100)
+        # Poll the live camera's result channel while a stream is running;
+        # only this panel reruns, not the whole page
+        live = st.session_state.live_channel is not None
+        st.fragment(scan_status_panel, run_every=STATUS_REFRESH_SECONDS if live else None)()
+        
+        if st.session_state.get('show_diagnostics'):
+            st.fragment(diagnostics_panel, run_every=DIAGNOSTICS_REFRESH_SECONDS if live else None)()
     
     # Scan History Section
     st.markdown("---")
     st.header("📋 Scan History")
     
-    if st.session_state.scanned_barcodes:
-        # Create DataFrame for display
-        df_history = pd.DataFrame(st.session_state.scanned_barcodes)
-        df_history['timestamp'] = df_history['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Display as table
-        st.dataframe(
-            df_history[['timestamp', 'barcode', 'status']],
-            column_config={
-                'timestamp': 'Scan Time',
-                'barcode': 'Barcode',
-                'status': 'Status'
-            },
-            use_container_width=True,
-            hide_index=True
-        )
+    ledger = st.session_state.scan_ledger
+    if len(ledger):
+        # Only one page of the log is copied and rendered, however long it grows
+        search = st.text_input("🔍 Search tracking ID", key='history_search').strip()
+        if search:
+            rows = ledger.find(search, limit=HISTORY_PAGE_SIZE)
+            st.caption(f"{len(rows)} matching scans" + (" (newest shown)" if len(rows) == HISTORY_PAGE_SIZE else ""))
+        else:
+            pages = (len(ledger) - 1) // HISTORY_PAGE_SIZE + 1
+            page = 1
+            if pages > 1:
+                page = st.number_input(f"Page (newest first, {HISTORY_PAGE_SIZE} scans per page)",
+                                       min_value=1, max_value=pages, value=1)
+            rows = ledger.recent((page - 1) * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE)
+            st.caption(f"Showing {len(rows)} of {len(ledger)} scans")
+        
+        if rows:
+            df_history = pd.DataFrame(rows)
+            df_history['timestamp'] = df_history['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            df_history.loc[df_history['withdrawn'], 'status'] = '⚠️ Withdrawn'
+            
+            # Display as table
+            st.dataframe(
+                df_history[['timestamp', 'barcode', 'status', 'station']],
+                column_config={
+                    'timestamp': 'Scan Time',
+                    'barcode': 'Barcode',
+                    'status': 'Status',
+                    'station': 'Station'
+                },
+                use_container_width=True,
+                hide_index=True
+            )
         
         # Summary by status
         col1, col2, col3 = st.columns(3)
         with col1:
-            valid_count = len([s for s in st.session_state.scanned_barcodes if s['status'] == 'Valid'])
-            st.metric("✅ Valid Scans", valid_count)
+            st.metric("✅ Valid Scans", ledger.valid_count)
         
         with col2:
             # Show remaining barcodes
-            remaining = len(st.session_state.valid_barcodes) - len(st.session_state.scanned_barcodes)
+            remaining = len(st.session_state.valid_barcodes) - ledger.on_list_count
             st.metric("📋 Remaining", remaining)
         
         with col3:
             # Show completion percentage
-            completion = (len(st.session_state.scanned_barcodes) / len(st.session_state.valid_barcodes)) * 100 if st.session_state.valid_barcodes else 0
+            completion = (ledger.on_list_count / len(st.session_state.valid_barcodes)) * 100 if st.session_state.valid_barcodes else 0
             st.metric("📊 Completion", f"{completion:.1f}%")
     
     else:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+🗂️ HEADLESS BATCH SCANNER
+=========================
+
+Validate a directory tree of barcode photos against a manifest without a
+browser, e.g. a nightly dump of dock-camera snapshots.
+
+Usage:
+   python batch_scan.py manifest.xlsx /data/snapshots -o results.jsonl
+   python batch_scan.py manifest.csv "/data/**/*.jpg" -o results.csv --workers 8
+
+Images are decoded in a process pool with the same cascade as the upload
+page, reading QR codes and the 1-D symbologies and ID shapes found in the
+manifest (--all-symbologies reads everything); images without a tracking ID
+list the codes that were filtered out. Paths are discovered lazily and results are written as they arrive,
+so 100k+ images never sit in memory at once.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from typing import Iterator
+
+from scanner_core import (
+    ScanLedger, VALID, DUPLICATE, INVALID, load_manifest, format_stats,
+    classify_detections, decode_images, result_rows, IdFilter,
+    NearMissIndex
+)
+from scanner_core.batch import default_workers
+from scanner_core.cascade import DEFAULT_BUDGET
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+FIELDS = ['file', 'barcode', 'symbology', 'status', 'closest_id', 'stage', 'ms']
+
+
+def iter_image_paths(inputs) -> Iterator[str]:
+    """Yield image paths from directories (walked recursively), globs and files"""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            for path in glob.iglob(item, recursive=True):
+                if path.lower().endswith(IMAGE_EXTENSIONS):
+                    yield path
+        else:
+            yield item
+
+
+class ResultWriter:
+    """Streams result rows to JSONL or CSV, chosen by file extension"""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w', newline='', encoding='utf-8') if path != '-' else sys.stdout
+        self.csv = None
+        if path.endswith('.csv'):
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a directory of barcode images against a manifest")
+    parser.add_argument('manifest', help="CSV/Excel file with a 'tracking-id' column")
+    parser.add_argument('inputs', nargs='+', help="Image directories, glob patterns or files")
+    parser.add_argument('-o', '--output', default='scan_results.jsonl',
+                        help="Results file (.jsonl or .csv, '-' for stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=default_workers(),
+                        help="Decode processes (default: all cores)")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help="Per-image decode time budget in seconds")
+    parser.add_argument('--threads', action='store_true',
+                        help="Use threads instead of processes")
+    parser.add_argument('--all-symbologies', action='store_true',
+                        help="Decode every symbology and keep payloads that can't be on the manifest")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    print(f"📁 Manifest: {len(manifest):,} tracking IDs from '{manifest.column}'", file=sys.stderr)
+    print(f"   {format_stats(manifest.stats)}", file=sys.stderr)
+    id_filter = None
+    if not args.all_symbologies:
+        id_filter = IdFilter.from_barcodes(manifest.barcodes)
+        print(f"   Reading {', '.join(id_filter.symbologies)}; IDs like "
+              f"{'; '.join(id_filter.describe()[:3])}", file=sys.stderr)
+
+    near_miss = NearMissIndex(manifest.barcodes)
+    ledger = ScanLedger()
+    writer = ResultWriter(args.output)
+    latencies = []
+    images = no_barcode = filtered = errors = 0
+    start = time.perf_counter()
+
+    try:
+        sources = ((path, path) for path in iter_image_paths(args.inputs))
+        results = decode_images(sources, workers=args.workers,
+                                processes=not args.threads, budget=args.budget, id_filter=id_filter)
+        for path, result in results:
+            images += 1
+            latencies.append(result['elapsed'])
+            if result.get('error'):
+                errors += 1
+            elif not result['detections']:
+                no_barcode += 1
+                filtered += bool(result.get('filtered'))
+
+            classify_detections(result['detections'], manifest.barcodes, ledger, source=path,
+                                near_miss=near_miss)
+            # The filter's copy in each decode process has no NearMissIndex; look up here
+            for barcode_info in result.get('filtered', ()):
+                if barcode_info['filtered'] != 'symbology':
+                    barcode_info['suggestion'] = near_miss.suggest(barcode_info['data'])
+            for row in result_rows(path, result):
+                writer.write(row)
+
+            if images % 1000 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"   {images:,} images - {images / elapsed:.1f} images/sec", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    counts = ledger.counts()
+    print("=" * 50, file=sys.stderr)
+    print("📋 SUMMARY:", file=sys.stderr)
+    print(f"   Images:      {images:,} ({no_barcode:,} without tracking ID, {filtered:,} of them "
+          f"with other codes; {errors:,} unreadable)", file=sys.stderr)
+    print(f"   ✅ Valid:     {counts[VALID]:,} of {len(manifest):,}", file=sys.stderr)
+    print(f"   ⚠️  Duplicate: {counts[DUPLICATE]:,}", file=sys.stderr)
+    print(f"   ❌ Invalid:   {counts[INVALID]:,}", file=sys.stderr)
+    print(f"   ⏱️  {elapsed:.1f}s total, {images / elapsed if elapsed else 0:.1f} images/sec, "
+          f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms per image", file=sys.stderr)
+    print(f"   Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
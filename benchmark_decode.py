@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+🏁 DECODE BENCHMARK
+===================
+
+Measure decode speed and accuracy on a synthetic, labelled corpus: Code 128,
+EAN-13 and QR labels with tracking-ID payloads under scale, rotation, blur,
+noise, glare and JPEG distortions (see scanner_core/synthetic.py).
+
+Usage:
+   python benchmark_decode.py                        # 20 images per class, JSON to stdout
+   python benchmark_decode.py -n 50 -o bench.json    # bigger run, saved for regression tracking
+   python benchmark_decode.py --pipelines detect_barcodes cascade --save corpus/
+   python benchmark_decode.py --decoys --pipelines cascade cascade_restricted   # manifest restriction
+
+Every image goes through each pipeline; the JSON report has images/sec,
+latency percentiles and recall per pipeline, per distortion class and per
+symbology. 'other_reads' counts every payload that isn't the label's
+tracking ID: misreads, and with --decoys the SKU and QR codes printed next
+to it. The *_restricted pipelines decode only what IdFilter derives from a
+manifest in the corpus' ID formats. The corpus is reproducible from --seed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+import cv2
+
+from scanner_core.cascade import decode_cascade
+from scanner_core.decoder import detect_barcodes, detect_barcodes_scaled
+from scanner_core.prefilter import IdFilter
+from scanner_core.synthetic import DISTORTIONS, SYMBOLOGIES, generate_corpus, sample_manifest
+
+PIPELINE_NAMES = ('detect_barcodes', 'scaled_640', 'scaled_960', 'cascade',
+                  'detect_restricted', 'cascade_restricted')
+
+
+def build_pipelines(id_filter: IdFilter) -> Dict[str, Callable]:
+    """name -> (image -> detections)"""
+    restricted = id_filter.wrap(detect_barcodes)
+    return {
+        'detect_barcodes': detect_barcodes,
+        'scaled_640': lambda image: detect_barcodes_scaled(image, 640),
+        'scaled_960': lambda image: detect_barcodes_scaled(image, 960),
+        'cascade': lambda image: decode_cascade(image)['detections'],
+        'detect_restricted': restricted,
+        'cascade_restricted': lambda image: decode_cascade(image, decode=restricted)['detections'],
+    }
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class Tally:
+    """Latencies and hit counts for one pipeline (or one slice of it)"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.hits = 0
+        self.other_reads = 0
+
+    def add(self, seconds: float, hit: bool, other_reads: int):
+        self.latencies.append(seconds)
+        self.hits += hit
+        self.other_reads += other_reads
+
+    def report(self, detail: bool = True) -> Dict:
+        latencies = sorted(self.latencies)
+        total = sum(latencies)
+        report = {
+            'images': len(latencies),
+            'recall': self.hits / len(latencies) if latencies else 0.0,
+            'other_reads': self.other_reads,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+        }
+        if detail:
+            report.update({
+                'images_per_sec': len(latencies) / total if total else 0.0,
+                'mean_ms': total / len(latencies) * 1000 if latencies else 0.0,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+            })
+        return report
+
+
+def run(pipelines: Dict[str, Callable], per_class: int, seed: int, save: str = None,
+        symbologies=SYMBOLOGIES, with_decoys: bool = False) -> Dict:
+    totals = {name: Tally() for name in pipelines}
+    by_distortion = {name: {d: Tally() for d in DISTORTIONS} for name in pipelines}
+    by_symbology = {name: {s: Tally() for s in symbologies} for name in pipelines}
+    labels = open(os.path.join(save, 'labels.jsonl'), 'w') if save else None
+
+    try:
+        corpus = generate_corpus(per_class, seed, symbologies, with_decoys=with_decoys)
+        for index, sample in enumerate(corpus):
+            if labels:
+                name = f"{index:05d}_{sample.distortion}_{sample.symbology}.png"
+                cv2.imwrite(os.path.join(save, name), sample.image)
+                labels.write(json.dumps({'file': name, 'text': sample.text,
+                                         'symbology': sample.symbology,
+                                         'distortion': sample.distortion}) + '\n')
+
+            for name, decode in pipelines.items():
+                start = time.perf_counter()
+                detections = decode(sample.image)
+                seconds = time.perf_counter() - start
+
+                hit = any(d['data'] == sample.text for d in detections)
+                other_reads = sum(d['data'] != sample.text for d in detections)
+                for tally in (totals[name], by_distortion[name][sample.distortion],
+                              by_symbology[name][sample.symbology]):
+                    tally.add(seconds, hit, other_reads)
+    finally:
+        if labels:
+            labels.close()
+
+    return {
+        name: dict(
+            totals[name].report(),
+            by_distortion={d: t.report(detail=False) for d, t in by_distortion[name].items()},
+            by_symbology={s: t.report(detail=False) for s, t in by_symbology[name].items()},
+        )
+        for name in pipelines
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark barcode decoding on a synthetic corpus")
+    parser.add_argument('-n', '--per-class', type=int, default=20,
+                        help="Images per (distortion, symbology) pair")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus seed")
+    parser.add_argument('--symbologies', nargs='+', choices=SYMBOLOGIES, default=list(SYMBOLOGIES),
+                        help="Symbologies the tracking IDs are printed as")
+    parser.add_argument('--decoys', action='store_true',
+                        help="Print a SKU Code 128 and a QR link on every label as well")
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINE_NAMES, default=list(PIPELINE_NAMES))
+    parser.add_argument('-o', '--output', default='-', help="JSON report file ('-' for stdout)")
+    parser.add_argument('--save', help="Also write the corpus images and labels.jsonl here")
+    args = parser.parse_args(argv)
+
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+
+    # The restricted pipelines filter on a manifest in the corpus' ID formats
+    id_filter = IdFilter.from_barcodes(sample_manifest(1000, args.seed, args.symbologies))
+    available = build_pipelines(id_filter)
+    pipelines = {name: available[name] for name in args.pipelines}
+    print(f"🏁 {args.per_class * len(DISTORTIONS) * len(args.symbologies)} images x "
+          f"{len(pipelines)} pipelines (seed {args.seed})...", file=sys.stderr)
+    start = time.perf_counter()
+    results = run(pipelines, args.per_class, args.seed, args.save, args.symbologies, args.decoys)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': args.seed,
+            'per_class': args.per_class,
+            'symbologies': args.symbologies,
+            'decoys': args.decoys,
+            'restricted_to': list(id_filter.symbologies),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'elapsed_sec': time.perf_counter() - start,
+        },
+        'pipelines': results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+    for name, result in results.items():
+        print(f"   {name:16s} recall {result['recall']:6.1%}  {result['images_per_sec']:7.1f} img/s  "
+              f"p50 {result['p50_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms  "
+              f"other reads {result['other_reads']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
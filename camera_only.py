@@ -7,13 +7,18 @@ Uses different WebRTC approach for better compatibility
 """
 
 import streamlit as st
-import pandas as pd
 import cv2
 import numpy as np
-from pyzbar import pyzbar
 from datetime import datetime
 import time
 from typing import Set
+import uuid
+from scanner_core import (
+    ScanLedger, VALID, DUPLICATE, load_manifest,
+    classify_detections, decode_data_url, detect_barcodes, ScanGate
+)
+from capture_bridge import capture_bridge
+from manifest_session import manifest_id_filter, manifest_near_miss, open_manifest, sync_manifest
 
 # Simplified page config
 st.set_page_config(
@@ -22,117 +27,136 @@ st.set_page_config(
     layout="wide"
 )
 
+# A code still in view isn't scanned again until it has been gone this long
+REPEAT_SECONDS = 1.5
+
 # Initialize session state
 def initialize_session_state():
     if 'valid_barcodes' not in st.session_state:
         st.session_state.valid_barcodes = set()
-    if 'scanned_barcodes' not in st.session_state:
-        st.session_state.scanned_barcodes = []
+    if 'scan_ledger' not in st.session_state:
+        st.session_state.scan_ledger = ScanLedger()
     if 'file_uploaded' not in st.session_state:
         st.session_state.file_uploaded = False
     if 'scanning_active' not in st.session_state:
         st.session_state.scanning_active = False
+    if 'ledger_file' not in st.session_state:
+        st.session_state.ledger_file = None
+    if 'station' not in st.session_state:
+        st.session_state.station = f"Station {uuid.uuid4().hex[:4].upper()}"
+    if 'capture_seq' not in st.session_state:
+        st.session_state.capture_seq = None
+    if 'capture_result' not in st.session_state:
+        st.session_state.capture_result = ([], 0, 0.0)
+    if 'manifest_sources' not in st.session_state:
+        st.session_state.manifest_sources = set()
+    if 'amendment' not in st.session_state:
+        st.session_state.amendment = None
+    if 'capture_gate' not in st.session_state:
+        st.session_state.capture_gate = ScanGate(ttl=REPEAT_SECONDS)
 
 def load_barcodes_from_file(uploaded_file) -> Set[str]:
     """Load barcodes from uploaded Excel or CSV file"""
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError("Unsupported file format")
-        
-        if df.empty:
-            raise ValueError("Empty file")
-        
-        # Check for tracking-id column
-        if 'tracking-id' in df.columns:
-            st.success("✅ Using 'tracking-id' column")
-            barcode_column = df['tracking-id'].dropna().astype(str).str.strip()
-        elif 'tracking_id' in df.columns:
-            st.success("✅ Using 'tracking_id' column")
-            barcode_column = df['tracking_id'].dropna().astype(str).str.strip()
-        else:
-            st.info("ℹ️ Using first column")
-            barcode_column = df.iloc[:, 0].dropna().astype(str).str.strip()
-        
-        barcode_set = set(barcode_column.tolist())
-        barcode_set.discard('')
-        
-        return barcode_set
-        
+        manifest = load_manifest(uploaded_file)
     except Exception as e:
         st.error(f"Error: {str(e)}")
         return set()
+    
+    if manifest.matched:
+        st.success(f"✅ Using '{manifest.column}' column")
+    else:
+        st.info("ℹ️ Using first column")
+    
+    return manifest.barcodes
 
+@st.fragment
 def simple_camera_scanner():
-    """Simplified camera scanner using HTML5 video"""
+    """HTML5 camera: the browser sends small grayscale JPEGs, Python decodes and answers"""
     
     st.markdown("""
     <div style="text-align: center;">
         <h3>📷 Camera Scanner</h3>
-        <p>Point your camera at a barcode and click "Capture & Scan"</p>
+        <p>Point your camera at a barcode - frames are scanned automatically, or click "Capture & Scan"</p>
     </div>
     """, unsafe_allow_html=True)
     
-    # HTML5 Camera access
-    camera_html = """
-    <div style="text-align: center;">
-        <video id="video" width="640" height="480" autoplay></video><br><br>
-        <canvas id="canvas" width="640" height="480" style="display: none;"></canvas><br>
-        <button onclick="captureImage()" style="padding: 10px 20px; font-size: 16px; background: #ff4b4b; color: white; border: none; border-radius: 5px;">
-            📸 Capture & Scan
-        </button><br><br>
-        <img id="capturedImage" style="max-width: 400px; border: 2px solid #ccc; display: none;">
-    </div>
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        interval = st.select_slider("Capture every (s)", options=[0.0, 0.25, 0.5, 1.0, 2.0], value=0.5,
+                                    help="0 = only when you press the button")
+    with col2:
+        width = st.select_slider("Frame width", options=[320, 480, 640, 960], value=640)
+    with col3:
+        quality = st.slider("JPEG quality", 0.3, 0.95, 0.6, 0.05)
+    restrict = st.toggle("🔎 Only read tracking-ID barcodes", value=True, key='restrict_decode',
+                         help="Ignore SKU and postal codes that can't match the list. "
+                              "Turn off to read every code.")
     
-    <script>
-        const video = document.getElementById('video');
-        const canvas = document.getElementById('canvas');
-        const capturedImage = document.getElementById('capturedImage');
-        const ctx = canvas.getContext('2d');
-        
-        // Access camera
-        navigator.mediaDevices.getUserMedia({ 
-            video: { 
-                width: 640, 
-                height: 480,
-                facingMode: 'environment' // Use back camera on mobile
-            } 
-        })
-        .then(stream => {
-            video.srcObject = stream;
-        })
-        .catch(err => {
-            console.error('Camera error:', err);
-            alert('Camera access failed: ' + err.message);
-        });
+    # Decode the newest capture before rendering, so its result goes straight back
+    capture = st.session_state.get('capture_bridge')
+    if capture and capture['seq'] != st.session_state.capture_seq:
+        start = time.perf_counter()
+        try:
+            frame = decode_data_url(capture['image'])
+            id_filter = manifest_id_filter() if restrict else None
+            if id_filter is None:
+                detected_barcodes = detect_barcodes(frame)
+            else:
+                # Only the manifest's symbologies, and only payloads shaped like its IDs
+                detected_barcodes = id_filter(detect_barcodes(frame, symbols=id_filter.symbologies))
+        except ValueError:
+            detected_barcodes = []
         
-        function captureImage() {
-            // Draw video frame to canvas
-            ctx.drawImage(video, 0, 0, 640, 480);
-            
-            // Convert to data URL
-            const dataURL = canvas.toDataURL('image/png');
-            
-            // Show captured image
-            capturedImage.src = dataURL;
-            capturedImage.style.display = 'block';
-            
-            // Send image data to Streamlit (you'll need to handle this)
-            console.log('Image captured');
-            
-            // For now, just show success message
-            alert('Image captured! (Integration with barcode detection needed)');
-        }
-    </script>
-    """
+        # A label held in view is captured again and again: only new codes are recorded.
+        # The TTL must outlast the gap between automatic captures.
+        gate = st.session_state.capture_gate
+        gate.ttl = max(REPEAT_SECONDS, 2 * interval)
+        classify_detections(
+            gate(detected_barcodes, time.time()),
+            st.session_state.valid_barcodes,
+            st.session_state.scan_ledger,
+            station=st.session_state.station,
+            near_miss=manifest_near_miss()
+        )
+        for barcode_info in detected_barcodes:
+            if 'status' not in barcode_info:
+                # Repeats are shown with their current status, without recording
+                barcode_info['repeat'] = True
+                barcode_info['status'] = st.session_state.scan_ledger.classify(
+                    barcode_info['data'], st.session_state.valid_barcodes)
+        st.session_state.capture_seq = capture['seq']
+        st.session_state.capture_result = (detected_barcodes, capture['bytes'],
+                                           time.perf_counter() - start)
+    
+    detected_barcodes, frame_bytes, seconds = st.session_state.capture_result
+    capture_bridge(interval=interval, width=width, quality=quality,
+                   detections=detected_barcodes, seq=st.session_state.capture_seq,
+                   key='capture_bridge')
     
-    st.components.v1.html(camera_html, height=700)
+    if st.session_state.capture_seq is not None:
+        st.caption(f"📦 Last frame {frame_bytes / 1024:.1f} KB, decoded in {seconds * 1000:.0f} ms")
+    for barcode_info in detected_barcodes:
+        if barcode_info.get('repeat'):
+            st.caption(f"👀 Still in view: {barcode_info['data']} - already recorded")
+        elif barcode_info['status'] == VALID:
+            st.success(f"✅ Valid: {barcode_info['data']}")
+        elif barcode_info['status'] == DUPLICATE:
+            claimed_by = barcode_info['claimed_by']
+            st.warning(f"⚠️ Already scanned: {barcode_info['data']}{' at ' + claimed_by if claimed_by else ''}")
+        else:
+            suggestion = barcode_info.get('suggestion')
+            st.error(f"❌ Not on the list: {barcode_info['data']}"
+                     f"{' (closest: ' + suggestion + ')' if suggestion else ''}")
+    
+    ledger = st.session_state.scan_ledger
+    st.metric("Scanned", f"{ledger.on_list_count} / {len(st.session_state.valid_barcodes)}")
+    if ledger.store is not None and ledger.store.last_error:
+        st.error(f"💾 Scans aren't being saved ({ledger.store.pending} waiting): {ledger.store.last_error}")
 
 def main():
     initialize_session_state()
+    sync_manifest()
     
     st.title("📷 Camera-Only Barcode Scanner")
     st.markdown("**Live camera scanning focused solution**")
@@ -146,12 +170,20 @@ def main():
             type=['xlsx', 'xls', 'csv']
         )
         
-        if uploaded_file:
+        # Each upload is parsed once; uploading an amended list applies it as a delta
+        if uploaded_file and uploaded_file.file_id not in st.session_state.manifest_sources:
             barcodes = load_barcodes_from_file(uploaded_file)
             if barcodes:
-                st.session_state.valid_barcodes = barcodes
-                st.session_state.file_uploaded = True
-                st.success(f"✅ {len(barcodes)} tracking IDs loaded")
+                open_manifest(uploaded_file.file_id, barcodes)
+        
+        if st.session_state.file_uploaded:
+            delta = st.session_state.amendment
+            if delta is not None:
+                st.info(f"📝 Amended list: {delta.summary()}")
+                if delta.withdrawn:
+                    st.warning(f"⚠️ Scanned, now withdrawn: {', '.join(delta.withdrawn[:10])}"
+                               f"{' …' if len(delta.withdrawn) > 10 else ''}")
+            st.success(f"✅ {len(st.session_state.valid_barcodes)} tracking IDs loaded")
     
     # Main camera area
     if st.session_state.file_uploaded:
@@ -163,7 +195,7 @@ def main():
             "Select scanning approach:",
             [
                 "🔧 Diagnostics First (Recommended)",
-                "📷 HTML5 Camera (Experimental)", 
+                "📷 HTML5 Camera (Low Bandwidth)",
                 "🔄 Try Original WebRTC",
                 "💻 OpenCV Direct (Advanced)"
             ]
@@ -174,8 +206,8 @@ def main():
             st.code("streamlit run camera_diagnostics.py")
             st.markdown("This will test your camera and provide specific fixes.")
             
-        elif method == "📷 HTML5 Camera (Experimental)":
-            st.warning("⚠️ This is experimental - may not work on all browsers")
+        elif method == "📷 HTML5 Camera (Low Bandwidth)":
+            st.info("📶 Sends small grayscale snapshots instead of a video stream - works on slow Wi-Fi")
             simple_camera_scanner()
             
         elif method == "🔄 Try Original WebRTC":
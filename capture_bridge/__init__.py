@@ -0,0 +1,45 @@
+"""
+📸 CAPTURE BRIDGE
+=================
+
+Bidirectional Streamlit component for the HTML5 camera in camera_only.py.
+
+The browser grabs frames from getUserMedia, downscales them, converts them
+to grayscale and sends them to Python as small JPEG data URLs (tens of KB
+instead of a ~1 MB PNG). Python decodes them and passes the result back in
+on the next render, where it is drawn over the preview. Only one frame is
+in flight at a time, so a slow link lowers the frame rate instead of
+queueing stale frames.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import streamlit.components.v1 as components
+
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+_component = components.declare_component("capture_bridge", path=_FRONTEND_DIR)
+
+
+def capture_bridge(interval: float = 0.5, width: int = 640, quality: float = 0.6,
+                   detections: Optional[List[Dict]] = None, seq: Optional[int] = None,
+                   key: Optional[str] = None) -> Optional[Dict]:
+    """Render the camera and return the latest capture
+
+    `interval` is seconds between automatic captures (0 for the capture
+    button only), `width` the width frames are downscaled to and `quality`
+    the JPEG quality (0-1). `detections` and `seq` are the result for the
+    last capture, drawn over the preview.
+
+    Returns {'seq', 'image', 'width', 'height', 'bytes'} for the most recent
+    capture ('image' is a JPEG data URL), or None before the first one.
+    """
+    return _component(
+        interval_ms=int(interval * 1000),
+        width=width,
+        quality=quality,
+        detections=detections or [],
+        result_seq=seq,
+        key=key,
+        default=None,
+    )
@@ -0,0 +1,97 @@
+"""
+📋 MANIFEST SESSION
+===================
+
+The loaded manifest of one browser session, shared by app.py, mobile_app.py
+and camera_only.py.
+
+Stations that load the same manifest share one ScanLedger per server
+process, and with it the live ID set (ledger.valid_ids) and the decode
+filter and near-miss index built on it (scanner_core.shared_indexes). A
+session only keeps references: st.session_state.valid_barcodes is the
+ledger's live set, re-read on every run by sync_manifest() so amendments
+made at another station are picked up.
+"""
+
+from typing import Optional, Set
+
+import streamlit as st
+
+from scanner_core import (
+    IdFilter, ManifestIndexes, NearMissIndex, apply_amendment, detect_barcodes, release_ledger,
+    shared_indexes, shared_ledger
+)
+
+
+def resume_scans(source: str, valid_barcodes: Set[str]):
+    """Join the shared ledger for this manifest, with earlier and other stations' scans"""
+    if st.session_state.ledger_file == source:
+        return
+    previous = st.session_state.scan_ledger
+    st.session_state.scan_ledger = shared_ledger(valid_barcodes)
+    st.session_state.ledger_file = source
+    release_ledger(previous)
+    # Every station scans against the one live ID set kept with the ledger
+    shared_ids = st.session_state.scan_ledger.share_ids(valid_barcodes)
+    # Scans resumed through an earlier amendment may be off this list
+    st.session_state.scan_ledger.reconcile(shared_ids)
+    if len(st.session_state.scan_ledger):
+        st.info(f"♻️ Resumed {len(st.session_state.scan_ledger)} earlier scans for this manifest")
+
+
+def manifest_indexes() -> Optional[ManifestIndexes]:
+    """Decode filter and near-miss index of the live ID set (built once, for every station)"""
+    return shared_indexes(st.session_state.scan_ledger)
+
+
+def manifest_id_filter() -> Optional[IdFilter]:
+    indexes = manifest_indexes()
+    return None if indexes is None else indexes.id_filter
+
+
+def manifest_near_miss() -> Optional[NearMissIndex]:
+    indexes = manifest_indexes()
+    return None if indexes is None else indexes.near_miss
+
+
+def sync_manifest():
+    """Use the ledger's live ID set - it changes when any station applies an amendment"""
+    shared_ids = st.session_state.scan_ledger.valid_ids
+    if shared_ids is None or shared_ids is st.session_state.valid_barcodes:
+        return
+    st.toast("📝 The tracking ID list was amended at another station")
+    st.session_state.valid_barcodes = shared_ids
+    manifest_indexes()
+
+
+def open_manifest(source: str, barcodes: Set[str]):
+    """Make a newly uploaded or watched manifest the current one
+
+    A revision of the loaded list (most IDs in common) is applied for every
+    station sharing it: scanning carries on, progress is kept and scans of
+    withdrawn IDs are flagged. Any other list replaces it and resumes its
+    own scans.
+    """
+    st.session_state.manifest_sources.add(source)
+    # Diffed against the ledger's live set, which may be newer than this session's copy
+    delta = apply_amendment(barcodes, st.session_state.scan_ledger)
+    st.session_state.amendment = delta or None  # an unchanged list isn't worth a notice
+    st.session_state.file_uploaded = True
+    if delta is None:
+        resume_scans(source, barcodes)
+    # This station's own change: take it up now, without the notice sync_manifest() gives
+    st.session_state.valid_barcodes = st.session_state.scan_ledger.valid_ids
+    manifest_indexes()
+
+
+def active_id_filter() -> Optional[IdFilter]:
+    """The manifest's IdFilter, unless it was switched off"""
+    if not st.session_state.get('restrict_decode', True):
+        return None
+    return manifest_id_filter()
+
+
+def restricted_decoder():
+    """detect_barcodes limited to the manifest's symbologies and ID shapes"""
+    id_filter = active_id_filter()
+    return id_filter.wrap(detect_barcodes) if id_filter else detect_barcodes
@@ -10,14 +10,22 @@ Run with: streamlit run mobile_app.py
 
 import streamlit as st
 import pandas as pd
-import cv2
-import numpy as np
-from pyzbar import pyzbar
 import base64
 import io
 from datetime import datetime
+from itertools import islice
+import time
+import uuid
 import PIL.Image
 from typing import Set
+from scanner_core import (
+    ScanLedger, VALID, DUPLICATE, INVALID,
+    load_manifest, format_stats, decode_cascade, decode_images, result_rows,
+    classify_detections, FILTER_REASONS
+)
+from manifest_session import (
+    active_id_filter, manifest_near_miss, open_manifest, restricted_decoder, sync_manifest
+)
 
 # Page configuration for mobile
 st.set_page_config(
@@ -32,71 +40,51 @@ def initialize_session_state():
     """Initialize all session state variables"""
     if 'valid_barcodes' not in st.session_state:
         st.session_state.valid_barcodes = set()
-    if 'scanned_barcodes' not in st.session_state:
-        st.session_state.scanned_barcodes = []
+    if 'scan_ledger' not in st.session_state:
+        st.session_state.scan_ledger = ScanLedger()
     if 'file_uploaded' not in st.session_state:
         st.session_state.file_uploaded = False
+    if 'last_upload' not in st.session_state:
+        st.session_state.last_upload = None
+    if 'last_bulk' not in st.session_state:
+        st.session_state.last_bulk = None
+    if 'ledger_file' not in st.session_state:
+        st.session_state.ledger_file = None
+    if 'station' not in st.session_state:
+        st.session_state.station = f"Station {uuid.uuid4().hex[:4].upper()}"
+    if 'manifest_sources' not in st.session_state:
+        st.session_state.manifest_sources = set()
+    if 'amendment' not in st.session_state:
+        st.session_state.amendment = None
+
+# Scans shown in the history table
+HISTORY_ROWS = 200
 
 # File handling functions
 def load_barcodes_from_file(uploaded_file) -> Set[str]:
     """Load barcodes from uploaded Excel or CSV file"""
     try:
-        # Determine file type and read accordingly
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError("Unsupported file format. Please upload CSV or Excel file.")
-        
-        if df.empty:
-            raise ValueError("The uploaded file is empty.")
-        
-        # Check for 'tracking-id' column first, then fall back to first column
-        if 'tracking-id' in df.columns:
-            st.success("✅ Found 'tracking-id' column - using that for barcodes!")
-            barcode_column = df['tracking-id'].dropna().astype(str).str.strip()
-        elif 'tracking_id' in df.columns:
-            st.success("✅ Found 'tracking_id' column - using that for barcodes!")
-            barcode_column = df['tracking_id'].dropna().astype(str).str.strip()
-        elif 'Tracking ID' in df.columns:
-            st.success("✅ Found 'Tracking ID' column - using that for barcodes!")
-            barcode_column = df['Tracking ID'].dropna().astype(str).str.strip()
-        else:
-            st.info("ℹ️ No 'tracking-id' column found - using first column")
-            barcode_column = df.iloc[:, 0].dropna().astype(str).str.strip()
-        
-        barcode_set = set(barcode_column.tolist())
-        barcode_set.discard('')
-        
-        return barcode_set
-        
+        manifest = load_manifest(uploaded_file)
     except Exception as e:
         st.error(f"Error reading file: {str(e)}")
         return set()
-
-# Barcode detection function
-def detect_barcodes(frame):
-    """Detect and decode barcodes in the given frame"""
-    barcodes = pyzbar.decode(frame)
-    detected_codes = []
     
-    for barcode in barcodes:
-        barcode_data = barcode.data.decode('utf-8')
-        barcode_type = barcode.type
-        (x, y, w, h) = barcode.rect
-        
-        detected_codes.append({
-            'data': barcode_data,
-            'type': barcode_type,
-            'location': (x, y, w, h)
-        })
+    if manifest.matched:
+        st.success(f"✅ Found '{manifest.column}' column - using that for barcodes!")
+    else:
+        st.info("ℹ️ No 'tracking-id' column found - using first column")
+    
+    st.caption(f"⏱️ {format_stats(manifest.stats)}")
+    if manifest.stats.get('rejected'):
+        st.warning(f"⚠️ {manifest.stats['rejected']} IDs were in scientific notation (like 1.23E+16) and "
+                   f"were skipped - format the tracking ID column as text and export again")
     
-    return detected_codes
+    return manifest.barcodes
 
 def main():
     # Initialize session state
     initialize_session_state()
+    sync_manifest()
     
     # Header
     st.title("📱 Mobile Barcode Scanner")
@@ -106,28 +94,46 @@ def main():
     # Step 1: File Upload
     st.header("📂 Step 1: Upload Your Barcode List")
     
+    st.text_input("🚪 Station", key='station',
+                  help="Name shown to other stations scanning the same list")
+    
     uploaded_file = st.file_uploader(
         "Choose Excel or CSV file with tracking IDs",
         type=['xlsx', 'xls', 'csv'],
         help="Upload file with 'tracking-id' column or barcodes in first column"
     )
     
-    if uploaded_file is not None:
+    # Each upload is parsed once; uploading an amended list applies it as a delta
+    if uploaded_file is not None and uploaded_file.file_id not in st.session_state.manifest_sources:
         with st.spinner("Loading barcodes..."):
             valid_barcodes = load_barcodes_from_file(uploaded_file)
             
         if valid_barcodes:
-            st.session_state.valid_barcodes = valid_barcodes
-            st.session_state.file_uploaded = True
-            st.success(f"✅ Loaded {len(valid_barcodes)} valid tracking IDs!")
-            
-            # Show preview
-            with st.expander("👀 Preview loaded tracking IDs"):
-                preview_list = list(valid_barcodes)[:5]
-                for i, barcode in enumerate(preview_list, 1):
-                    st.text(f"{i}. {barcode}")
-                if len(valid_barcodes) > 5:
-                    st.text(f"... and {len(valid_barcodes) - 5} more")
+            open_manifest(uploaded_file.file_id, valid_barcodes)
+    
+    if st.session_state.file_uploaded:
+        valid_barcodes = st.session_state.valid_barcodes
+        delta = st.session_state.amendment
+        if delta is not None:
+            st.info(f"📝 Updated list applied: {delta.summary()} - your progress is kept")
+            if delta.withdrawn:
+                st.warning("⚠️ Already scanned but taken off the list - set these parcels aside: "
+                           + ", ".join(delta.withdrawn[:10])
+                           + (f" … and {len(delta.withdrawn) - 10} more" if len(delta.withdrawn) > 10 else ""))
+        st.success(f"✅ Loaded {len(valid_barcodes)} valid tracking IDs!")
+        
+        # Show preview
+        with st.expander("👀 Preview loaded tracking IDs"):
+            preview_list = list(islice(valid_barcodes, 5))
+            for i, barcode in enumerate(preview_list, 1):
+                st.text(f"{i}. {barcode}")
+            if len(valid_barcodes) > 5:
+                st.text(f"... and {len(valid_barcodes) - 5} more")
+        
+        # Skip codes that can't be on this list
+        st.toggle("🔎 Only read tracking-ID barcodes", value=True, key='restrict_decode',
+                  help="Ignore SKU and postal codes that can't match the list - faster and no "
+                       "invalid-scan noise. Turn off to read every code.")
     
     # Step 2: Scanning (only if file uploaded)
     if st.session_state.file_uploaded:
@@ -142,65 +148,147 @@ def main():
         4. **Upload the photo** below for instant results!
         """)
         
-        uploaded_image = st.file_uploader(
-            "📷 Take a photo and upload it here",
-            type=['png', 'jpg', 'jpeg', 'bmp'],
-            help="Use your phone camera to take a photo of the barcode"
+        photo_mode = st.radio(
+            "Upload mode:",
+            ["📸 One photo", "📚 Many photos"],
+            horizontal=True,
+            help="Many photos: select a whole pallet of label photos at once"
         )
         
+        uploaded_image = None
+        if photo_mode == "📸 One photo":
+            uploaded_image = st.file_uploader(
+                "📷 Take a photo and upload it here",
+                type=['png', 'jpg', 'jpeg', 'bmp'],
+                help="Use your phone camera to take a photo of the barcode"
+            )
+        else:
+            uploaded_images = st.file_uploader(
+                "📚 Select all your label photos",
+                type=['png', 'jpg', 'jpeg', 'bmp'],
+                accept_multiple_files=True,
+                help="Photos are checked in parallel"
+            )
+            
+            if uploaded_images:
+                # Decode each batch once; reruns reuse the results
+                batch_key = tuple(f.file_id for f in uploaded_images)
+                cached = st.session_state.last_bulk
+                if cached and cached[0] == batch_key:
+                    rows, elapsed = cached[1], cached[2]
+                else:
+                    rows = []
+                    total = len(uploaded_images)
+                    progress_bar = st.progress(0.0)
+                    counter = st.empty()
+                    start = time.perf_counter()
+                    sources = ((f, f.getvalue()) for f in uploaded_images)
+                    
+                    # Stream results into the ledger as each photo completes
+                    for done, (image_file, result) in enumerate(decode_images(sources, id_filter=active_id_filter()), 1):
+                        classify_detections(
+                            result['detections'],
+                            st.session_state.valid_barcodes,
+                            st.session_state.scan_ledger,
+                            source=image_file.file_id,
+                            station=st.session_state.station,
+                            near_miss=manifest_near_miss()
+                        )
+                        rows.extend(result_rows(image_file.name, result))
+                        elapsed = time.perf_counter() - start
+                        progress_bar.progress(done / total)
+                        counter.text(f"🔍 {done}/{total} photos - {done / elapsed:.1f} photos/sec")
+                    
+                    st.session_state.last_bulk = (batch_key, rows, elapsed)
+                
+                df_bulk = pd.DataFrame(rows)
+                status_counts = df_bulk['status'].value_counts()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("✅ Valid", int(status_counts.get(VALID, 0)))
+                with col2:
+                    st.metric("❌ Invalid", int(status_counts.get(INVALID, 0)))
+                with col3:
+                    st.metric("⚡ Photos/sec", f"{len(uploaded_images) / elapsed:.1f}" if elapsed else "-")
+                st.dataframe(df_bulk, use_container_width=True, hide_index=True)
+        
         if uploaded_image is not None:
             # Display uploaded image
             image = PIL.Image.open(uploaded_image)
             st.image(image, caption="📸 Your uploaded image", use_column_width=True)
             
-            # Process image
-            with st.spinner("🔍 Scanning for barcodes..."):
-                # Convert PIL image to cv2 format
-                opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-                
-                # Detect barcodes
-                detected_barcodes = detect_barcodes(opencv_image)
+            # Process image with the fallback cascade (once per upload)
+            cached = st.session_state.last_upload
+            if cached and cached[0] == uploaded_image.file_id:
+                result = cached[1]
+            else:
+                with st.spinner("🔍 Scanning for barcodes..."):
+                    result = decode_cascade(image, decode=restricted_decoder())
+                    id_filter = active_id_filter()
+                    if id_filter is not None and not result['detections']:
+                        result['filtered'] = id_filter.explain(image)
+                st.session_state.last_upload = (uploaded_image.file_id, result)
+            detected_barcodes = result['detections']
                 
             if detected_barcodes:
                 st.success("🎉 Barcode(s) found!")
+                st.caption(f"🔎 Stage '{result['stage']}', {result['elapsed'] * 1000:.0f} ms")
+                
+                # Classify and record each scan (O(1) duplicate check)
+                classify_detections(
+                    detected_barcodes,
+                    st.session_state.valid_barcodes,
+                    st.session_state.scan_ledger,
+                    source=uploaded_image.file_id,
+                    station=st.session_state.station,
+                    near_miss=manifest_near_miss()
+                )
                 
                 for barcode_info in detected_barcodes:
                     barcode_data = barcode_info['data']
+                    status = barcode_info['status']
                     
                     # Display found barcode
                     st.code(f"Found: {barcode_data}")
                     
-                    # Check if barcode is valid
-                    if (barcode_data in st.session_state.valid_barcodes and 
-                        barcode_data not in [scan['barcode'] for scan in st.session_state.scanned_barcodes]):
-                        
-                        # Valid and new barcode
-                        st.session_state.scanned_barcodes.append({
-                            'barcode': barcode_data,
-                            'timestamp': datetime.now(),
-                            'status': 'Valid'
-                        })
+                    if status == VALID:
                         st.success(f"✅ **VALID TRACKING ID!** - {barcode_data}")
                         st.balloons()
                         
-                    elif barcode_data in st.session_state.valid_barcodes:
-                        st.warning(f"⚠️ **ALREADY SCANNED** - {barcode_data}")
+                    elif status == DUPLICATE:
+                        st.warning(f"⚠️ **ALREADY SCANNED** - {barcode_data}"
+                                   f"{' at ' + barcode_info['claimed_by'] if barcode_info['claimed_by'] else ''}")
                         
                     else:
                         st.error(f"❌ **INVALID TRACKING ID** - {barcode_data}")
-                        st.info("This tracking ID is not in your uploaded list.")
+                        if barcode_info.get('suggestion'):
+                            st.info(f"🔁 Closest tracking ID on your list: **{barcode_info['suggestion']}** - "
+                                    "probably a misread, try another photo.")
+                        else:
+                            st.info("This tracking ID is not in your uploaded list.")
+            elif result.get('filtered'):
+                # Codes were read, just none that can be a tracking ID on this list
+                st.warning("⚠️ No tracking ID in this photo - these codes were skipped:")
+                for barcode_info in result['filtered']:
+                    st.text(f"{barcode_info['data']} ({barcode_info['type']}): "
+                            f"{FILTER_REASONS[barcode_info['filtered']]}")
+                    if barcode_info.get('suggestion'):
+                        st.info(f"🔁 Closest tracking ID on your list: **{barcode_info['suggestion']}** - "
+                                "probably a misread, try another photo.")
+                st.caption("Turn off '🔎 Only read tracking-ID barcodes' above to scan them anyway")
             else:
                 st.error("❌ No barcodes detected in the image")
                 st.info("💡 **Tips:** Ensure good lighting, clear focus, and try different angles")
         
         # Step 3: Results and History
-        if st.session_state.scanned_barcodes:
+        ledger = st.session_state.scan_ledger
+        if len(ledger):
             st.markdown("---")
             st.header("📊 Step 3: Scan Results")
             
             # Statistics
             total_valid = len(st.session_state.valid_barcodes)
-            total_scanned = len(st.session_state.scanned_barcodes)
+            total_scanned = ledger.on_list_count  # scans of withdrawn IDs don't count
             progress = (total_scanned / total_valid) * 100 if total_valid > 0 else 0
             
             col1, col2, col3 = st.columns(3)
@@ -211,30 +299,41 @@ def main():
             with col3:
                 st.metric("📊 Progress", f"{progress:.1f}%")
             
+            if ledger.store is not None and ledger.store.last_error:
+                st.error(f"💾 Scans aren't being saved ({ledger.store.pending} waiting): "
+                         f"{ledger.store.last_error}")
+            
             # Progress bar
             st.progress(progress / 100)
             
             # Scan history
             st.subheader("📋 Scan History")
-            df_history = pd.DataFrame(st.session_state.scanned_barcodes)
-            df_history['timestamp'] = df_history['timestamp'].dt.strftime('%H:%M:%S')
+            search = st.text_input("🔍 Search tracking ID", key='history_search').strip()
+            rows = ledger.find(search, HISTORY_ROWS) if search else ledger.recent(0, HISTORY_ROWS)
+            if not search and len(ledger) > HISTORY_ROWS:
+                st.caption(f"Last {HISTORY_ROWS} of {len(ledger)} scans")
             
-            st.dataframe(
-                df_history[['timestamp', 'barcode', 'status']],
-                column_config={
-                    'timestamp': 'Time',
-                    'barcode': 'Tracking ID',
-                    'status': 'Status'
-                },
-                use_container_width=True,
-                hide_index=True
-            )
+            if rows:
+                df_history = pd.DataFrame(rows)
+                df_history['timestamp'] = df_history['timestamp'].dt.strftime('%H:%M:%S')
+                df_history.loc[df_history['withdrawn'], 'status'] = '⚠️ Withdrawn'
+                
+                st.dataframe(
+                    df_history[['timestamp', 'barcode', 'status']],
+                    column_config={
+                        'timestamp': 'Time',
+                        'barcode': 'Tracking ID',
+                        'status': 'Status'
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
             
             # Export and clear buttons
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("📥 Export Results", type="primary"):
-                    csv = df_history.to_csv(index=False)
+                    csv = pd.DataFrame(ledger.snapshot()).to_csv(index=False)
                     st.download_button(
                         label="💾 Download CSV",
                         data=csv,
@@ -243,9 +342,13 @@ def main():
                     )
             
             with col2:
-                if st.button("🗑️ Clear History", type="secondary"):
-                    st.session_state.scanned_barcodes = []
-                    st.rerun()
+                # Shared with every station scanning this manifest, so ask first
+                with st.popover("🗑️ Clear History"):
+                    st.warning(f"⚠️ Deletes all {len(ledger)} scans of this manifest for every "
+                               f"station, including the saved history.")
+                    if st.button("Yes, clear for everyone", type="primary", key="confirm_clear"):
+                        ledger.clear()
+                        st.rerun()
     
     else:
         st.info("👆 Please upload your tracking ID file first to start scanning!")
@@ -0,0 +1,79 @@
+"""
+🧩 SCANNER CORE
+===============
+
+Streamlit-free scanning engine shared by app.py, mobile_app.py and
+camera_only.py: manifest loading, barcode decoding and scan classification.
+The apps are thin views on top of this package, so the hot path can be
+profiled and benchmarked without a browser.
+"""
+
+import importlib
+
+# Exported name -> submodule defining it. Submodules are imported on first
+# use, so the parts that don't decode (ledger, store, compact IDs, check
+# digits) work without the zbar library that pyzbar loads.
+_EXPORTS = {
+    'AdaptiveController': 'adaptive',
+    'ManifestDelta': 'amend', 'ManifestWatcher': 'amend', 'apply_amendment': 'amend',
+    'apply_delta': 'amend', 'manifest_delta': 'amend', 'watch_path': 'amend',
+    'decode_image_file': 'batch', 'decode_images': 'batch', 'result_rows': 'batch',
+    'CASCADE_STAGES': 'cascade', 'CascadeStats': 'cascade', 'decode_cascade': 'cascade',
+    'ResultChannel': 'channel',
+    'VALID': 'classifier', 'DUPLICATE': 'classifier', 'INVALID': 'classifier',
+    'classify': 'classifier', 'classify_detections': 'classifier',
+    'CompactIdSet': 'compact',
+    'ScanGate': 'debounce',
+    'ResizeBuffer': 'decoder', 'detect_barcodes': 'decoder', 'detect_barcodes_scaled': 'decoder',
+    'draw_barcode_box': 'decoder',
+    'decode_data_url': 'frames', 'luma_view': 'frames',
+    'ManifestIndexes': 'indexes', 'shared_indexes': 'indexes',
+    'ScanLedger': 'ledger',
+    'Manifest': 'manifest', 'TRACKING_ID_COLUMNS': 'manifest', 'find_tracking_column': 'manifest',
+    'load_manifest': 'manifest', 'normalize_ids': 'manifest', 'format_stats': 'manifest',
+    'FILTER_REASONS': 'prefilter', 'IdFilter': 'prefilter',
+    'ScanStore': 'store', 'link_manifest': 'store', 'manifest_digest': 'store',
+    'resolve_manifest': 'store', 'resume_ledger': 'store', 'shared_ledger': 'store',
+    'release_ledger': 'store',
+    'METRICS': 'metrics', 'Metrics': 'metrics', 'serve_metrics': 'metrics',
+    'NearMissIndex': 'nearmiss',
+    'RoiTracker': 'tracking',
+    'TemporalDeduper': 'video', 'record_video_events': 'video', 'scan_video': 'video',
+    'DecodeWorker': 'worker',
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+__all__ = [
+    'AdaptiveController',
+    'ManifestDelta', 'ManifestWatcher', 'apply_amendment', 'apply_delta', 'manifest_delta',
+    'watch_path',
+    'decode_image_file', 'decode_images', 'result_rows',
+    'CASCADE_STAGES', 'CascadeStats', 'decode_cascade',
+    'ResultChannel',
+    'CompactIdSet',
+    'VALID', 'DUPLICATE', 'INVALID', 'classify', 'classify_detections',
+    'ScanGate',
+    'ResizeBuffer', 'detect_barcodes', 'detect_barcodes_scaled', 'draw_barcode_box',
+    'decode_data_url', 'luma_view',
+    'ScanLedger', 'DecodeWorker', 'RoiTracker',
+    'Manifest', 'TRACKING_ID_COLUMNS', 'find_tracking_column', 'load_manifest',
+    'normalize_ids', 'format_stats',
+    'METRICS', 'Metrics', 'serve_metrics',
+    'IdFilter', 'FILTER_REASONS', 'NearMissIndex', 'ManifestIndexes', 'shared_indexes',
+    'ScanStore', 'link_manifest', 'manifest_digest', 'resolve_manifest', 'resume_ledger',
+    'shared_ledger', 'release_ledger',
+    'TemporalDeduper', 'record_video_events', 'scan_video',
+]
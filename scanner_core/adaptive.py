@@ -0,0 +1,93 @@
+"""
+Feedback control of live decode cost.
+
+A fixed frame-skip and analysis width is wrong on both ends: fast machines
+throw accuracy away, weak laptops still fall behind. AdaptiveController
+watches the end-to-end latency (frame submitted -> result) and every
+`interval` decoded frames steps the settings towards a target latency (the
+detection hit-rate is tracked for display):
+
+- over target: drop the analysis width; only at the smallest width skip
+  more frames. Frames go to the worker latest-wins, so skipping barely
+  shortens the submit -> result latency - it only saves CPU
+- under target: skip fewer frames again
+- well under target, skipping nothing: raise the width
+"""
+
+from typing import Dict, Sequence
+
+# Analysis widths the controller moves between, in pixels
+ANALYSIS_WIDTHS = (320, 480, 640, 960, 1280)
+
+
+class AdaptiveController:
+    """Steps frame-skip and analysis width to hold a target decode latency"""
+
+    def __init__(self, target_latency: float = 0.12, widths: Sequence[int] = ANALYSIS_WIDTHS,
+                 start_width: int = 640, max_skip: int = 6, interval: int = 10,
+                 smoothing: float = 0.2):
+        self.target_latency = target_latency
+        self.widths = tuple(widths)
+        self.level = self.widths.index(start_width) if start_width in self.widths else 0
+        self.skip = 1
+        self.max_skip = max_skip
+        self.interval = interval
+        self.smoothing = smoothing
+
+        self.latency = 0.0   # smoothed seconds
+        self.hit_rate = 0.0  # smoothed share of frames with a detection
+        self.samples = 0
+        self.changes = 0
+
+    @property
+    def width(self) -> int:
+        return self.widths[self.level]
+
+    def observe(self, latency: float, hit: bool) -> bool:
+        """Record one decoded frame; returns True if the settings changed"""
+        a = self.smoothing
+        if self.samples == 0:
+            self.latency = latency
+        else:
+            self.latency += a * (latency - self.latency)
+        self.hit_rate += a * ((1.0 if hit else 0.0) - self.hit_rate)
+        self.samples += 1
+        if self.samples % self.interval:
+            return False
+        return self._adjust()
+
+    def _adjust(self) -> bool:
+        level, skip = self.level, self.skip
+        if self.latency > self.target_latency * 1.2:
+            if level > 0:
+                level -= 1
+            elif skip < self.max_skip:
+                skip += 1
+        elif self.latency < self.target_latency:
+            if skip > 1:
+                skip -= 1
+            elif self.latency < self.target_latency * 0.5 and level < len(self.widths) - 1:
+                level += 1
+
+        changed = (level, skip) != (self.level, self.skip)
+        if changed:
+            self.level, self.skip = level, skip
+            self.changes += 1
+        return changed
+
+    @property
+    def saturated(self) -> bool:
+        """True when the cheapest settings still miss the target"""
+        return (self.level == 0 and self.skip == self.max_skip
+                and self.latency > self.target_latency)
+
+    def settings(self) -> Dict:
+        """Current settings and measurements, for display"""
+        return {
+            'width': self.width,
+            'skip': self.skip,
+            'latency_ms': self.latency * 1000,
+            'target_ms': self.target_latency * 1000,
+            'hit_rate': self.hit_rate,
+            'changes': self.changes,
+        }
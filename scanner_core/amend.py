@@ -0,0 +1,247 @@
+"""
+Amended manifests applied as deltas.
+
+Carriers send revised pickup lists during the day. Instead of swapping the
+loaded manifest for the new one - and leaving already-scanned parcels that
+were taken off the list as silent inconsistencies - the revision is diffed
+against the current list and only the difference is applied:
+
+- manifest_delta() finds the added and withdrawn IDs with set differences;
+  two CompactIdSets are compared array against array (searchsorted on the
+  numeric IDs, one hashed probe pass for the rest)
+- apply_amendment() applies it to a copy of the live ID set and publishes
+  the copy as the ledger's valid_ids. The live set is never mutated, so
+  decode threads and other stations reading it never see it change under
+  them; they pick the new set up on their next run. Amendments of one
+  ledger run one at a time (ledger.amend_lock), each against the set the
+  last one published, so two stations or watchers amending at once can't
+  lose an update. apply_delta() works in short chunks, and
+  CompactIdSet.copy() shares the packed arrays
+- ScanLedger.withdraw() flags scans whose IDs were withdrawn; scan progress
+  is kept, since the ledger isn't replaced
+
+ManifestWatcher covers drop folders: it reloads a manifest file, or the
+newest one in a folder, whenever it changes. Browser users pick the folder,
+so it must lie inside WATCH_ROOT (the SCANNER_WATCH_ROOT environment
+variable); without one, watching is off.
+"""
+
+import glob
+import os
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .compact import CompactIdSet
+from .manifest import Manifest, load_manifest
+from .store import link_manifest
+
+# A new list sharing fewer than this fraction of its IDs with the loaded one
+# is a different manifest, not a revision of it
+AMENDMENT_MIN_OVERLAP = 0.5
+
+# IDs added to or removed from a set per call, bounding each GIL hold
+APPLY_CHUNK = 10_000
+
+MANIFEST_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# A watched file must be unchanged this long before it is read, so a copy
+# still in progress isn't loaded half-written
+SETTLE_SECONDS = 1.0
+
+# The only directory tree manifests may be watched in
+WATCH_ROOT = os.environ.get('SCANNER_WATCH_ROOT')
+
+
+class ManifestDelta:
+    """IDs added to and removed from a manifest by a revision"""
+
+    def __init__(self, added: List[str], removed: List[str], kept: int):
+        self.added = added
+        self.removed = removed
+        self.kept = kept                    # IDs on both lists
+        self.withdrawn: List[str] = []      # removed IDs that had been scanned
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+    @property
+    def is_amendment(self) -> bool:
+        """True when the two lists share most of their IDs"""
+        larger = self.kept + max(len(self.added), len(self.removed))
+        return self.kept >= AMENDMENT_MIN_OVERLAP * larger
+
+    def summary(self) -> str:
+        text = f"+{len(self.added):,} added, −{len(self.removed):,} withdrawn"
+        if self.withdrawn:
+            text += f" ({len(self.withdrawn):,} already scanned)"
+        return text
+
+
+def _missing(codes: List[str], barcodes) -> List[str]:
+    """The `codes` that aren't in `barcodes`"""
+    if isinstance(barcodes, CompactIdSet):
+        found = barcodes.contains_many(codes)
+    else:
+        found = np.fromiter(map(barcodes.__contains__, codes), bool, len(codes))
+    return np.asarray(codes, dtype=object)[~found].tolist()
+
+
+def manifest_delta(current, amended) -> ManifestDelta:
+    """Added and removed IDs going from `current` to `amended` (sets or CompactIdSets)"""
+    if isinstance(current, (set, frozenset)) and isinstance(amended, (set, frozenset)):
+        added, removed = list(amended - current), list(current - amended)
+    elif isinstance(current, CompactIdSet) and isinstance(amended, CompactIdSet):
+        added, removed = amended.difference(current), current.difference(amended)
+    else:
+        added, removed = _missing(list(amended), current), _missing(list(current), amended)
+    return ManifestDelta(added, removed, len(current) - len(removed))
+
+
+def apply_delta(barcodes, delta: ManifestDelta, chunk: int = APPLY_CHUNK) -> None:
+    """Apply `delta` to an ID set in place (one no other thread is reading)
+
+    Added IDs go in first, so new parcels scan as valid as soon as possible.
+    """
+    if isinstance(barcodes, CompactIdSet):
+        barcodes.apply_delta(delta.added, delta.removed)
+        return
+    for i in range(0, len(delta.added), chunk):
+        barcodes.update(delta.added[i:i + chunk])
+    for i in range(0, len(delta.removed), chunk):
+        barcodes.difference_update(delta.removed[i:i + chunk])
+
+
+def apply_amendment(amended, ledger) -> Optional[ManifestDelta]:
+    """Make `amended` the ledger's live ID set if it's a revision of the current one
+
+    The current `ledger.valid_ids` is left as it was: the delta is applied
+    to a copy, which replaces it for every station. Scans in `ledger` whose
+    IDs were withdrawn are flagged (and listed in the delta's `withdrawn`),
+    and the revision is linked to `ledger` so loading it later resumes the
+    same scans. Returns None, changing nothing, when the ledger has no ID
+    set yet or `amended` is a different manifest.
+    """
+    with ledger.amend_lock:
+        current = ledger.valid_ids
+        if current is None:
+            return None
+        delta = manifest_delta(current, amended)
+        if not delta.is_amendment:
+            return None
+        if delta:
+            updated = current.copy()
+            apply_delta(updated, delta)
+            ledger.valid_ids = updated
+            # After publishing, so claims made against the old set up to now are flagged
+            delta.withdrawn = ledger.withdraw(delta.removed, restored=delta.added)
+            link_manifest(updated, ledger)
+    return delta
+
+
+def watch_path(path: str, root: Optional[str] = WATCH_ROOT) -> str:
+    """`path` (relative to `root`) as a real path, if it lies inside `root`
+
+    Raises ValueError when no root is configured or the path leaves it,
+    through '..' or a symlink.
+    """
+    if not root:
+        raise ValueError("Watching is off - set SCANNER_WATCH_ROOT on the server to enable it")
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Only folders inside {root} can be watched")
+    return resolved
+
+
+class ManifestWatcher:
+    """Loads a manifest file - or the newest one in a folder - whenever it changes
+
+    `path` is taken relative to `root` and must stay inside it (see
+    watch_path()); pass root=None only for paths the user can't choose.
+    """
+
+    def __init__(self, path: str, root: Optional[str] = WATCH_ROOT):
+        self.path = path
+        self.root = root
+        self.real_path = watch_path(path, root) if root is not None else path
+        self.error: Optional[str] = None  # why the latest version failed to load
+        self._seen: Optional[Tuple[str, int, int]] = None
+
+    def current(self) -> Optional[str]:
+        """The manifest file being watched, if there is one"""
+        if not os.path.isdir(self.real_path):
+            return self.real_path if os.path.isfile(self.real_path) else None
+        files = [path for path in glob.glob(os.path.join(glob.escape(self.real_path), '*'))
+                 if path.lower().endswith(MANIFEST_EXTENSIONS)
+                 and not os.path.basename(path).startswith(('.', '~$'))  # editor lock files
+                 and self._inside_root(path)]
+        return max(files, key=os.path.getmtime, default=None)
+
+    def _inside_root(self, path: str) -> bool:
+        # A symlink in the watched folder mustn't lead out of the root
+        if self.root is None:
+            return True
+        root = os.path.realpath(self.root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    def poll(self) -> Optional[Tuple[str, Manifest]]:
+        """(key, manifest) when the watched file is new or has changed, else None
+
+        The key names this version of the file. A version that fails to
+        load sets `error` and is retried only after it changes again.
+        """
+        path = self.current()
+        if path is None:
+            return None
+        stat = os.stat(path)
+        signature = (path, stat.st_mtime_ns, stat.st_size)
+        if signature == self._seen or time.time() - stat.st_mtime < SETTLE_SECONDS:
+            return None
+        self._seen = signature
+        try:
+            manifest = load_manifest(path)
+        except Exception as e:
+            self.error = f"{os.path.basename(path)}: {e}"
+            return None
+        self.error = None
+        return f"{path}@{stat.st_mtime_ns}", manifest
+
+
+def _chunk_pauses(barcodes, delta: ManifestDelta, chunk: int) -> Iterable[float]:
+    """apply_delta() one chunk at a time, yielding how long each call held the GIL"""
+    for codes, apply in ((delta.added, barcodes.update), (delta.removed, barcodes.difference_update)):
+        for i in range(0, len(codes), chunk):
+            start = time.perf_counter()
+            apply(codes[i:i + chunk])
+            yield time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # Quick benchmark: python -m scanner_core.amend [ids] [changed fraction]
+    import random
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_200_000
+    changed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    rng = random.Random(0)
+    ids = [f"TBA{code:012d}" for code in rng.sample(range(10 ** 12), count + int(count * changed))]
+    before, after = ids[:count], ids[int(count * changed):]
+
+    for name, store in (('set', set), ('compact', CompactIdSet)):
+        current, amended = store(before), store(after)
+        start = time.perf_counter()
+        delta = manifest_delta(current, amended)
+        diffed = time.perf_counter() - start
+        start = time.perf_counter()
+        if store is set:
+            longest = max(_chunk_pauses(current, delta, APPLY_CHUNK))
+        else:
+            apply_delta(current, delta)  # pure Python: other threads get the GIL every 5 ms
+            longest = None
+        applied = time.perf_counter() - start
+        assert len(current) == len(amended) and all(code in current for code in delta.added[:1000])
+        print(f"{name}: {count:,} IDs, {delta.summary()}; delta in {diffed * 1e3:.0f} ms, "
+              f"applied in {applied * 1e3:.1f} ms"
+              + (f" (longest set call {longest * 1e3:.2f} ms)" if longest is not None else ""))
@@ -0,0 +1,135 @@
+"""
+Parallel decoding of many images.
+
+decode_images() fans image files out over a worker pool and yields each
+result as soon as it is ready, so callers can stream results into the
+ledger and show progress. At most a few images per worker are in flight at
+once, which keeps memory flat for arbitrarily long inputs.
+
+Threads are the default: pyzbar (ctypes), OpenCV and Pillow's decoder all
+release the GIL for the heavy work. Use processes=True for headless runs.
+"""
+
+import io
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import PIL.Image
+
+from .cascade import DEFAULT_BUDGET, decode_cascade
+from .decoder import detect_barcodes
+from .prefilter import FILTER_REASONS
+
+
+def decode_image_file(source, budget: float = DEFAULT_BUDGET,
+                      decode: Callable = detect_barcodes, id_filter=None) -> Dict:
+    """Open one image (path, file-like or bytes) and run the decode cascade
+
+    `decode` is handed to decode_cascade. With an IdFilter, decoding is
+    restricted by it, and an image with no tracking ID gets 'filtered': the
+    codes it did carry, tagged with why they were dropped (IdFilter.explain).
+    Never raises: unreadable images come back with no detections and an
+    'error' message.
+    """
+    start = time.perf_counter()
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with PIL.Image.open(source) as image:
+            image.draft('L', (4096, 4096))  # cheaper JPEG decode for huge photos
+            if id_filter is None:
+                result = decode_cascade(image, budget, decode=decode)
+            else:
+                result = decode_cascade(image, budget, decode=id_filter.wrap(decode))
+                result['filtered'] = [] if result['detections'] else id_filter.explain(image, decode)
+        result['elapsed'] = time.perf_counter() - start
+        result['error'] = None
+    except Exception as e:
+        result = {
+            'detections': [],
+            'stage': None,
+            'elapsed': time.perf_counter() - start,
+            'attempts': [],
+            'error': str(e),
+        }
+    return result
+
+
+def result_rows(name: str, result: Dict) -> List[Dict]:
+    """Flatten one image's result into table rows, one per detected barcode"""
+    ms = result['elapsed'] * 1000
+    if result.get('filtered'):
+        # No tracking ID, but codes the manifest filter dropped
+        return [
+            {
+                'file': name,
+                'barcode': barcode_info['data'],
+                'symbology': barcode_info['type'],
+                'status': f"Filtered: {FILTER_REASONS[barcode_info['filtered']]}",
+                'closest_id': barcode_info.get('suggestion') or '',
+                'stage': result['stage'],
+                'ms': ms,
+            }
+            for barcode_info in result['filtered']
+        ]
+    if not result['detections']:
+        return [{
+            'file': name,
+            'barcode': '',
+            'symbology': '',
+            'status': 'Unreadable' if result.get('error') else 'No barcode',
+            'closest_id': '',
+            'stage': result['stage'],
+            'ms': ms,
+        }]
+    return [
+        {
+            'file': name,
+            'barcode': barcode_info['data'],
+            'symbology': barcode_info['type'],
+            'status': barcode_info.get('status', ''),
+            'closest_id': barcode_info.get('suggestion') or '',
+            'stage': result['stage'],
+            'ms': ms,
+        }
+        for barcode_info in result['detections']
+    ]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def decode_images(sources: Iterable[Tuple[object, object]],
+                  workers: Optional[int] = None, processes: bool = False,
+                  budget: float = DEFAULT_BUDGET,
+                  max_pending: Optional[int] = None,
+                  decode: Callable = detect_barcodes,
+                  id_filter=None) -> Iterator[Tuple[object, Dict]]:
+    """Decode (key, source) pairs in parallel, yielding (key, result) as they complete
+
+    `source`, `decode` and `id_filter` are as for decode_image_file; with
+    processes=True they must be picklable (a path or bytes). Results arrive
+    in completion order.
+    """
+    workers = workers or default_workers()
+    max_pending = max_pending or workers * 2
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    with pool_class(max_workers=workers) as pool:
+        pending = {}
+        for key, source in sources:
+            pending[pool.submit(decode_image_file, source, budget, decode, id_filter)] = key
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
@@ -0,0 +1,206 @@
+"""
+Time-budgeted decode cascade for uploaded photos.
+
+A single pyzbar pass over a full-resolution phone photo often misses
+barcodes that are recoverable: a tiny label in a 12 MP frame, glare, or a
+slight rotation. decode_cascade() tries progressively more expensive
+variants of the image - downscaled, full resolution, binarized, sharpened,
+rotated - and stops at the first stage that finds something or when the
+time budget runs out. CascadeStats tallies which stage succeeded so the
+order can be tuned for first-hit rate and average latency.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .decoder import detect_barcodes
+
+# Default per-image time budget in seconds
+DEFAULT_BUDGET = 2.0
+
+# Width used by the first, cheap pass
+FAST_WIDTH = 1024
+
+
+def to_gray(image) -> np.ndarray:
+    """Convert a PIL image or BGR/RGB/gray array to a 2-D uint8 array"""
+    if hasattr(image, 'convert'):  # PIL.Image
+        return np.asarray(image.convert('L'))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _downscaled(gray):
+    height, width = gray.shape[:2]
+    if width <= FAST_WIDTH:
+        return gray, None
+    scale = FAST_WIDTH / width
+    small = cv2.resize(gray, (FAST_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)
+    return small, np.array([[scale, 0, 0], [0, scale, 0]], dtype=np.float64)
+
+
+def _full(gray):
+    return gray, None
+
+
+def _binarized(gray):
+    # Otsu threshold on a lightly blurred image cuts through glare and low contrast
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary, None
+
+
+def _sharpened(gray):
+    # Unsharp mask for slightly out-of-focus labels
+    blurred = cv2.GaussianBlur(gray, (0, 0), 3)
+    return cv2.addWeighted(gray, 1.5, blurred, -0.5, 0), None
+
+
+def _rotated(angle: float):
+    def rotate(gray):
+        height, width = gray.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+
+        # Grow the canvas so the corners aren't cut off
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_width = int(height * sin + width * cos)
+        new_height = int(height * cos + width * sin)
+        matrix[0, 2] += new_width / 2 - width / 2
+        matrix[1, 2] += new_height / 2 - height / 2
+
+        rotated = cv2.warpAffine(gray, matrix, (new_width, new_height),
+                                 borderMode=cv2.BORDER_REPLICATE)
+        return rotated, matrix
+    return rotate
+
+
+# (name, transform) pairs, cheapest and most likely first. A transform returns
+# the image to decode and the 2x3 affine matrix that maps original
+# coordinates into it (None for identity).
+CASCADE_STAGES: List[Tuple[str, Callable]] = [
+    ('downscaled', _downscaled),
+    ('full', _full),
+    ('binarized', _binarized),
+    ('sharpened', _sharpened),
+    ('rotate_90', _rotated(90)),
+    ('rotate_15', _rotated(15)),
+    ('rotate_-15', _rotated(-15)),
+]
+
+
+def _map_back(detections: List[Dict], matrix: Optional[np.ndarray]):
+    """Map locations from a transformed image back to original coordinates"""
+    if matrix is None:
+        return
+    inverse = cv2.invertAffineTransform(matrix)
+    for barcode_info in detections:
+        x, y, w, h = barcode_info['location']
+        corners = np.array([[x, y, 1], [x + w, y, 1], [x, y + h, 1], [x + w, y + h, 1]],
+                           dtype=np.float64)
+        mapped = corners @ inverse.T
+        x0, y0 = mapped.min(axis=0)
+        x1, y1 = mapped.max(axis=0)
+        barcode_info['location'] = (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+
+def decode_cascade(image, budget: float = DEFAULT_BUDGET,
+                   stages: Sequence[Tuple[str, Callable]] = CASCADE_STAGES,
+                   decode: Callable = detect_barcodes) -> Dict:
+    """Run the decode cascade on one image
+
+    Returns {'detections', 'stage', 'elapsed', 'attempts'}, where 'stage' is
+    the name of the stage that succeeded (None if none did) and 'attempts'
+    lists (stage, seconds) for every stage that ran. The first stage always
+    runs; later stages only start while the budget has time left. A stage
+    whose variant is the untouched image is skipped once that image has been
+    decoded (small photos aren't downscaled, so 'full' would repeat it).
+    """
+    start = time.perf_counter()
+    gray = to_gray(image)
+    attempts = []
+    decoded_original = False
+
+    for name, transform in stages:
+        if attempts and time.perf_counter() - start >= budget:
+            break
+        stage_start = time.perf_counter()
+        variant, matrix = transform(gray)
+        original = variant is gray and matrix is None
+        if original and decoded_original:
+            continue
+        decoded_original = decoded_original or original
+        detections = decode(variant)
+        attempts.append((name, time.perf_counter() - stage_start))
+
+        if detections:
+            _map_back(detections, matrix)
+            for barcode_info in detections:
+                barcode_info['stage'] = name
+            return {
+                'detections': detections,
+                'stage': name,
+                'elapsed': time.perf_counter() - start,
+                'attempts': attempts,
+            }
+
+    return {
+        'detections': [],
+        'stage': None,
+        'elapsed': time.perf_counter() - start,
+        'attempts': attempts,
+    }
+
+
+class CascadeStats:
+    """Running tally of which cascade stage succeeded, for tuning the order"""
+
+    def __init__(self):
+        self.images = 0
+        self.first_hits = 0  # decoded by whichever stage ran first
+        self.misses = 0
+        self.total_seconds = 0.0
+        self.hits: Dict[str, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_runs: Dict[str, int] = {}
+
+    def add(self, result: Dict):
+        self.images += 1
+        self.total_seconds += result['elapsed']
+        if result['stage'] is None:
+            self.misses += 1
+        else:
+            self.hits[result['stage']] = self.hits.get(result['stage'], 0) + 1
+            if result['stage'] == result['attempts'][0][0]:
+                self.first_hits += 1
+        for name, seconds in result['attempts']:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_runs[name] = self.stage_runs.get(name, 0) + 1
+
+    @property
+    def first_hit_rate(self) -> float:
+        """Share of images decoded by the first stage that ran"""
+        if not self.images:
+            return 0.0
+        return self.first_hits / self.images
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_seconds / self.images if self.images else 0.0
+
+    def rows(self) -> List[Dict]:
+        """Per-stage summary for display (default stages, then any custom ones that ran)"""
+        names = [name for name, _ in CASCADE_STAGES]
+        names += [name for name in self.stage_runs if name not in names]
+        return [
+            {
+                'stage': name,
+                'hits': self.hits.get(name, 0),
+                'runs': self.stage_runs.get(name, 0),
+                'avg_ms': 1000 * self.stage_seconds.get(name, 0.0) / max(self.stage_runs.get(name, 0), 1),
+            }
+            for name in names
+        ]
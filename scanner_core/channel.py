@@ -0,0 +1,41 @@
+"""
+Thread-safe hand-off of scan results from the WebRTC/decode threads to the
+Streamlit script.
+
+Worker threads must not touch st.session_state. Instead they put events on
+a ResultChannel owned by the video processor, and the script drains it on a
+short polling timer. The channel is bounded: if the script falls behind, the
+oldest events are dropped (they are already recorded in the ledger).
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List
+
+
+class ResultChannel:
+    """Bounded, lock-protected queue of scan events"""
+
+    def __init__(self, maxlen: int = 256):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=maxlen)
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def put(self, event: Dict) -> None:
+        """Publish an event (called from worker threads)"""
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self.published += 1
+
+    def drain(self) -> List[Dict]:
+        """Take all pending events, oldest first (called from the script)"""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
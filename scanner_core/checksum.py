@@ -0,0 +1,103 @@
+"""
+Check-digit validation for tracking IDs.
+
+A one-character misread of a tracking ID is, as far as the manifest is
+concerned, just another invalid code. When the IDs carry a check digit the
+misread can be told apart: it fails the check, so it is a corrupt read of
+*some* label rather than a parcel that isn't on the list, and the decoder
+is simply given another frame (or the next cascade stage).
+
+zbar already verifies the symbol-level checks - EAN/UPC check digits and
+Code 128's mod-103 character - before it reports a read. What it cannot
+see is a check digit inside the payload: an SSCC or an S10 number printed
+as Code 128, Code 39 or Interleaved 2 of 5. That is what is checked here.
+
+Two schemes cover the IDs we see:
+
+- 'gs1': the mod-10 (3-1 weighted) digit used by EAN/UPC, ITF-14, SSCC and
+  many all-digit carrier IDs
+- 's10': the UPU S10 mod-11 digit of international postal items
+  (two letters, eight digits, check digit, two letters: 'RR123456785GB')
+
+A scheme is only applied to IDs of a given shape when every manifest ID of
+that shape satisfies it, so a manifest ID can never be rejected as corrupt.
+"""
+
+import re
+from typing import Optional, Sequence
+
+import numpy as np
+
+GS1 = 'gs1'
+S10 = 's10'
+
+# A scheme is inferred only from at least this many IDs; one in ten random
+# digit strings passes a mod-10 check by chance
+MIN_CHECKED_IDS = 20
+
+S10_MASK = 'AA999999999AA'
+S10_PATTERN = re.compile(r'[A-Z]{2}\d{9}[A-Z]{2}')
+S10_WEIGHTS = (8, 6, 4, 2, 3, 5, 9, 7)
+
+
+def gs1_check_ok(digits: str) -> bool:
+    """True if the last digit is the GS1 (EAN/UPC/ITF/SSCC) check digit of the rest"""
+    if not digits.isdigit() or len(digits) < 2:
+        return False
+    body = digits[:-1]
+    # Weights 3,1,3,... counted from the digit next to the check digit
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == int(digits[-1])
+
+
+def s10_check_digit(serial: str) -> int:
+    """UPU S10 check digit of an eight-digit serial number"""
+    check = 11 - sum(int(d) * w for d, w in zip(serial, S10_WEIGHTS)) % 11
+    return {10: 0, 11: 5}.get(check, check)
+
+
+def s10_check_ok(code: str) -> bool:
+    """True for a well-formed S10 item ID with a correct check digit"""
+    return bool(S10_PATTERN.fullmatch(code)) and s10_check_digit(code[2:10]) == int(code[10])
+
+
+CHECKS = {GS1: gs1_check_ok, S10: s10_check_ok}
+
+
+def check_ok(code: str, scheme: str) -> bool:
+    return CHECKS[scheme](code)
+
+
+def checkable(mask: str) -> bool:
+    """True for ID shapes (see prefilter.id_shape) that could carry a known check digit"""
+    return (mask.isdigit() and len(mask) > 1) or mask == S10_MASK
+
+
+def _digit_matrix(codes: Sequence[str], length: int) -> np.ndarray:
+    return np.frombuffer(''.join(codes).encode('ascii'), np.uint8).reshape(-1, length) - ord('0')
+
+
+def _all_gs1(codes: Sequence[str], length: int) -> bool:
+    digits = _digit_matrix(codes, length).astype(np.int32)
+    # Weights 3,1,3,... from the right, excluding the check digit
+    weights = np.where(np.arange(length - 1)[::-1] % 2 == 0, 3, 1)
+    checks = (10 - (digits[:, :-1] @ weights) % 10) % 10
+    return bool((checks == digits[:, -1]).all())
+
+
+def _all_s10(codes: Sequence[str]) -> bool:
+    serials = _digit_matrix([code[2:11] for code in codes], 9).astype(np.int32)
+    check = 11 - (serials[:, :8] @ np.array(S10_WEIGHTS)) % 11
+    check = np.where(check == 10, 0, np.where(check == 11, 5, check))
+    return bool((check == serials[:, 8]).all())
+
+
+def infer_check(codes: Sequence[str], mask: str) -> Optional[str]:
+    """Scheme that every one of `codes` (all of shape `mask`) satisfies, if any"""
+    if len(codes) < MIN_CHECKED_IDS:
+        return None
+    if mask.isdigit() and len(mask) > 1:
+        return GS1 if _all_gs1(codes, len(mask)) else None
+    if mask == S10_MASK:
+        return S10 if _all_s10(codes) else None
+    return None
@@ -0,0 +1,42 @@
+"""
+Scan classification: decide whether a decoded barcode is valid, a duplicate
+or not on the manifest, and record the outcome in a ScanLedger.
+"""
+
+from typing import Dict, List, Optional
+
+# Scan statuses, as shown in the history table and export
+VALID = 'Valid'
+DUPLICATE = 'Duplicate'
+INVALID = 'Invalid'
+
+
+def classify(barcode: str, valid_barcodes, scanned) -> str:
+    """Return the status of `barcode` given the manifest and the claimed codes"""
+    if barcode not in valid_barcodes:
+        return INVALID
+    if barcode in scanned:
+        return DUPLICATE
+    return VALID
+
+
+def classify_detections(detections: List[Dict], valid_barcodes, ledger,
+                        source: Optional[str] = None,
+                        station: Optional[str] = None,
+                        near_miss=None) -> List[Dict]:
+    """Record each detection in `ledger` and tag it with its 'status'
+
+    Duplicates also get 'claimed_by', the station that scanned the code first.
+    With a NearMissIndex, invalid codes get 'suggestion', the manifest ID
+    they most likely are a misread of (or None), unless an IdFilter already
+    looked it up.
+    """
+    for detection in detections:
+        detection['status'] = ledger.record(
+            detection['data'], valid_barcodes, source=source, station=station
+        )
+        if detection['status'] == DUPLICATE:
+            detection['claimed_by'] = ledger.claimed_by(detection['data'])
+        elif detection['status'] == INVALID and near_miss is not None and 'suggestion' not in detection:
+            detection['suggestion'] = near_miss.suggest(detection['data'])
+    return detections
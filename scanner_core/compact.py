@@ -0,0 +1,471 @@
+"""
+Compact storage for multi-million-ID manifests.
+
+A Python set of str costs 80-100 bytes per tracking ID (the str object,
+its hash slot and the set's spare capacity), so a 5M-row national manifest
+takes hundreds of MB per session before any scanning starts. CompactIdSet
+keeps the same membership API (`in`, len, iteration) in flat numpy arrays:
+
+- all-digit IDs of up to 19 characters as sorted uint64 arrays, one per
+  length (so leading zeros are kept), searched with binary search
+- every other ID in a fixed-width byte matrix per length - a packed string
+  buffer without per-ID objects - indexed by an open-addressing hash table
+  of int32 row numbers
+- optionally a Bloom filter in front, which turns most invalid reads away
+  after a few bit tests
+
+Amendments don't repack anything: apply_delta() keeps the added and
+removed IDs in two small sets consulted before the packed arrays, and
+copy() shares the arrays, so an amended copy costs only those sets.
+
+contains_many() answers a batch of lookups with one vectorized pass per
+ID length, which is how NearMissIndex probes its candidate edits. Single
+lookups go through memoryviews of the arrays, so they run as plain Python
+integer and bytes compares without creating numpy scalars.
+"""
+
+import copy
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# Longest all-digit ID that fits in a uint64
+MAX_NUMERIC_DIGITS = 19
+
+# Sorted numeric IDs keep every FENCE_STEP-th value in a Python list, so a
+# lookup bisects that first and then only a short stretch of the array
+FENCE_STEP = 64
+
+_MASK64 = (1 << 64) - 1
+# Hash of an ID's bytes: their little-endian integer value modulo a prime
+# below 2**55, so that the vectorized Horner evaluation stays within uint64
+_PRIME = (1 << 55) - 55
+# Fibonacci hashing spreads that (or a numeric ID) over 64 bits
+_FIBONACCI = 0x9E3779B97F4A7C15
+
+
+def _hash_bytes(data: bytes) -> int:
+    """Hash of an ID's bytes (one C-level big-int operation)"""
+    return int.from_bytes(data, 'little') % _PRIME
+
+
+def _hash_rows(rows: np.ndarray) -> np.ndarray:
+    """_hash_bytes() of every row of a uint8 matrix"""
+    h = np.zeros(len(rows), np.uint64)
+    for i in range(rows.shape[1] - 1, -1, -1):
+        h = (h * np.uint64(256) + rows[:, i].astype(np.uint64)) % np.uint64(_PRIME)
+    return h
+
+
+def _spread(h: int) -> int:
+    return (h * _FIBONACCI) & _MASK64
+
+
+def _spread_array(h: np.ndarray) -> np.ndarray:
+    return h * np.uint64(_FIBONACCI)
+
+
+def _byte_matrix(codes: Sequence[str], length: int) -> np.ndarray:
+    return np.frombuffer(''.join(codes).encode('ascii'), np.uint8).reshape(len(codes), length)
+
+
+def _rows_by_length(codes: List[str]):
+    """Split IDs into one uint8 matrix per length, with one encode for all of them
+
+    Returns ({length: rows}, set of non-ASCII and empty IDs).
+    """
+    other = set()
+    if not ''.join(codes).isascii():
+        other = {code for code in codes if not code.isascii()}
+        codes = [code for code in codes if code.isascii()]
+    lengths = np.fromiter(map(len, codes), np.int64, len(codes))
+    buffer = np.frombuffer(''.join(codes).encode('ascii'), np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    if (lengths == 0).any():
+        other.add('')
+
+    by_length = {}
+    present = np.flatnonzero(np.bincount(lengths)) if len(lengths) else lengths
+    for length in present[present > 0].tolist():
+        first = starts[lengths == length]
+        by_length[length] = buffer[first[:, None] + np.arange(length)]
+    return by_length, other
+
+
+def _digit_values(rows: np.ndarray) -> np.ndarray:
+    """uint64 values of a matrix of ASCII digit rows"""
+    values = np.zeros(len(rows), np.uint64)
+    for i in range(rows.shape[1]):
+        values = values * np.uint64(10) + (rows[:, i] - ord('0')).astype(np.uint64)
+    return values
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _drop_duplicate_rows(rows: np.ndarray, hashes: np.ndarray):
+    """Rows and hashes without repeated rows (repeats share a hash, so sort by that)"""
+    order = np.argsort(hashes)
+    same = hashes[order[1:]] == hashes[order[:-1]]
+    if not same.any():
+        return rows, hashes
+    first, second = order[:-1][same], order[1:][same]
+    repeated = second[(rows[first] == rows[second]).all(axis=1)]
+    keep = np.ones(len(rows), bool)
+    keep[repeated] = False
+    return rows[keep], hashes[keep]
+
+
+class _HashedGroup:
+    """Alphanumeric IDs of one length: packed rows plus an open-addressing index"""
+
+    def __init__(self, rows: np.ndarray):
+        rows, hashes = _drop_duplicate_rows(rows, _hash_rows(rows))
+        self.rows = rows
+        bits = max(int(2 * len(rows) - 1).bit_length(), 4)  # load factor <= 0.5
+        self.shift = 64 - bits
+        self.mask = (1 << bits) - 1
+        self.table = np.full(1 << bits, -1, np.int32)
+
+        # Insert everything at once; rows that lose a slot move one on and retry
+        slots = self._slots(hashes)
+        pending = np.arange(len(rows))
+        while len(pending):
+            free = self.table[slots[pending]] == -1
+            contenders = pending[free]
+            taken, first = np.unique(slots[contenders], return_index=True)
+            self.table[taken] = contenders[first]
+            placed = np.zeros(len(rows), bool)
+            placed[contenders[first]] = True
+            pending = pending[~placed[pending]]
+            slots[pending] = (slots[pending] + 1) & self.mask
+
+        self._table = memoryview(self.table)
+        self._flat = memoryview(self.rows.reshape(-1))
+        self._width = rows.shape[1]
+
+    def _slots(self, hashes: np.ndarray) -> np.ndarray:
+        return (_spread_array(hashes) >> np.uint64(self.shift)).astype(np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.table.nbytes
+
+    def __contains__(self, data: bytes) -> bool:
+        slot = _spread(_hash_bytes(data)) >> self.shift
+        table, flat, width = self._table, self._flat, self._width
+        while True:
+            row = table[slot]
+            if row < 0:
+                return False
+            if flat[row * width:(row + 1) * width] == data:
+                return True
+            slot = (slot + 1) & self.mask
+
+    def contains_rows(self, queries: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(queries), bool)
+        slots = self._slots(_hash_rows(queries))
+        active = np.arange(len(queries))
+        # Vectorized probing while there are many queries left; the few in
+        # long probe chains finish faster one at a time
+        while len(active) > 16:
+            rows = self.table[slots[active]]
+            occupied = rows >= 0
+            match = occupied.copy()
+            match[occupied] = (self.rows[rows[occupied]] == queries[active[occupied]]).all(axis=1)
+            found[active[match]] = True
+            active = active[occupied & ~match]
+            slots[active] = (slots[active] + 1) & self.mask
+        for i in active.tolist():
+            found[i] = queries[i].tobytes() in self
+        return found
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self.rows:
+            yield row.tobytes().decode('ascii')
+
+
+class _BloomFilter:
+    """Bloom filter over 64-bit ID hashes (double hashing)"""
+
+    def __init__(self, hashes: np.ndarray, bits_per_id: int):
+        self.size = max(int(len(hashes) * bits_per_id), 64)
+        self.probes = max(1, round(bits_per_id * 0.693))  # optimal k = bits/ID * ln 2
+        self.bits = np.zeros((self.size + 7) // 8, np.uint8)
+        for position in self._positions(hashes):
+            np.bitwise_or.at(self.bits, position >> 3, (1 << (position & 7)).astype(np.uint8))
+        self._bits = memoryview(self.bits)
+
+    def _positions(self, hashes: np.ndarray):
+        hashes = _spread_array(hashes)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        for i in range(self.probes):
+            yield ((h1 + np.uint64(i) * h2) % np.uint64(self.size)).astype(np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def __contains__(self, h: int) -> bool:
+        h = _spread(h)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        bits, size = self._bits, self.size
+        for i in range(self.probes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+
+def _numeric_hash(value: int, length: int) -> int:
+    return (value + length) & _MASK64
+
+
+def _id_hash(code: str) -> int:
+    """The hash the Bloom filter uses: the value for numeric IDs, the bytes otherwise"""
+    if len(code) <= MAX_NUMERIC_DIGITS and code.isascii() and code.isdigit():
+        return _numeric_hash(int(code), len(code))
+    return _hash_bytes(code.encode('utf-8'))
+
+
+class CompactIdSet:
+    """Set of tracking IDs packed into numpy arrays (amended with apply_delta())"""
+
+    def __init__(self, barcodes: Iterable[str], bloom_bits_per_id: int = 0):
+        codes = barcodes if isinstance(barcodes, list) else list(barcodes)
+        by_length, self._other = _rows_by_length(codes)  # non-ASCII/empty IDs stay in a set
+        del codes
+
+        self._numeric: Dict[int, np.ndarray] = {}
+        self._numeric_views: Dict[int, memoryview] = {}
+        self._fences: Dict[int, List[int]] = {}
+        self._hashed: Dict[int, _HashedGroup] = {}
+        bloom_hashes = []
+        for length, rows in by_length.items():
+            digits = ((rows >= ord('0')) & (rows <= ord('9'))).all(axis=1)
+            if length > MAX_NUMERIC_DIGITS:
+                digits[:] = False
+            if digits.any():
+                values = _sorted_unique(_digit_values(rows[digits]))
+                self._numeric[length] = values
+                self._numeric_views[length] = memoryview(values)
+                self._fences[length] = values[::FENCE_STEP].tolist()
+                if bloom_bits_per_id:
+                    bloom_hashes.append(values + np.uint64(length))
+            if not digits.all():
+                group = self._hashed[length] = _HashedGroup(rows[~digits])
+                if bloom_bits_per_id:
+                    bloom_hashes.append(_hash_rows(group.rows))
+
+        self._len = (sum(len(v) for v in self._numeric.values()) +
+                     sum(len(g.rows) for g in self._hashed.values()) + len(self._other))
+        self._added = set()    # amendments on top of the packed arrays
+        self._removed = set()
+        self.bloom: Optional[_BloomFilter] = None
+        if bloom_bits_per_id:
+            hashes = np.concatenate(bloom_hashes) if bloom_hashes else np.zeros(0, np.uint64)
+            other = np.array([_id_hash(code) for code in self._other], np.uint64)
+            self.bloom = _BloomFilter(np.concatenate([hashes, other]), bloom_bits_per_id)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __contains__(self, code) -> bool:
+        if not isinstance(code, str):
+            return False
+        if self._added or self._removed:
+            if code in self._added:
+                return True
+            if code in self._removed:
+                return False
+        return self._packed_contains(code)
+
+    def _packed_contains(self, code: str) -> bool:
+        if self.bloom is not None and _id_hash(code) not in self.bloom:
+            return False
+        length = len(code)
+        if length <= MAX_NUMERIC_DIGITS and code.isascii() and code.isdigit():
+            fences = self._fences.get(length)
+            if fences is None:
+                return False
+            value = int(code)
+            stretch = bisect_left(fences, value)
+            if stretch < len(fences) and fences[stretch] == value:
+                return True
+            if stretch == 0:
+                return False
+            values = self._numeric_views[length]
+            start = (stretch - 1) * FENCE_STEP
+            i = bisect_left(values, value, start + 1, min(start + FENCE_STEP, len(values)))
+            return i < len(values) and values[i] == value
+        if not code or not code.isascii():
+            return code in self._other
+        group = self._hashed.get(length)
+        return group is not None and code.encode('ascii') in group
+
+    def contains_many(self, codes: Sequence[str]) -> np.ndarray:
+        """Vectorized membership: one bool per code"""
+        found = np.zeros(len(codes), bool)
+        by_length: Dict[int, List[int]] = {}
+        for i, code in enumerate(codes):
+            if code and code.isascii():
+                by_length.setdefault(len(code), []).append(i)
+            else:
+                found[i] = code in self._other
+        for length, indices in by_length.items():
+            found[indices] = self._packed_rows(_byte_matrix([codes[i] for i in indices], length))
+        return self._amended(codes, found)
+
+    def contains_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Vectorized membership of ASCII IDs given as one uint8 row each (all one length)"""
+        found = self._packed_rows(rows)
+        if self._added or self._removed:
+            found = self._amended([row.tobytes().decode('ascii') for row in rows], found)
+        return found
+
+    def _amended(self, codes: Sequence[str], found: np.ndarray) -> np.ndarray:
+        if self._added or self._removed:
+            for i, code in enumerate(codes):
+                if code in self._added:
+                    found[i] = True
+                elif code in self._removed:
+                    found[i] = False
+        return found
+
+    def _packed_rows(self, rows: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(rows), bool)
+        length = rows.shape[1]
+        digits = ((rows >= ord('0')) & (rows <= ord('9'))).all(axis=1)
+        if length > MAX_NUMERIC_DIGITS or length == 0:
+            digits[:] = False
+        values = self._numeric.get(length)
+        if values is not None and digits.any():
+            queries = _digit_values(rows[digits])
+            positions = np.minimum(values.searchsorted(queries), len(values) - 1)
+            found[digits] = values[positions] == queries
+        group = self._hashed.get(length)
+        if group is not None and not digits.all():
+            found[~digits] = group.contains_rows(rows[~digits])
+        return found
+
+    def __iter__(self) -> Iterator[str]:
+        removed = self._removed
+        for code in self._packed_iter():
+            if code not in removed:
+                yield code
+        yield from self._added
+
+    def _packed_iter(self) -> Iterator[str]:
+        for length, values in self._numeric.items():
+            for value in values.tolist():
+                yield f"{value:0{length}d}"
+        for group in self._hashed.values():
+            yield from group
+        yield from self._other
+
+    def difference(self, other: 'CompactIdSet') -> List[str]:
+        """IDs in this set that aren't in `other`, comparing the packed arrays directly"""
+        missing = []
+        for length, values in self._numeric.items():
+            theirs = other._numeric.get(length)
+            if theirs is not None:
+                positions = np.minimum(theirs.searchsorted(values), len(theirs) - 1)
+                values = values[theirs[positions] != values]
+            missing.extend(f"{value:0{length}d}" for value in values.tolist())
+        for length, group in self._hashed.items():
+            rows = group.rows
+            theirs = other._hashed.get(length)
+            if theirs is not None:
+                rows = rows[~theirs.contains_rows(rows)]
+            missing.extend(row.tobytes().decode('ascii') for row in rows)
+        missing.extend(self._other - other._other)
+        # The overlays are small; settle them one ID at a time
+        if self._removed or other._added:
+            missing = [code for code in missing if code not in self._removed and code not in other._added]
+        missing.extend(code for code in self._added if code not in other)
+        missing.extend(code for code in other._removed
+                       if code not in self._removed and self._packed_contains(code))
+        return missing
+
+    def copy(self) -> 'CompactIdSet':
+        """A copy sharing the packed arrays, with its own amendments"""
+        clone = copy.copy(self)
+        clone._added, clone._removed = set(self._added), set(self._removed)
+        return clone
+
+    def apply_delta(self, added: Iterable[str], removed: Iterable[str]) -> None:
+        """Add and remove IDs in place, without repacking the arrays"""
+        added, removed = set(added), set(removed)
+        # Build the new overlay aside and swap it in, so lookups from other
+        # threads never see a half-applied amendment
+        overlay_added = (self._added - removed) | {code for code in added - self._removed
+                                                   if not self._packed_contains(code)}
+        overlay_removed = (self._removed - added) | {code for code in removed - self._added
+                                                     if self._packed_contains(code)}
+        packed = self._len - len(self._added) + len(self._removed)
+        self._added, self._removed = overlay_added, overlay_removed
+        self._len = packed + len(overlay_added) - len(overlay_removed)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in the packed arrays"""
+        return (sum(v.nbytes for v in self._numeric.values()) +
+                sum(g.nbytes for g in self._hashed.values()) +
+                (self.bloom.nbytes if self.bloom is not None else 0))
+
+
+if __name__ == "__main__":
+    # Quick benchmark: python -m scanner_core.compact [ids]
+    import random
+    import sys
+    import time
+    import tracemalloc
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    manifests = {
+        'numeric': [f"{rng.randrange(10 ** 13):013d}" for _ in range(count)],
+        'alphanumeric': [f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(count)],
+    }
+
+    def lookup_us(container, probes) -> float:
+        start = time.perf_counter()
+        for code in probes:
+            code in container
+        return (time.perf_counter() - start) / len(probes) * 1e6
+
+    for name, ids in manifests.items():
+        hits = rng.sample(ids, 20_000)
+        misses = [code[:-4] + f"{rng.randrange(10 ** 4):04d}" for code in hits]
+        ids = list(dict.fromkeys(ids))
+        print(f"{name}: {len(ids):,} IDs")
+
+        tracemalloc.start()
+        as_set = set(ids)
+        set_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # The str objects belong to the set too; count them
+        set_bytes += sum(sys.getsizeof(code) for code in ids)
+        print(f"   set:                {set_bytes / len(ids):6.1f} B/ID, "
+              f"hit {lookup_us(as_set, hits):5.2f} us, miss {lookup_us(as_set, misses):5.2f} us")
+
+        for bloom in (0, 10):
+            start = time.perf_counter()
+            compact = CompactIdSet(ids, bloom_bits_per_id=bloom)
+            built = time.perf_counter() - start
+            assert all(code in compact for code in hits[:1000]) and len(compact) == len(ids)
+            batch = hits[:10_000] + misses[:10_000]
+            start = time.perf_counter()
+            compact.contains_many(batch)
+            batched = (time.perf_counter() - start) / len(batch) * 1e6
+            print(f"   compact{' + bloom' if bloom else '        '}:     "
+                  f"{compact.nbytes / len(ids):6.1f} B/ID, "
+                  f"hit {lookup_us(compact, hits):5.2f} us, miss {lookup_us(compact, misses):5.2f} us, "
+                  f"contains_many {batched:5.2f} us/ID, built in {built:.2f}s")
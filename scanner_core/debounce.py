@@ -0,0 +1,78 @@
+"""
+Per-code debounce and multi-frame consensus for live scanning.
+
+A single global cooldown after every read blocks the *next* parcel while
+the current one keeps being re-decoded. ScanGate instead remembers each
+accepted code for `ttl` seconds after it was last seen: repeats of that
+code are dropped in O(1), while a different code is accepted straight away.
+
+Optionally a code must be read in `consensus` of the last `window` decoded
+frames before it is accepted, which filters out one-frame misreads
+(truncated or misdecoded 1-D codes) at the cost of a few frames of latency.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List
+
+
+class ScanGate:
+    """Decides which decoded barcodes count as new scans"""
+
+    def __init__(self, ttl: float = 1.5, consensus: int = 1, window: int = 1):
+        self.ttl = ttl              # seconds a code stays suppressed after it was last seen
+        self.consensus = consensus  # reads needed ...
+        self.window = window        # ... within this many decoded frames
+        self.frames = 0
+        self.accepted = 0
+        self.suppressed = 0
+        self._recent: 'OrderedDict[str, float]' = OrderedDict()  # code -> last seen, oldest first
+        self._pending: Dict[str, List[int]] = {}  # code -> frame numbers it was read in
+
+    def __call__(self, detections: List[Dict], now: float) -> List[Dict]:
+        """Feed one decoded frame; returns the detections to record as scans"""
+        self.frames += 1
+        self._evict(now)
+
+        accepted = []
+        for barcode_info in detections:
+            code = barcode_info['data']
+            if code in self._recent:
+                # Still in view (or back within the TTL): refresh and drop
+                self._recent[code] = now
+                self._recent.move_to_end(code)
+                self.suppressed += 1
+                continue
+            if self.consensus > 1 and not self._confirmed(code):
+                continue
+            self._pending.pop(code, None)
+            self._recent[code] = now
+            self.accepted += 1
+            accepted.append(barcode_info)
+        return accepted
+
+    def _confirmed(self, code: str) -> bool:
+        reads = self._pending.setdefault(code, [])
+        reads.append(self.frames)
+        while reads and reads[0] <= self.frames - self.window:
+            reads.pop(0)
+        return len(reads) >= self.consensus
+
+    def _evict(self, now: float):
+        # Entries are ordered by last sighting, so expired ones are at the front
+        while self._recent:
+            code, seen = next(iter(self._recent.items()))
+            if now - seen <= self.ttl:
+                break
+            del self._recent[code]
+        if self._pending and self.frames % self.window == 0:
+            horizon = self.frames - self.window
+            for code in [c for c, reads in self._pending.items() if reads[-1] <= horizon]:
+                del self._pending[code]
+
+    def pending(self) -> int:
+        """Codes seen but not yet confirmed"""
+        return len(self._pending)
+
+    def reset(self):
+        self._recent.clear()
+        self._pending.clear()
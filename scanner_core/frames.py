@@ -0,0 +1,44 @@
+"""
+Zero-copy access to incoming video frames.
+
+pyzbar only ever looks at one 8-bit channel, so the live path reads the Y
+(luma) plane of the decoded frame directly instead of converting every frame
+to BGR and letting pyzbar throw two channels away again. Browser captures
+arrive as JPEG data URLs and are decoded straight to grayscale.
+"""
+
+import base64
+
+import cv2
+import numpy as np
+
+# Pixel formats whose first plane is 8-bit luma
+LUMA_FORMATS = {
+    'yuv420p', 'yuvj420p', 'yuv422p', 'yuvj422p', 'yuv444p', 'yuvj444p',
+    'nv12', 'nv21', 'gray'
+}
+
+
+def luma_view(frame) -> np.ndarray:
+    """Return the luma of an av.VideoFrame as a 2-D uint8 array
+
+    For planar YUV frames this is a view of the frame's own Y plane (no copy);
+    row padding is sliced off rather than copied. Other formats are converted.
+    """
+    if frame.format.name in LUMA_FORMATS:
+        plane = frame.planes[0]
+        rows = np.frombuffer(plane, np.uint8).reshape(-1, plane.line_size)
+        return rows[:plane.height, :plane.width]
+    return frame.to_ndarray(format="gray")
+
+
+def decode_data_url(data_url: str) -> np.ndarray:
+    """Decode a base64 image data URL (e.g. from canvas.toDataURL) to a 2-D uint8 array
+
+    Raises ValueError if the payload isn't a readable image.
+    """
+    payload = data_url.split(',', 1)[-1]
+    image = cv2.imdecode(np.frombuffer(base64.b64decode(payload), np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Captured frame could not be decoded")
+    return image
@@ -0,0 +1,45 @@
+"""
+Lookup structures built on a manifest's live ID set.
+
+Decoding and classification consult two indexes besides the ID set itself:
+the IdFilter (symbologies, ID shapes, check digits) and the NearMissIndex,
+which alone takes about 50 bytes per ID. Built per browser session, a 5M-ID
+manifest would cost a quarter of a GB for every station. ManifestIndexes
+holds both for one ID set, and shared_indexes() keeps one per ledger, next
+to the ID set it was built on (ScanLedger.indexes()): every station scanning
+the manifest uses the same copy.
+
+After an amendment the near-miss index is derived from the previous one
+(NearMissIndex.amended()), so only the added IDs are indexed.
+"""
+
+from typing import Optional
+
+from .amend import manifest_delta
+from .nearmiss import NearMissIndex
+from .prefilter import IdFilter
+
+
+class ManifestIndexes:
+    """IdFilter and NearMissIndex of one ID set"""
+
+    def __init__(self, barcodes, near_miss: NearMissIndex):
+        self.barcodes = barcodes
+        self.near_miss = near_miss
+        self.id_filter = IdFilter.from_barcodes(barcodes, near_miss=near_miss)
+
+    @classmethod
+    def build(cls, barcodes, previous: Optional['ManifestIndexes'] = None) -> 'ManifestIndexes':
+        """Indexes of `barcodes`, reusing `previous` when they're a revision of its IDs"""
+        if previous is not None:
+            delta = manifest_delta(previous.barcodes, barcodes)
+            if delta.is_amendment:
+                return cls(barcodes, previous.near_miss.amended(barcodes, delta.added, delta.removed))
+        return cls(barcodes, NearMissIndex(barcodes))
+
+
+def shared_indexes(ledger) -> Optional[ManifestIndexes]:
+    """The indexes of the ledger's live ID set (None before a manifest is loaded)"""
+    if ledger.valid_ids is None:
+        return None
+    return ledger.indexes(ManifestIndexes.build)
@@ -0,0 +1,240 @@
+"""
+Indexed, append-only record of every scan made in a session.
+
+Membership of already-scanned barcodes is answered from a hash index in O(1)
+instead of rebuilding a list of scanned codes on every detection, and the
+valid/duplicate/invalid totals are kept as running counters. With a
+ScanStore attached, every event is also persisted so a session can resume.
+
+One ledger can be shared by several stations (browser sessions) scanning the
+same manifest; see shared_ledger(). The check-and-claim of a barcode happens
+under a single short lock, so exactly one station gets the Valid scan and the
+others see a Duplicate naming that station. Decoding never holds the lock.
+
+When an amended manifest takes IDs off the list, their Valid scans stay in
+the log but are flagged as withdrawn (see withdraw()); they no longer count
+towards progress, and copies of the log carry a 'withdrawn' flag. The
+amended ID set itself is shared through the ledger too (valid_ids), so
+every station scans against the same revision, and so are the lookup
+structures built on it (indexes()): one copy per ID set, not per station.
+"""
+
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .classifier import VALID, DUPLICATE, INVALID, classify
+
+
+class ScanLedger:
+    """Ordered scan log with an O(1) index of claimed barcodes"""
+
+    def __init__(self, store=None):
+        self.store = store  # optional ScanStore that persists every event
+        self._lock = threading.Lock()
+        self._events: List[Dict] = []
+        self._claimed: Dict[str, int] = {}  # barcode -> position of its Valid event
+        self._seen: Dict[Tuple[str, str], str] = {}  # (source, barcode) -> status
+        self._positions: Dict[str, List[int]] = {}  # barcode -> positions of all its events
+        self._counts = {VALID: 0, DUPLICATE: 0, INVALID: 0}
+        self._station_counts: Dict[Optional[str], Dict[str, int]] = {}
+        self._withdrawn: Set[str] = set()  # claimed barcodes taken off the manifest
+        # The manifest's live ID set, shared by every station on this ledger.
+        # Amendments replace it with an amended copy; it is never mutated.
+        self.valid_ids = None
+        self.amend_lock = threading.Lock()  # held by apply_amendment() while it replaces valid_ids
+        self._indexes = None  # (valid_ids, what indexes() built for them)
+        self._index_lock = threading.Lock()  # held while building, not while scanning
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __contains__(self, barcode: str) -> bool:
+        return barcode in self._claimed
+
+    def classify(self, barcode: str, valid_barcodes) -> str:
+        """Return the status a scan of `barcode` would get, without recording it"""
+        return classify(barcode, valid_barcodes, self._claimed)
+
+    def record(self, barcode: str, valid_barcodes,
+               timestamp: Optional[datetime] = None,
+               source: Optional[str] = None,
+               station: Optional[str] = None) -> str:
+        """Classify a scan, append it to the log and return its status
+
+        When `source` is given (e.g. an uploaded file id), the same barcode from
+        the same source is only recorded once and later calls return the
+        original status, so Streamlit reruns don't log repeat events.
+        `station` names the scanning station in a shared ledger.
+        """
+        with self._lock:
+            if source is not None and (source, barcode) in self._seen:
+                return self._seen[(source, barcode)]
+            status = self.classify(barcode, valid_barcodes)
+            if source is not None:
+                self._seen[(source, barcode)] = status
+            event = {
+                'barcode': barcode,
+                'timestamp': timestamp or datetime.now(),
+                'status': status,
+                'station': station
+            }
+            self._append(event)
+            if self.store is not None:
+                self.store.append(event, source)
+        return status
+
+    def _append(self, event: Dict):
+        if event['status'] == VALID:
+            self._claimed[event['barcode']] = len(self._events)
+        self._positions.setdefault(event['barcode'], []).append(len(self._events))
+        self._events.append(event)
+        self._counts[event['status']] += 1
+        station_counts = self._station_counts.get(event['station'])
+        if station_counts is None:
+            station_counts = self._station_counts[event['station']] = {VALID: 0, DUPLICATE: 0, INVALID: 0}
+        station_counts[event['status']] += 1
+
+    @classmethod
+    def resume(cls, store) -> 'ScanLedger':
+        """Ledger attached to `store`, pre-filled with the events it already holds"""
+        ledger = cls(store)
+        for event in store.load():
+            source = event.pop('source')
+            if source is not None:
+                ledger._seen[(source, event['barcode'])] = event['status']
+            ledger._append(event)
+        return ledger
+
+    @property
+    def valid_count(self) -> int:
+        return self._counts[VALID]
+
+    @property
+    def on_list_count(self) -> int:
+        """Valid scans whose IDs are still on the manifest"""
+        return self._counts[VALID] - len(self._withdrawn)
+
+    @property
+    def duplicate_count(self) -> int:
+        return self._counts[DUPLICATE]
+
+    @property
+    def invalid_count(self) -> int:
+        return self._counts[INVALID]
+
+    def counts(self) -> Dict[str, int]:
+        """Running totals per status"""
+        return dict(self._counts)
+
+    def station_counts(self) -> Dict[Optional[str], Dict[str, int]]:
+        """Running totals per status for each station"""
+        with self._lock:
+            return {station: dict(counts) for station, counts in self._station_counts.items()}
+
+    def claimed_by(self, barcode: str) -> Optional[str]:
+        """Station whose scan claimed `barcode` (None if unclaimed or unnamed)"""
+        index = self._claimed.get(barcode)
+        return None if index is None else self._events[index]['station']
+
+    def withdraw(self, removed: Iterable[str], restored: Iterable[str] = ()) -> List[str]:
+        """Flag claimed barcodes in `removed` as withdrawn; returns the newly flagged ones
+
+        Barcodes in `restored` (put back on the manifest) lose the flag.
+        """
+        with self._lock:
+            self._withdrawn.difference_update(restored)
+            flagged = [code for code in removed
+                       if code in self._claimed and code not in self._withdrawn]
+            self._withdrawn.update(flagged)
+        return flagged
+
+    def reconcile(self, valid_barcodes) -> List[str]:
+        """Flag claimed barcodes that aren't on `valid_barcodes` (e.g. after a resume)"""
+        claimed = list(self._claimed)
+        return self.withdraw([code for code in claimed if code not in valid_barcodes],
+                             restored=[code for code in claimed if code in valid_barcodes])
+
+    def withdrawn_codes(self) -> List[str]:
+        """Claimed barcodes whose IDs were taken off the manifest"""
+        with self._lock:
+            return list(self._withdrawn)
+
+    def scanned_codes(self) -> Iterable[str]:
+        """Barcodes that have been claimed by a Valid scan, in scan order"""
+        return self._claimed.keys()
+
+    def recent(self, offset: int = 0, limit: int = 200) -> List[Dict]:
+        """One page of the log, newest first, without copying the rest"""
+        with self._lock:
+            stop = max(len(self._events) - offset, 0)
+            start = max(stop - limit, 0)
+            return [self._copy(event) for event in reversed(self._events[start:stop])]
+
+    def find(self, query: str, limit: int = 200) -> List[Dict]:
+        """Events for a tracking ID, newest first
+
+        An exact ID is answered from the index; otherwise events whose barcode
+        contains `query` are collected, scanning back from the newest.
+        """
+        with self._lock:
+            positions = self._positions.get(query)
+            if positions is not None:
+                return [self._copy(self._events[i]) for i in reversed(positions[-limit:])]
+            matches = []
+            for event in reversed(self._events):
+                if query in event['barcode']:
+                    matches.append(self._copy(event))
+                    if len(matches) == limit:
+                        break
+            return matches
+
+    def snapshot(self) -> List[Dict]:
+        """Copy of the event log for display or export"""
+        with self._lock:
+            return [self._copy(event) for event in self._events]
+
+    def _copy(self, event: Dict) -> Dict:
+        withdrawn = event['status'] == VALID and event['barcode'] in self._withdrawn
+        return dict(event, withdrawn=withdrawn)
+
+    def share_ids(self, barcodes):
+        """The live ID set the stations on this ledger scan against; `barcodes` if it's the first"""
+        with self._lock:
+            if self.valid_ids is None:
+                self.valid_ids = barcodes
+            return self.valid_ids
+
+    def indexes(self, build: Callable):
+        """Lookup structures for the live ID set: `build(valid_ids, previous)`, built once per set
+
+        Whichever station asks first builds them while the others wait, and
+        they are shared until an amendment replaces the set. `previous` is
+        what was built for the set before (None the first time), so a build
+        can reuse it.
+        """
+        with self._index_lock:
+            valid_ids = self.valid_ids
+            if self._indexes is None or self._indexes[0] is not valid_ids:
+                previous = None if self._indexes is None else self._indexes[1]
+                self._indexes = (valid_ids, build(valid_ids, previous))
+            return self._indexes[1]
+
+    def close(self):
+        """Commit pending events and stop the store's writer thread"""
+        if self.store is not None:
+            self.store.close()
+
+    def clear(self):
+        """Forget all scans"""
+        with self._lock:
+            self._events.clear()
+            self._claimed.clear()
+            self._seen.clear()
+            self._positions.clear()
+            for status in self._counts:
+                self._counts[status] = 0
+            self._station_counts.clear()
+            self._withdrawn.clear()
+            if self.store is not None:
+                self.store.clear()
@@ -0,0 +1,360 @@
+"""
+Manifest loading: read the pickup list (CSV/Excel) and extract the set of
+valid tracking IDs.
+
+Only the tracking ID column is read. CSVs go through the pyarrow engine
+(or pandas' C engine when pyarrow is missing) with every value kept as a
+string. Workbooks are read with python-calamine when it is installed and
+otherwise through openpyxl in read-only mode; either way rows are streamed
+and only the ID cell of each is kept, so 500k-1M row manifests load in
+seconds without materialising every column.
+
+Whole-number cells come back from calamine as floats; they are turned back
+into exact digit strings. IDs printed in scientific notation ('1.2345e+16',
+from a float column or a CSV saved by Excel) have lost digits and can't be
+matched to a label, so they are rejected and counted in the stats.
+
+Manifests of COMPACT_MIN_IDS IDs or more are kept in a CompactIdSet (see
+compact.py) instead of a set, at 8-25 bytes per ID instead of ~95.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+from .compact import CompactIdSet
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# Column names recognised as the tracking ID column, in priority order
+TRACKING_ID_COLUMNS = ('tracking-id', 'tracking_id', 'Tracking ID')
+
+# Manifests this large are stored as a CompactIdSet by default
+COMPACT_MIN_IDS = 1_000_000
+
+# A float only holds whole numbers exactly up to 2**53
+MAX_EXACT_FLOAT = 2 ** 53
+SCIENTIFIC_ID = re.compile(r'[+-]?\d+(\.\d+)?[eE][+-]?\d+')
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class Manifest:
+    """Valid tracking IDs loaded from a manifest file"""
+
+    def __init__(self, barcodes: Set[str], column: str, columns: List[str],
+                 matched: bool, sheets: Optional[List[str]] = None,
+                 stats: Optional[Dict] = None):
+        self.barcodes = barcodes    # set or CompactIdSet
+        self.column = column        # column the IDs were read from
+        self.columns = columns      # all columns in the (first) sheet
+        self.matched = matched      # False if we fell back to the first column
+        self.sheets = sheets or []  # workbook sheets the IDs came from
+        self.stats = stats or {}    # rows, seconds, rows_per_sec, rejected, memory_mb
+
+    def __len__(self) -> int:
+        return len(self.barcodes)
+
+    def __contains__(self, barcode: str) -> bool:
+        return barcode in self.barcodes
+
+
+def find_tracking_column(columns) -> Optional[str]:
+    """Return the first recognised tracking ID column, or None"""
+    for name in TRACKING_ID_COLUMNS:
+        if name in columns:
+            return name
+    return None
+
+
+def normalize_ids(values: pd.Series) -> pd.Series:
+    """Vectorized clean-up of raw tracking ID values
+
+    Strips whitespace, drops blanks and turns integral floats such as
+    '1234567890123.0' (numeric Excel cells) back into plain digit strings.
+    """
+    ids = values.dropna().astype(str).str.strip()
+    floats = ids.str.endswith('.0')
+    if floats.any():
+        ids[floats] = ids[floats].str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+    return ids[ids != '']
+
+
+def imprecise_ids(ids: pd.Series) -> pd.Series:
+    """Mask of IDs in scientific notation, whose digits can't be recovered"""
+    return ids.str.fullmatch(SCIENTIFIC_ID)
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, where the OS reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _resident_mb() -> Optional[float]:
+    """Current resident memory in MB (Linux only)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryGrowth:
+    """Peak resident memory growth over a block, in MB
+
+    Sampled from /proc every few milliseconds where available; elsewhere the
+    growth of the process-wide peak, which misses loads that stay under an
+    earlier peak. `mb` is None when neither can be measured.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.mb: Optional[float] = None
+        self._stop = threading.Event()
+
+    def __enter__(self) -> 'MemoryGrowth':
+        self._start = _resident_mb()
+        self._peak = self._start
+        self._lifetime_start = peak_memory_mb()
+        if self._start is not None:
+            self._thread = threading.Thread(target=self._sample, name='MemoryGrowth', daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, _resident_mb() or 0.0)
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            self._stop.set()
+            self._thread.join()
+            self._peak = max(self._peak, _resident_mb() or 0.0)
+            self.mb = self._peak - self._start
+        elif self._lifetime_start is not None:
+            self.mb = peak_memory_mb() - self._lifetime_start
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _read_csv_column(source):
+    """Read only the tracking ID column of a CSV as strings"""
+    columns = [str(c) for c in pd.read_csv(source, nrows=0).columns]
+    _rewind(source)
+    if not columns:
+        raise ValueError("The uploaded file is empty.")
+
+    column = find_tracking_column(columns)
+    matched = column is not None
+    if not matched:
+        column = columns[0]
+
+    df = pd.read_csv(
+        source,
+        usecols=[column],
+        dtype=str,
+        engine=CSV_ENGINE,
+        keep_default_na=False,
+        na_values=['']
+    )
+    return df[column], column, columns, matched, []
+
+
+def _exact_cell(value):
+    """A whole-number float cell as an int, so its digits survive str()"""
+    if isinstance(value, float) and value.is_integer() and abs(value) <= MAX_EXACT_FLOAT:
+        return int(value)
+    return value
+
+
+def _calamine_sheets(source):
+    """Yield (title, header, read_column) for each sheet using python-calamine"""
+    if hasattr(source, 'read'):
+        workbook = CalamineWorkbook.from_filelike(source)
+    else:
+        workbook = CalamineWorkbook.from_path(str(source))
+    for title in workbook.sheet_names:
+        sheet = workbook.get_sheet_by_name(title)
+        header = next(sheet.iter_rows(), None)
+        if header:
+            # Rows are converted one at a time and only the ID cell is kept
+            yield title, header, lambda idx, sheet=sheet: [
+                _exact_cell(row[idx]) if idx < len(row) else None
+                for row in islice(sheet.iter_rows(), 1, None)
+            ]
+
+
+def _openpyxl_sheets(workbook):
+    """Yield (title, header, read_column) for each sheet, streaming in read-only mode"""
+    for ws in workbook.worksheets:
+        header = next(ws.iter_rows(max_row=1, values_only=True), None)
+        if header:
+            yield ws.title, header, lambda idx, ws=ws: [
+                row[0] for row in ws.iter_rows(
+                    min_row=2, min_col=idx + 1, max_col=idx + 1, values_only=True
+                )
+            ]
+
+
+def _pandas_sheets(source):
+    """Yield (title, header, read_column) for each sheet of a legacy .xls file"""
+    for title, df in pd.read_excel(source, sheet_name=None, dtype=str).items():
+        if len(df.columns):
+            yield title, list(df.columns), lambda idx, df=df: df.iloc[:, idx]
+
+
+@contextmanager
+def _open_sheets(source, name):
+    """Pick the fastest available workbook reader"""
+    if CalamineWorkbook is not None:
+        yield _calamine_sheets(source)
+    elif name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            yield _openpyxl_sheets(workbook)
+        finally:
+            workbook.close()
+    else:
+        yield _pandas_sheets(source)
+
+
+def _read_excel_column(source, name):
+    """Collect the tracking ID column from every sheet that has one
+
+    Sheets without a tracking ID column (summaries, notes) are skipped. If no
+    sheet has one, the first column of the first sheet is used.
+    """
+    with _open_sheets(source, name) as sheets_iter:
+        return _collect_sheets(sheets_iter)
+
+
+def _collect_sheets(sheets_iter):
+    first = None
+    chunks = []
+    sheets = []
+    column = None
+    for title, header, read_column in sheets_iter:
+        names = ['' if c is None else str(c) for c in header]
+        if first is None:
+            first = (title, names, read_column)
+        found = find_tracking_column(names)
+        if found is None:
+            continue
+        chunks.append(pd.Series(read_column(names.index(found)), dtype=object))
+        sheets.append(title)
+        column = column or found
+        # The first-column fallback is off now; don't keep the first sheet loaded
+        first = (first[0], first[1], None)
+        del read_column
+
+    if first is None:
+        raise ValueError("The uploaded file is empty.")
+
+    title, columns, read_column = first
+    matched = column is not None
+    if not matched:
+        column = columns[0]
+        chunks, sheets = [pd.Series(read_column(0), dtype=object)], [title]
+
+    return pd.concat(chunks, ignore_index=True), column, columns, matched, sheets
+
+
+def load_manifest(source, name: Optional[str] = None, compact: Optional[bool] = None) -> Manifest:
+    """Load a manifest from a path or file-like object
+
+    `name` is used to pick the format and defaults to `source.name` or the
+    path itself. `compact` stores the IDs in a CompactIdSet; by default that
+    happens from COMPACT_MIN_IDS unique IDs. Raises ValueError for
+    unsupported or empty files.
+    """
+    name = name or getattr(source, 'name', None) or str(source)
+    start = time.perf_counter()
+
+    with MemoryGrowth() as memory:
+        if name.endswith('.csv'):
+            values, column, columns, matched, sheets = _read_csv_column(source)
+        elif name.endswith(('.xlsx', '.xls')):
+            values, column, columns, matched, sheets = _read_excel_column(source, name)
+        else:
+            raise ValueError("Unsupported file format. Please upload CSV or Excel file.")
+
+        if values.empty:
+            raise ValueError("The uploaded file is empty.")
+
+        ids = normalize_ids(values)
+        imprecise = imprecise_ids(ids)
+        rejected = int(imprecise.sum())
+        if rejected:
+            ids = ids[~imprecise]
+        ids = ids.unique().tolist()
+        if compact is None:
+            compact = len(ids) >= COMPACT_MIN_IDS
+        barcode_set = CompactIdSet(ids) if compact else set(ids)
+        del ids
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': len(values),
+        'unique': len(barcode_set),
+        'seconds': seconds,
+        'rows_per_sec': len(values) / seconds if seconds > 0 else 0.0,
+        'rejected': rejected,
+        'memory_mb': memory.mb,
+    }
+    if compact:
+        stats['bytes_per_id'] = barcode_set.nbytes / max(len(barcode_set), 1)
+
+    return Manifest(barcode_set, column, columns, matched, sheets, stats)
+
+
+def format_stats(stats: Dict) -> str:
+    """One-line summary of a manifest load for display"""
+    text = (f"Parsed {stats['rows']:,} rows ({stats['unique']:,} unique) in "
+            f"{stats['seconds']:.2f}s - {stats['rows_per_sec']:,.0f} rows/sec")
+    if stats.get('memory_mb') is not None:
+        text += f", +{stats['memory_mb']:,.0f} MB peak memory"
+    if stats.get('bytes_per_id') is not None:
+        text += f", compact store {stats['bytes_per_id']:.0f} B/ID"
+    if stats.get('rejected'):
+        text += (f" - {stats['rejected']:,} IDs in scientific notation skipped "
+                 f"(format the column as text and export again)")
+    return text
+
+
+if __name__ == "__main__":
+    # Quick load benchmark: python -m scanner_core.manifest manifest.xlsx
+    for path in sys.argv[1:]:
+        manifest = load_manifest(path)
+        print(f"{path}: column '{manifest.column}'"
+              f"{' from ' + ', '.join(manifest.sheets) if manifest.sheets else ''}")
+        print(f"   {format_stats(manifest.stats)}")
@@ -0,0 +1,221 @@
+"""
+Low-overhead hot-path instrumentation.
+
+Stage timers feed fixed-bucket histograms (an observation is one bisect and
+two additions, no allocation), counters count frames and decodes, and
+gauges hold the latest value of things like queue depth. Everything lives
+in one process-wide registry, METRICS, shared by the decode workers and
+every session's script thread, so updates take a lock. It is disabled
+unless SCANNER_METRICS=1 is set or it is switched on for the whole server
+from the diagnostics panel: when off, every call returns immediately.
+
+The registry renders as Prometheus text or CSV, and serve_metrics() exposes
+both over HTTP for a local scraper:
+
+    curl http://localhost:9464/metrics
+    curl http://localhost:9464/metrics.csv
+"""
+
+import csv
+import io
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Histogram bucket upper bounds in seconds: 50 us .. 10 s, roughly x1.5 apart
+BUCKETS = tuple(round(5e-5 * 1.5 ** i, 7) for i in range(31))
+
+DEFAULT_PORT = 9464
+
+# Measure from startup with SCANNER_METRICS=1
+ENABLED_AT_START = os.environ.get('SCANNER_METRICS', '0') not in ('', '0')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with approximate percentiles
+
+    Not thread-safe on its own; Metrics serializes access to its histograms.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of observations"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Registry of stage histograms, counters and gauges (safe to update from any thread)"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Add one timing for `stage`"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name: str, value: float):
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time a block: `with METRICS.time('decode'): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def totals(self) -> Dict[str, float]:
+        """Copy of the counters and gauges"""
+        with self._lock:
+            return dict(self.counters, **self.gauges)
+
+    def stage_rows(self) -> List[Dict]:
+        """Per-stage summary (milliseconds) for display and CSV"""
+        with self._lock:
+            return self._stage_rows()
+
+    def _stage_rows(self) -> List[Dict]:
+        return [
+            {
+                'stage': stage,
+                'count': histogram.count,
+                'mean_ms': histogram.mean * 1000,
+                'p50_ms': histogram.percentile(0.50) * 1000,
+                'p95_ms': histogram.percentile(0.95) * 1000,
+                'p99_ms': histogram.percentile(0.99) * 1000,
+            }
+            for stage, histogram in sorted(self.histograms.items())
+        ]
+
+    def to_csv(self) -> str:
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+        writer.writeheader()
+        with self._lock:
+            for row in self._stage_rows():
+                writer.writerow({k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()})
+            for name, value in sorted(self.counters.items()):
+                writer.writerow({'stage': name, 'count': value})
+            for name, value in sorted(self.gauges.items()):
+                writer.writerow({'stage': name, 'count': value})
+        return output.getvalue()
+
+    def to_prometheus(self, prefix: str = 'scanner') -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            return self._prometheus_lines(prefix)
+
+    def _prometheus_lines(self, prefix: str) -> str:
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        if self.histograms:
+            metric = f"{prefix}_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the live path
+METRICS = Metrics(enabled=ENABLED_AT_START)
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(metrics: Metrics = METRICS, port: int = DEFAULT_PORT,
+                  host: str = '127.0.0.1') -> int:
+    """Serve /metrics (Prometheus) and /metrics.csv from a daemon thread; idempotent
+
+    Returns the port actually bound.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.csv':
+                    body, content_type = metrics.to_csv(), 'text/csv'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of the Streamlit log
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+        return _server.server_address[1]
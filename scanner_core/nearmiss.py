@@ -0,0 +1,273 @@
+"""
+Nearest manifest IDs for an invalid read.
+
+When a label keeps decoding to an ID that is one or two characters off a
+manifest entry, the operator is better served by "did you mean ...?" than
+by another "Invalid". NearMissIndex answers that in well under a
+millisecond for million-entry manifests.
+
+Barcode misreads are substitutions (a damaged symbol decodes as another
+character) or truncations. Substitutions use a pigeonhole index: IDs of one
+length are split into max_distance + 1 groups of character positions, and
+an ID within that many substitutions of the query must agree with it
+exactly on at least one group. The groups are strided (positions 0, 3, 6,
+... / 1, 4, 7, ... / ...) rather than contiguous, so every group includes
+low-order characters and sequential ID ranges still spread over many
+buckets. Each group is a sorted array of packed keys, looked up with
+searchsorted; the few candidates are verified with one vectorized compare.
+
+Reads one edit away (a substitution, a dropped or an extra character) are
+tried first by generating those edits of the query and probing the manifest
+set directly. That is a few hundred set lookups, and in dense sequential
+manifests - where a two-substitution bucket can hold thousands of IDs - it
+almost always finds the answer before the index is needed.
+
+Where IDs are dense, though, the nearest ID is often the wrong one: in a
+sequential range every ID has neighbours a substitution or two away, and a
+misread lands next to one of those as readily as next to the label's own
+ID. suggest() therefore only names an ID that has no other manifest ID
+within max_distance substitutions.
+
+An amended manifest doesn't need a new index: amended() shares the arrays
+and indexes only the added IDs, skipping withdrawn ones when they turn up.
+"""
+
+import copy
+import string
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .compact import CompactIdSet
+
+# Characters tried when probing for a substituted or dropped character
+DIGITS = string.digits
+ALPHANUMERIC = string.digits + string.ascii_uppercase
+ANY = string.digits + string.ascii_letters + '-'
+
+# amended() builds a fresh index once the IDs added and withdrawn since the
+# last full build exceed this share of the manifest
+REBUILD_SHARE = 0.1
+
+
+class _LengthGroup:
+    """IDs of one length as a byte matrix, with one sorted key array per position group"""
+
+    def __init__(self, codes: List[str], groups: int):
+        length = len(codes[0])
+        self.length = length
+        self.codes = np.frombuffer(''.join(codes).encode('ascii'), np.uint8).reshape(-1, length)
+        self.positions = [list(range(start, length, groups)) for start in range(min(groups, length))]
+        self.keys = []
+        self.order = []
+        for positions in self.positions:
+            keys = self._pack(self.codes[:, positions])
+            order = np.argsort(keys, kind='stable').astype(np.int32)
+            self.keys.append(keys[order])
+            self.order.append(order)
+
+    @staticmethod
+    def _pack(columns: np.ndarray) -> np.ndarray:
+        """Pack up to 8 byte columns into one uint64 key per row (longer groups are hashed)"""
+        keys = np.zeros(len(columns), np.uint64)
+        for i in range(columns.shape[1]):
+            if i < 8:
+                keys |= columns[:, i].astype(np.uint64) << np.uint64(8 * i)
+            else:
+                keys = keys * np.uint64(1099511628211) ^ columns[:, i].astype(np.uint64)
+        return keys
+
+    def candidates(self, query: np.ndarray, max_distance: int) -> List[Tuple[int, int]]:
+        """(row, substitutions) for rows within max_distance substitutions of `query`"""
+        found = {}
+        for positions, keys, order in zip(self.positions, self.keys, self.order):
+            key = self._pack(query[positions][None, :])[0]
+            lo, hi = np.searchsorted(keys, key, 'left'), np.searchsorted(keys, key, 'right')
+            if hi == lo:
+                continue
+            # A row in several buckets is verified more than once; cheaper than np.unique
+            rows = order[lo:hi]
+            distances = (self.codes[rows] != query).sum(axis=1)
+            close = distances <= max_distance
+            found.update(zip(rows[close].tolist(), distances[close].tolist()))
+        return list(found.items())
+
+    def code(self, row: int) -> str:
+        return self.codes[row].tobytes().decode('ascii')
+
+
+class NearMissIndex:
+    """Finds manifest IDs within a small edit distance of a read"""
+
+    def __init__(self, barcodes: Iterable[str], max_distance: int = 2):
+        self.max_distance = max_distance
+        if not isinstance(barcodes, (set, frozenset, CompactIdSet)):
+            barcodes = set(barcodes)
+        self.barcodes = barcodes
+        self._groups = self._index(self.barcodes)
+        # Amendments since the full build: added IDs get their own small groups
+        self._added_codes: List[str] = []
+        self._added: Dict[int, _LengthGroup] = {}
+        self._changes = 0  # IDs added or withdrawn
+
+    def _index(self, codes: Iterable[str]) -> Dict[int, _LengthGroup]:
+        by_length: Dict[int, List[str]] = {}
+        for code in codes:
+            if code.isascii():
+                by_length.setdefault(len(code), []).append(code)
+        return {length: _LengthGroup(codes, self.max_distance + 1)
+                for length, codes in by_length.items()}
+
+    def __len__(self) -> int:
+        return len(self.barcodes)
+
+    def amended(self, barcodes, added: Sequence[str], removed: Sequence[str]) -> 'NearMissIndex':
+        """Index of `barcodes`, this index's IDs with `added` and `removed` applied
+
+        Shares this index's arrays and indexes only the added IDs; withdrawn
+        IDs still in the arrays are skipped when found.
+        """
+        changes = self._changes + len(added) + len(removed)
+        if changes > REBUILD_SHARE * len(barcodes):
+            return NearMissIndex(barcodes, self.max_distance)
+        index = copy.copy(self)
+        index.barcodes = barcodes
+        index._added_codes = self._added_codes + list(added)
+        index._added = index._index(index._added_codes)
+        index._changes = changes
+        return index
+
+    def _indexed(self, length: int) -> bool:
+        return length in self._groups or length in self._added
+
+    def _within(self, code: str, max_distance: int) -> Dict[str, int]:
+        """Manifest IDs of `code`'s length within `max_distance` substitutions of it"""
+        query = np.frombuffer(code.encode('ascii'), np.uint8)
+        found = {}
+        for groups in (self._groups, self._added):
+            group = groups.get(len(code))
+            if group is not None:
+                for row, distance in group.candidates(query, max_distance):
+                    found[group.code(row)] = distance
+        if self._changes:
+            found = {match: distance for match, distance in found.items() if match in self.barcodes}
+        return found
+
+    def lookup(self, code: str, limit: int = 3) -> List[Tuple[str, int]]:
+        """Manifest IDs closest to `code` as (id, distance), nearest first"""
+        if not code.isascii() or code in self.barcodes:
+            return []
+        if isinstance(self.barcodes, CompactIdSet):
+            # The edits as byte matrices, checked in one vectorized pass per length
+            hits = [row.tobytes().decode('ascii')
+                    for rows in self._single_edit_rows(code)
+                    for row in rows[self.barcodes.contains_rows(rows)]]
+        else:
+            hits = [edit for edit in self._single_edits(code) if edit in self.barcodes]
+        found = dict.fromkeys(hits, 1)
+
+        if not found and self.max_distance > 1 and self._indexed(len(code)):
+            found = self._within(code, self.max_distance)
+
+        return sorted(found.items(), key=lambda item: (item[1], item[0]))[:limit]
+
+    def suggest(self, code: str) -> Optional[str]:
+        """The nearest manifest ID, if exactly one is nearest and no other ID is close to it"""
+        matches = self.lookup(code, limit=2)
+        if not matches or (len(matches) > 1 and matches[0][1] == matches[1][1]):
+            return None
+        nearest = matches[0][0]
+        if len(self._within(nearest, self.max_distance)) > 1:  # more than itself: a dense stretch
+            return None
+        return nearest
+
+    def _single_edits(self, code: str):
+        """Every string one substitution, deletion or insertion away from `code`"""
+        alphabet = self._edit_alphabet(code)
+        if self._indexed(len(code)):
+            for i, original in enumerate(code):
+                for c in alphabet:
+                    if c != original:
+                        yield code[:i] + c + code[i + 1:]
+        if self._indexed(len(code) - 1):
+            for i in range(len(code)):
+                yield code[:i] + code[i + 1:]
+        if self._indexed(len(code) + 1):
+            for i in range(len(code) + 1):
+                for c in alphabet:
+                    yield code[:i] + c + code[i:]
+
+    def _single_edit_rows(self, code: str) -> List[np.ndarray]:
+        """_single_edits() as uint8 matrices, one per resulting length"""
+        query = np.frombuffer(code.encode('ascii'), np.uint8)
+        alphabet = np.frombuffer(self._edit_alphabet(code).encode('ascii'), np.uint8)
+        length, size = len(query), len(alphabet)
+        matrices = []
+        if self._indexed(length):
+            rows = np.tile(query, (length * size, 1))
+            positions = np.repeat(np.arange(length), size)
+            rows[np.arange(len(rows)), positions] = np.tile(alphabet, length)
+            matrices.append(rows[rows[np.arange(len(rows)), positions] != query[positions]])
+        if self._indexed(length - 1) and length > 1:
+            columns = np.arange(length - 1)
+            matrices.append(query[columns + (columns >= np.arange(length)[:, None])])
+        if self._indexed(length + 1):
+            positions = np.repeat(np.arange(length + 1), size)[:, None]
+            columns = np.arange(length + 1)
+            rows = query[np.clip(columns - (columns > positions), 0, length - 1)]
+            rows[columns == positions] = np.tile(alphabet, length + 1)
+            matrices.append(rows)
+        return matrices
+
+    @staticmethod
+    def _edit_alphabet(code: str) -> str:
+        if code.isdigit():
+            return DIGITS
+        if code.isalnum() and code.isupper():
+            return ALPHANUMERIC
+        return ANY
+
+
+if __name__ == "__main__":
+    # Quick benchmark: python -m scanner_core.nearmiss [ids]
+    import random
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    manifests = {
+        'random': {f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(count)},
+        'sequential': {f"TBA{400_000_000_000 + i:012d}" for i in range(count)},
+    }
+
+    def misread(code: str) -> str:
+        chars = list(code)
+        edit = rng.choice(('sub1', 'sub2', 'truncate'))
+        if edit == 'truncate':
+            return code[:-1]
+        for i in rng.sample(range(3, len(code)), 1 if edit == 'sub1' else 2):
+            chars[i] = rng.choice([d for d in DIGITS if d != chars[i]])
+        return ''.join(chars)
+
+    for name, manifest in manifests.items():
+        start = time.perf_counter()
+        index = NearMissIndex(manifest)
+        built = time.perf_counter() - start
+        size = sum(g.codes.nbytes + sum(k.nbytes + o.nbytes for k, o in zip(g.keys, g.order))
+                   for g in index._groups.values())
+
+        sample = rng.sample(sorted(manifest), 5000)
+        probes = [(misread(code), code) for code in sample]
+        probes = [(read, code) for read, code in probes if read not in manifest]
+        latencies, outcomes = [], {'right': 0, 'ambiguous': 0, 'wrong': 0}
+        for read, code in probes:
+            start = time.perf_counter()
+            suggestion = index.suggest(read)
+            latencies.append(time.perf_counter() - start)
+            outcomes['ambiguous' if suggestion is None else 'right' if suggestion == code else 'wrong'] += 1
+        latencies.sort()
+        print(f"{name}: {len(manifest):,} IDs indexed in {built:.2f}s, {size / len(manifest):.0f} B/ID; "
+              f"suggest() p50 {latencies[len(latencies) // 2] * 1e3:.3f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.3f} ms; {len(probes):,} misreads: "
+              + ', '.join(f"{count / len(probes):.1%} {outcome}" for outcome, count in outcomes.items()))
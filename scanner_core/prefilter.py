@@ -0,0 +1,306 @@
+"""
+Manifest-derived decode restrictions.
+
+Parcel labels carry more than the tracking ID: postal codes, SKUs, QR
+marketing links. Decoding those costs time and every one of them ends up
+as an "Invalid" scan. IdFilter looks at the loaded manifest once and derives
+
+- the 1-D symbologies its IDs can be printed as, passed to pyzbar so the
+  other 1-D decoders never run. 2-D codes are always read: any ID can be
+  printed as a QR code, and nothing in the manifest says whether it was;
+- the ID shapes - the character class at each position (digit, upper,
+  lower or a literal) plus the prefix shared by every ID of that shape -
+  so a payload that cannot be on the manifest is dropped before any
+  ledger work, and
+- the check digit scheme of each shape, if its IDs carry one (see
+  checksum.py), so a misread of a real label is dropped as corrupt
+  instead of being reported as an invalid parcel.
+
+Every manifest ID matches its own shape and passes its own check, so
+filtering never rejects a code that would have classified as valid.
+
+With a NearMissIndex attached, a read rejected for its shape or check
+digit is looked up before it is discarded. A wrong-shape read within a few
+edits of a manifest ID (a dropped or extra character) is kept, so it is
+reported as an invalid scan with the closest ID like any other misread. A
+read failing its check digit is still dropped - the next frame or cascade
+stage usually reads the label correctly - but carries its 'suggestion'
+when explain() lists it, so an upload that never reads cleanly still
+names the likely parcel. In live scanning those reads are only retried.
+explain() tells a user why a photo came back empty: it decodes everything
+and returns the codes the filter dropped, each tagged with the reason.
+"""
+
+import functools
+import os
+import string
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .checksum import check_ok, checkable, gs1_check_ok, infer_check
+from .cascade import to_gray
+from .compact import CompactIdSet
+from .decoder import detect_barcodes
+from .metrics import METRICS
+
+# Symbology names as pyzbar reports them in a detection's 'type'
+CODE128 = 'CODE128'
+CODE39 = 'CODE39'
+EAN13 = 'EAN13'
+EAN8 = 'EAN8'
+UPCA = 'UPCA'
+I25 = 'I25'
+QRCODE = 'QRCODE'
+
+# Always read: zbar's only 2-D decoder, and any ID fits in a QR code
+TWO_D_SYMBOLOGIES = (QRCODE,)
+
+# Why a detection was dropped, as set in its 'filtered' key by IdFilter.split()
+FILTER_REASONS = {
+    'symbology': "not a tracking-ID symbology",
+    'shape': "not shaped like a tracking ID",
+    'check': "check digit fails - likely a misread",
+}
+
+# Beyond this many distinct shapes the manifest is too mixed for the shape
+# check to reject much; only the symbology restriction is kept
+MAX_SHAPES = 32
+
+# digit -> '9', upper -> 'A', lower -> 'a'; anything else stays literal
+_SHAPE_TABLE = str.maketrans(
+    string.digits + string.ascii_uppercase + string.ascii_lowercase,
+    '9' * 10 + 'A' * 26 + 'a' * 26
+)
+_SHAPE_NAMES = {'9': 'digit', 'A': 'letter', 'a': 'lowercase letter'}
+
+CODE39_CHARS = frozenset(string.digits + string.ascii_uppercase + " -.$/+%")
+
+
+def id_shape(code: str) -> str:
+    """Character-class mask of `code`, e.g. 'TBA0123' -> 'AAA9999'"""
+    return code.translate(_SHAPE_TABLE)
+
+
+def infer_symbologies(shapes: Dict[str, str], barcodes: Iterable[str]) -> Tuple[str, ...]:
+    """Symbologies the manifest's IDs could be printed as
+
+    Code 128 and QR are always on (they carry any ID); Code 39 when every ID
+    fits its character set; EAN-13/UPC-A/EAN-8 for all-digit IDs of those
+    lengths with a valid check digit; Interleaved 2 of 5 for even-length
+    all-digit IDs.
+    """
+    symbologies = [CODE128, *TWO_D_SYMBOLOGIES]
+    masks = list(shapes)
+    if all(CODE39_CHARS.issuperset(mask.replace('9', '0')) for mask in masks):
+        symbologies.append(CODE39)
+
+    digit_lengths = {len(mask) for mask in masks if mask.isdigit()}
+    checked = {13: EAN13, 12: UPCA, 8: EAN8}
+    wanted = {length for length in digit_lengths if length in checked}
+    if wanted:
+        # One ID with a valid check digit per length is enough evidence
+        for code in barcodes:
+            if len(code) in wanted and gs1_check_ok(code):
+                symbologies.append(checked[len(code)])
+                wanted.discard(len(code))
+                if not wanted:
+                    break
+    if any(length % 2 == 0 and length >= 6 for length in digit_lengths):
+        symbologies.append(I25)
+    return tuple(symbologies)
+
+
+def _decode_filtered(id_filter: 'IdFilter', decode: Callable, frame) -> List[Dict]:
+    return id_filter(decode(frame, symbols=id_filter.symbologies))
+
+
+class IdFilter:
+    """Symbologies, ID shapes and check digits of a manifest, for restricting decodes"""
+
+    def __init__(self, symbologies: Sequence[str], prefixes: Optional[Dict[str, str]] = None,
+                 checks: Optional[Dict[str, str]] = None, near_miss=None):
+        self.symbologies = tuple(symbologies)
+        self.prefixes = prefixes  # shape mask -> prefix shared by its IDs; None accepts any shape
+        self.checks = checks or {}  # shape mask -> check digit scheme of its IDs
+        self.near_miss = near_miss  # NearMissIndex consulted before a shape or check reject
+        # Near misses are single edits or same-length substitutions: only
+        # reads within one character of a manifest ID length are looked up
+        self._lengths = None if prefixes is None else {
+            length + step for length in map(len, prefixes) for step in (-1, 0, 1)}
+        self.passed = 0
+        self.rejected = 0
+        self.corrupt = 0
+
+    @classmethod
+    def from_barcodes(cls, barcodes: Iterable[str], max_shapes: int = MAX_SHAPES,
+                      extra_symbologies: Sequence[str] = (), near_miss=None) -> 'IdFilter':
+        """Derive the filter from a manifest's tracking IDs (and the NearMissIndex built on them)"""
+        if not isinstance(barcodes, (set, frozenset, list, tuple, CompactIdSet)):
+            barcodes = list(barcodes)
+        groups: Dict[str, Tuple[str, str]] = {}  # mask -> (smallest, largest) ID
+        members: Dict[str, List[str]] = {}  # mask -> its IDs, for shapes that may carry a check digit
+        for code in barcodes:
+            mask = code.translate(_SHAPE_TABLE)
+            bounds = groups.get(mask)
+            if bounds is None:
+                if len(groups) >= max_shapes:
+                    groups = None
+                    break
+                groups[mask] = (code, code)
+                if checkable(mask):
+                    members[mask] = []
+            elif code < bounds[0]:
+                groups[mask] = (code, bounds[1])
+            elif code > bounds[1]:
+                groups[mask] = (bounds[0], code)
+            ids = members.get(mask)
+            if ids is not None:
+                ids.append(code)
+
+        checks = {}
+        if groups is None:
+            # Too many shapes: recount them all for the symbology inference only
+            shapes = {code.translate(_SHAPE_TABLE): '' for code in barcodes}
+            prefixes = None
+        else:
+            # The prefix shared by the smallest and largest ID is shared by all
+            shapes = prefixes = {mask: os.path.commonprefix(bounds) for mask, bounds in groups.items()}
+            for mask, ids in members.items():
+                scheme = infer_check(ids, mask)
+                if scheme:
+                    checks[mask] = scheme
+
+        symbologies = infer_symbologies(shapes, barcodes)
+        symbologies += tuple(s for s in extra_symbologies if s not in symbologies)
+        return cls(symbologies, prefixes, checks, near_miss)
+
+    def __getstate__(self):
+        # A million-ID NearMissIndex isn't worth pickling into every pool task
+        return dict(self.__dict__, near_miss=None)
+
+    def matches(self, data: str) -> bool:
+        """True if `data` has the shape of a manifest ID"""
+        if self.prefixes is None:
+            return True
+        prefix = self.prefixes.get(data.translate(_SHAPE_TABLE))
+        return prefix is not None and data.startswith(prefix)
+
+    def intact(self, data: str) -> bool:
+        """False if `data` has the shape of a check-digit-carrying ID but fails the check"""
+        scheme = self.checks.get(data.translate(_SHAPE_TABLE)) if self.checks else None
+        return scheme is None or check_ok(data, scheme)
+
+    def reason(self, detection: Dict) -> Optional[str]:
+        """Why the filter drops `detection` (a FILTER_REASONS key), or None if it's kept"""
+        if detection['type'] not in self.symbologies:
+            return 'symbology'
+        if not self.matches(detection['data']):
+            return 'shape'
+        if self.checks and not self.intact(detection['data']):
+            return 'check'
+        return None
+
+    def closest(self, data: str) -> Optional[str]:
+        """The manifest ID a rejected read is a near miss of, if a NearMissIndex is attached"""
+        if self.near_miss is None or (self._lengths is not None and len(data) not in self._lengths):
+            return None
+        return self.near_miss.suggest(data)
+
+    def split(self, detections: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """(kept, dropped) detections; dropped ones are tagged with their 'filtered' reason
+
+        Wrong-shape near misses of a manifest ID are kept, with their
+        'suggestion'; dropped corrupt reads carry theirs too.
+        """
+        kept, dropped = [], []
+        for detection in detections:
+            reason = self.reason(detection)
+            if reason is None:
+                kept.append(detection)
+                continue
+            if reason != 'symbology':
+                suggestion = self.closest(detection['data'])
+                if suggestion is not None:
+                    detection['suggestion'] = suggestion
+                    if reason == 'shape':
+                        kept.append(detection)
+                        continue
+            detection['filtered'] = reason
+            dropped.append(detection)
+        return kept, dropped
+
+    def __call__(self, detections: List[Dict]) -> List[Dict]:
+        """Drop detections in other symbologies or shapes, and corrupt reads"""
+        kept, dropped = self.split(detections)
+        corrupt = sum(1 for d in dropped if d['filtered'] == 'check')
+        rejected = len(dropped) - corrupt
+        if corrupt:
+            self.corrupt += corrupt
+            METRICS.inc('corrupt', corrupt)
+        self.passed += len(kept)
+        if rejected:
+            self.rejected += rejected
+            METRICS.inc('rejected', rejected)
+        return kept
+
+    def explain(self, image, decode: Callable = detect_barcodes) -> List[Dict]:
+        """Codes in `image` this filter drops, each tagged with its 'filtered' reason
+
+        Decodes every symbology once at full resolution; meant for a photo
+        the restricted decode came back empty on.
+        """
+        return self.split(decode(to_gray(image)))[1]
+
+    def wrap(self, decode: Callable) -> Callable:
+        """Restrict a detect_barcodes-style `decode` (it must take symbols=) to this filter
+
+        The result is picklable, so it can go to a process pool.
+        """
+        return functools.partial(_decode_filtered, self, decode)
+
+    def describe(self) -> List[str]:
+        """Human-readable ID shapes, e.g. 'TBA + 12 digits' or '18 digits (gs1 check digit)'"""
+        if self.prefixes is None:
+            return ["any shape"]
+        return [_describe_shape(mask, prefix) + (f" ({self.checks[mask]} check digit)" if mask in self.checks else '')
+                for mask, prefix in sorted(self.prefixes.items())]
+
+
+def _describe_shape(mask: str, prefix: str) -> str:
+    parts = [prefix] if prefix else []
+    rest = mask[len(prefix):]
+    i = 0
+    while i < len(rest):
+        j = i
+        while j < len(rest) and rest[j] == rest[i]:
+            j += 1
+        name = _SHAPE_NAMES.get(rest[i])
+        if name is None:
+            parts.append(repr(rest[i:j]))
+        else:
+            parts.append(f"{j - i} {name}{'s' if j - i > 1 else ''}")
+        i = j
+    return ' + '.join(parts) or "empty"
+
+
+if __name__ == "__main__":
+    # Quick benchmark: python -m scanner_core.prefilter [ids]
+    import random
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    manifest = {f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(count // 2)}
+    manifest |= {f"{rng.randrange(10 ** 12):012d}" + "7" for _ in range(count - len(manifest))}
+
+    start = time.perf_counter()
+    id_filter = IdFilter.from_barcodes(manifest)
+    built = time.perf_counter() - start
+    print(f"{len(manifest):,} IDs: filter built in {built:.2f}s - "
+          f"{', '.join(id_filter.symbologies)}; {'; '.join(id_filter.describe())}")
+
+    probes = list(manifest)[:50_000] + [f"SKU-{i:06d}" for i in range(50_000)]
+    start = time.perf_counter()
+    hits = sum(map(id_filter.matches, probes))
+    elapsed = time.perf_counter() - start
+    print(f"matches(): {elapsed / len(probes) * 1e6:.2f} us/payload ({hits:,} of {len(probes):,} pass)")
@@ -0,0 +1,349 @@
+"""
+Durable scan history in a local SQLite database.
+
+Every event a ScanLedger records is also queued on a ScanStore. A
+background writer thread batches the queue into one transaction per flush
+(group commit), so recording a scan never waits on the disk. The database
+runs in WAL mode with synchronous=NORMAL: a crash loses at most the last
+`flush_interval` of scans, never the file.
+
+Events are keyed by a digest of the manifest's tracking IDs. Uploading the
+same manifest again - after a browser refresh, a restart or a redeploy -
+finds its events and the ledger resumes where it left off. An amended
+revision of a manifest is linked to the digest of the first upload
+(link_manifest), so uploading the revision resumes the same ledger too.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Database location; override with the SCANNER_DB environment variable
+DEFAULT_DB_PATH = os.environ.get('SCANNER_DB', 'scans.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    source TEXT,
+    station TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_manifest ON scans (manifest, id);
+CREATE TABLE IF NOT EXISTS manifest_aliases (
+    digest TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL
+);
+"""
+
+# A failed commit is retried after this long, doubling up to the maximum
+RETRY_MIN_SECONDS = 0.1
+RETRY_MAX_SECONDS = 5.0
+
+# Failed commits retried while closing before the pending events are given up
+CLOSE_RETRIES = 3
+
+_CLEAR = object()  # queue marker: delete this manifest's events
+_ALIAS = object()  # queue marker: (_ALIAS, digest) links a revision to this manifest
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_digest(barcodes: Iterable[str]) -> str:
+    """Stable hash of a manifest's tracking IDs (independent of file format and row order)"""
+    digest = hashlib.sha256()
+    for barcode in sorted(barcodes):
+        digest.update(barcode.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    columns = {row[1] for row in connection.execute('PRAGMA table_info(scans)')}
+    if 'station' not in columns:  # databases created before multi-station support
+        connection.execute('ALTER TABLE scans ADD COLUMN station TEXT')
+    return connection
+
+
+class ScanStore:
+    """Append-only SQLite log of one manifest's scan events, written in batches"""
+
+    def __init__(self, manifest: str, path: str = DEFAULT_DB_PATH,
+                 batch_size: int = 1000, flush_interval: float = 0.2):
+        self.manifest = manifest
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.commits = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None  # set while commits are failing
+
+        self._queue: queue.Queue = queue.Queue()
+        self._retrying = 0
+        self._thread = threading.Thread(target=self._run, name='ScanStore', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def load(self) -> List[Dict]:
+        """All stored events for this manifest, oldest first"""
+        connection = _connect(self.path)
+        try:
+            rows = connection.execute(
+                'SELECT barcode, status, timestamp, source, station FROM scans '
+                'WHERE manifest = ? ORDER BY id',
+                (self.manifest,)
+            ).fetchall()
+        finally:
+            connection.close()
+        return [
+            {
+                'barcode': barcode,
+                'timestamp': datetime.fromtimestamp(timestamp),
+                'status': status,
+                'station': station,
+                'source': source,
+            }
+            for barcode, status, timestamp, source, station in rows
+        ]
+
+    def append(self, event: Dict, source: Optional[str] = None) -> None:
+        """Queue an event for the next group commit (never blocks on disk)"""
+        self._queue.put((
+            self.manifest, event['barcode'], event['status'],
+            event['timestamp'].timestamp(), source, event.get('station')
+        ))
+
+    def clear(self) -> None:
+        """Delete this manifest's events (after any still queued)"""
+        self._queue.put(_CLEAR)
+
+    def alias(self, digest: str) -> None:
+        """Make the manifest with `digest` (a revision of this one) resume these events"""
+        if digest != self.manifest:
+            self._queue.put((_ALIAS, digest))
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed, or has failed to (see last_error)"""
+        self._queue.join()
+
+    @property
+    def pending(self) -> int:
+        """Events queued or waiting for a retry"""
+        return self._queue.qsize() + self._retrying
+
+    def close(self) -> None:
+        """Commit pending events and stop the writer thread"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _take(self, wait: Optional[float]) -> List:
+        """The next group of queued items: whatever arrives within the flush interval
+
+        Waits for the first item indefinitely, or at most `wait` seconds.
+        """
+        try:
+            batch = [self._queue.get(timeout=wait)]
+        except queue.Empty:
+            return []
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        # Own connection: sqlite3 connections shouldn't be shared across writers
+        connection = None
+        pending = []  # items taken off the queue but not committed yet
+        delay = backoff = RETRY_MIN_SECONDS
+        stopping = False
+        close_retries = CLOSE_RETRIES
+        while True:
+            # While a commit is failing, new items are still taken (so flush()
+            # returns) and the whole backlog is retried every `backoff` seconds
+            batch = self._take(delay if pending else None)
+            stopping = stopping or any(item is None for item in batch)
+            pending.extend(item for item in batch if item is not None)
+            try:
+                if pending:
+                    if connection is None:
+                        connection = _connect(self.path)
+                    self._commit(connection, pending)
+                    pending = []
+                    backoff = RETRY_MIN_SECONDS
+                    self.last_error = None
+            except sqlite3.Error as e:
+                # e.g. 'database is locked' by another process, or a full disk
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                delay, backoff = backoff, min(backoff * 2, RETRY_MAX_SECONDS)
+                logger.warning("Scan store commit failed (%s), retrying in %.1fs", e, delay)
+                if connection is not None:
+                    connection.close()
+                    connection = None
+            finally:
+                self._retrying = len(pending)
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                if not pending or close_retries == 0:
+                    break
+                close_retries -= 1
+        if pending:
+            logger.error("Scan store stopped with %d uncommitted items: %s", len(pending), self.last_error)
+        if connection is not None:
+            connection.close()
+
+    def _commit(self, connection, items):
+        rows = []
+        written = 0
+        with connection:
+            for item in items:
+                if item is _CLEAR:
+                    self._insert(connection, rows)
+                    written += len(rows)
+                    rows = []
+                    connection.execute('DELETE FROM scans WHERE manifest = ?', (self.manifest,))
+                elif item[0] is _ALIAS:
+                    connection.execute('INSERT OR REPLACE INTO manifest_aliases (digest, manifest) '
+                                       'VALUES (?, ?)', (item[1], self.manifest))
+                else:
+                    rows.append(item)
+            self._insert(connection, rows)
+            written += len(rows)
+        # Counted only once the transaction is in; a failed one is rolled back whole
+        self.written += written
+        self.commits += 1
+
+    def _insert(self, connection, rows):
+        if rows:
+            connection.executemany(
+                'INSERT INTO scans (manifest, barcode, status, timestamp, source, station) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+
+def resolve_manifest(digest: str, path: str = DEFAULT_DB_PATH) -> str:
+    """The digest whose events a manifest resumes: its first revision's, if it was linked"""
+    connection = _connect(path)
+    try:
+        row = connection.execute('SELECT manifest FROM manifest_aliases WHERE digest = ?',
+                                 (digest,)).fetchone()
+    finally:
+        connection.close()
+    return digest if row is None else row[0]
+
+
+def resume_ledger(barcodes: Iterable[str], path: str = DEFAULT_DB_PATH):
+    """Persistent ScanLedger for a manifest, restored from any earlier session"""
+    from .ledger import ScanLedger
+    return ScanLedger.resume(ScanStore(resolve_manifest(manifest_digest(barcodes), path), path))
+
+
+_shared: Dict[Tuple[str, str], object] = {}
+_users: Dict[int, int] = {}  # id(ledger) -> sessions holding it
+_shared_lock = threading.Lock()
+
+
+def shared_ledger(barcodes: Iterable[str], path: str = DEFAULT_DB_PATH):
+    """The process-wide ledger for a manifest, shared by every session that loads it
+
+    The first call per manifest resumes it from the database; later calls
+    (other stations, reruns) return the same object. Revisions linked with
+    link_manifest() share the ledger of the first one. Every call should be
+    matched by a release_ledger() once the session moves on.
+    """
+    key = (manifest_digest(barcodes), path)
+    with _shared_lock:
+        ledger = _shared.get(key)
+        if ledger is None:
+            first = (resolve_manifest(key[0], path), path)
+            ledger = _shared.get(first)
+            if ledger is None:
+                from .ledger import ScanLedger
+                ledger = _shared[first] = ScanLedger.resume(ScanStore(first[0], path))
+            _shared[key] = ledger
+        _users[id(ledger)] = _users.get(id(ledger), 0) + 1
+    return ledger
+
+
+def release_ledger(ledger) -> None:
+    """Drop a session's hold on a shared ledger; the last one out closes its store
+
+    Ledgers that weren't handed out by shared_ledger() are left alone.
+    """
+    with _shared_lock:
+        users = _users.get(id(ledger), 0) - 1
+        if users < 0:
+            return
+        if users:
+            _users[id(ledger)] = users
+            return
+        del _users[id(ledger)]
+        for key in [key for key, shared in _shared.items() if shared is ledger]:
+            del _shared[key]
+    ledger.close()
+
+
+def link_manifest(barcodes: Iterable[str], ledger, path: str = DEFAULT_DB_PATH) -> None:
+    """Make a revision of a manifest (its amended IDs) resume `ledger`, here and after a restart
+
+    A persistent ledger is linked in its own database; `path` only matters
+    for ledgers without a store.
+    """
+    if ledger.store is not None:
+        path = ledger.store.path
+    digest = manifest_digest(barcodes)
+    with _shared_lock:
+        _shared[(digest, path)] = ledger
+    if ledger.store is not None:
+        ledger.store.alias(digest)
+
+
+if __name__ == "__main__":
+    # Quick write benchmark: python -m scanner_core.store [events]
+    import sys
+    import tempfile
+    import time
+
+    from .ledger import ScanLedger
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    valid = {f"TRK{i:09d}" for i in range(count // 2)}
+    with tempfile.TemporaryDirectory() as folder:
+        store = ScanStore(manifest_digest(valid), os.path.join(folder, 'bench.db'))
+        ledger = ScanLedger(store)
+        start = time.perf_counter()
+        for i in range(count):
+            ledger.record(f"TRK{i:09d}", valid)
+        queued = time.perf_counter() - start
+        store.flush()
+        elapsed = time.perf_counter() - start
+        store.close()
+        print(f"{count:,} events: record() {queued / count * 1e6:.1f} us/event, "
+              f"durable after {elapsed:.2f}s ({count / elapsed:,.0f} events/sec, "
+              f"{store.commits} commits)")
+
+        start = time.perf_counter()
+        resumed = resume_ledger(valid, os.path.join(folder, 'bench.db'))
+        print(f"Resumed {len(resumed):,} events ({resumed.valid_count:,} valid) "
+              f"in {time.perf_counter() - start:.2f}s")
+        resumed.store.close()
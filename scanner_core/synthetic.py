@@ -0,0 +1,250 @@
+"""
+Synthetic, labelled barcode images for benchmarking the decoders.
+
+Labels are rendered offline - Code 128 and EAN-13 by the small encoders
+below, QR codes with OpenCV's QRCodeEncoder - using tracking-ID shaped
+payloads, placed on a camera-sized canvas and put through one distortion
+class each (scale, rotation, blur, noise, glare, JPEG quality). Labels can
+also carry decoys - a SKU Code 128 and a QR marketing link, as on real
+parcels. Everything is driven by a seeded RNG, so a corpus is reproducible
+from its seed.
+"""
+
+import random
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Code 128 bar/space widths for symbol values 0-105, then the stop pattern
+CODE128_PATTERNS = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232",
+]
+CODE128_STOP = "2331112"
+CODE128_START_B = 104
+CODE128_START_C = 105
+
+# EAN-13 left-hand (odd parity) digit codes; R codes are their complement and
+# G codes the reversed R codes
+EAN_L = ["0001101", "0011001", "0010011", "0111101", "0100011",
+         "0110001", "0101111", "0111011", "0110111", "0001011"]
+EAN_PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG",
+              "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+# Symbologies as pyzbar names them
+CODE128 = 'CODE128'
+EAN13 = 'EAN13'
+QRCODE = 'QRCODE'
+SYMBOLOGIES = (CODE128, EAN13, QRCODE)
+
+CANVAS = (720, 1280)  # height, width: a 720p camera frame
+
+
+def _widths_to_modules(widths: str) -> List[bool]:
+    modules = []
+    for i, width in enumerate(widths):
+        modules.extend([i % 2 == 0] * int(width))  # patterns start with a bar
+    return modules
+
+
+def encode_code128(text: str) -> List[bool]:
+    """Module pattern (True = bar) for `text`; all-digit even-length text uses set C"""
+    if text.isdigit() and len(text) % 2 == 0:
+        values = [CODE128_START_C] + [int(text[i:i + 2]) for i in range(0, len(text), 2)]
+    else:
+        if any(not 32 <= ord(c) <= 127 for c in text):
+            raise ValueError("Code 128 set B only encodes ASCII 32-127")
+        values = [CODE128_START_B] + [ord(c) - 32 for c in text]
+    checksum = (values[0] + sum(i * v for i, v in enumerate(values[1:], 1))) % 103
+
+    modules = []
+    for value in values + [checksum]:
+        modules += _widths_to_modules(CODE128_PATTERNS[value])
+    return modules + _widths_to_modules(CODE128_STOP)
+
+
+def ean13_check_digit(digits: str) -> str:
+    """Check digit for the first 12 digits of an EAN-13"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def encode_ean13(digits: str) -> List[bool]:
+    """Module pattern for a 12- or 13-digit EAN-13 (the check digit is recomputed)"""
+    digits = digits[:12] + ean13_check_digit(digits)
+    parity = EAN_PARITY[int(digits[0])]
+    bits = "101"
+    for digit, kind in zip(digits[1:7], parity):
+        code = EAN_L[int(digit)]
+        if kind == 'G':
+            code = ''.join('1' if b == '0' else '0' for b in code)[::-1]
+        bits += code
+    bits += "01010"
+    for digit in digits[7:]:
+        bits += ''.join('1' if b == '0' else '0' for b in EAN_L[int(digit)])
+    bits += "101"
+    return [b == '1' for b in bits]
+
+
+def render_linear(modules: Sequence[bool], module_px: int = 3, height: int = 120,
+                  quiet: int = 10) -> np.ndarray:
+    """Draw a 1-D barcode as a white-background uint8 image"""
+    row = np.array([0 if bar else 255 for bar in modules], dtype=np.uint8)
+    row = np.pad(row, quiet, constant_values=255)
+    image = np.repeat(np.repeat(row[None, :], height, axis=0), module_px, axis=1)
+    return np.pad(image, ((quiet * module_px, quiet * module_px), (0, 0)), constant_values=255)
+
+
+def render_qr(text: str, module_px: int = 6) -> np.ndarray:
+    """Draw a QR code with OpenCV's encoder (quiet zone included)"""
+    qr = cv2.QRCodeEncoder.create().encode(text)
+    qr = np.pad(qr, 4, constant_values=255)
+    return cv2.resize(qr, None, fx=module_px, fy=module_px, interpolation=cv2.INTER_NEAREST)
+
+
+def tracking_id(symbology: str, rng: random.Random) -> str:
+    """Random payload in one of our tracking-ID formats"""
+    if symbology == EAN13:
+        digits = ''.join(rng.choice('0123456789') for _ in range(12))
+        return digits + ean13_check_digit(digits)
+    if rng.random() < 0.5:
+        # Carrier style: three letters and twelve digits
+        return 'TBA' + ''.join(rng.choice('0123456789') for _ in range(12))
+    return ''.join(rng.choice('0123456789') for _ in range(13))
+
+
+def decoys(rng: random.Random) -> List[Tuple[str, str]]:
+    """(text, symbology) of the other codes printed on a parcel label"""
+    sku = 'SKU-' + ''.join(rng.choice('0123456789') for _ in range(6))
+    url = 'https://example.com/p/' + ''.join(rng.choice('abcdefghjkmnpqrstuvwxyz23456789') for _ in range(8))
+    return [(sku, CODE128), (url, QRCODE)]
+
+
+def sample_manifest(count: int = 1000, seed: int = 0,
+                    symbologies: Sequence[str] = SYMBOLOGIES) -> List[str]:
+    """Tracking IDs in the same formats as the corpus payloads"""
+    rng = random.Random(seed)
+    return [tracking_id(symbologies[i % len(symbologies)], rng) for i in range(count)]
+
+
+def render_label(text: str, symbology: str, scale: float = 1.0) -> np.ndarray:
+    """Render `text` as `symbology`; `scale` multiplies the module size"""
+    if symbology == QRCODE:
+        return render_qr(text, max(1, round(6 * scale)))
+    modules = encode_ean13(text) if symbology == EAN13 else encode_code128(text)
+    module_px = max(1, round(3 * scale))
+    return render_linear(modules, module_px, height=max(20, round(100 * scale)))
+
+
+def stack_labels(parts: Sequence[np.ndarray], gap: int = 16) -> np.ndarray:
+    """Stack rendered codes vertically on one white label"""
+    width = max(part.shape[1] for part in parts)
+    rows = []
+    for part in parts:
+        rows.append(np.pad(part, ((0, gap), (0, width - part.shape[1])), constant_values=255))
+    return np.vstack(rows)[:-gap]
+
+
+def place(label: np.ndarray, rng: random.Random, canvas=CANVAS, background: int = 200) -> np.ndarray:
+    """Paste a label at a random position on a flat grey canvas"""
+    height, width = canvas
+    image = np.full(canvas, background, dtype=np.uint8)
+    label = label[:height, :width]
+    y = rng.randrange(0, height - label.shape[0] + 1)
+    x = rng.randrange(0, width - label.shape[1] + 1)
+    image[y:y + label.shape[0], x:x + label.shape[1]] = label
+    return image
+
+
+# Distortions: (label, rng) -> camera-sized image
+def _clean(label, rng):
+    return place(label, rng)
+
+
+def _rotated(label, rng):
+    angle = rng.choice([-1, 1]) * rng.uniform(5, 30)
+    height, width = label.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    size = (int(height * sin + width * cos), int(height * cos + width * sin))
+    matrix[0, 2] += size[0] / 2 - width / 2
+    matrix[1, 2] += size[1] / 2 - height / 2
+    return place(cv2.warpAffine(label, matrix, size, borderValue=255), rng)
+
+
+def _blurred(label, rng):
+    sigma = rng.uniform(0.8, 2.0)
+    return cv2.GaussianBlur(place(label, rng), (0, 0), sigma)
+
+
+def _noisy(label, rng):
+    image = place(label, rng).astype(np.float32)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, rng.uniform(10, 30), image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def _glare(label, rng):
+    image = place(label, rng).astype(np.float32)
+    height, width = image.shape
+    cy, cx = rng.uniform(0, height), rng.uniform(0, width)
+    radius = rng.uniform(0.15, 0.35) * width
+    yy, xx = np.ogrid[:height, :width]
+    spot = np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * radius ** 2))
+    return np.clip(image + spot * rng.uniform(120, 220), 0, 255).astype(np.uint8)
+
+
+def _jpeg(label, rng):
+    quality = rng.randrange(15, 45)
+    _, data = cv2.imencode('.jpg', place(label, rng), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+
+# name -> (label scale range, distortion)
+DISTORTIONS: Dict[str, Tuple[Tuple[float, float], Callable]] = {
+    'clean': ((0.8, 1.5), _clean),
+    'small': ((0.34, 0.6), _clean),
+    'large': ((2.5, 3.5), _clean),
+    'rotated': ((0.8, 1.5), _rotated),
+    'blur': ((0.8, 1.5), _blurred),
+    'noise': ((0.8, 1.5), _noisy),
+    'glare': ((0.8, 1.5), _glare),
+    'jpeg': ((0.8, 1.5), _jpeg),
+}
+
+
+class Sample(NamedTuple):
+    image: np.ndarray  # 2-D uint8
+    text: str
+    symbology: str
+    distortion: str
+
+
+def generate_corpus(per_class: int = 20, seed: int = 0,
+                    symbologies: Sequence[str] = SYMBOLOGIES,
+                    distortions: Sequence[str] = tuple(DISTORTIONS),
+                    with_decoys: bool = False) -> Iterator[Sample]:
+    """Yield `per_class` samples for every (distortion, symbology) pair"""
+    rng = random.Random(seed)
+    for distortion in distortions:
+        (low, high), apply = DISTORTIONS[distortion]
+        for symbology in symbologies:
+            for _ in range(per_class):
+                text = tracking_id(symbology, rng)
+                codes = [(text, symbology)] + (decoys(rng) if with_decoys else [])
+                scale = rng.uniform(low, high)
+                label = stack_labels([render_label(t, s, scale) for t, s in codes])
+                # Shrink labels that wouldn't fit the frame (with room to rotate)
+                while label.shape[1] > CANVAS[1] * 0.8 or label.shape[0] > CANVAS[0] * 0.8:
+                    scale *= 0.85
+                    label = stack_labels([render_label(t, s, scale) for t, s in codes])
+                yield Sample(apply(label, rng), text, symbology, distortion)
@@ -0,0 +1,28 @@
+"""Skip the tests that need zbar on machines without the library
+
+Most of scanner_core is pure Python and numpy; only scanner_core.decoder
+(and the modules that decode through it) load pyzbar, which in turn loads
+the zbar shared library.
+"""
+
+import pytest
+
+# Test modules that import scanner_core.decoder
+DECODING_TESTS = {'test_indexes.py', 'test_prefilter.py'}
+
+try:
+    from pyzbar import pyzbar  # noqa: F401
+    ZBAR_ERROR = None
+except ImportError as e:  # the pyzbar package, or the zbar library it loads
+    ZBAR_ERROR = str(e)
+
+
+class _NeedsZbar(pytest.Module):
+    def collect(self):
+        pytest.skip(f"zbar is unavailable: {ZBAR_ERROR}")
+
+
+def pytest_pycollect_makemodule(module_path, parent):
+    if ZBAR_ERROR is not None and module_path.name in DECODING_TESTS:
+        return _NeedsZbar.from_parent(parent, path=module_path)
+    return None
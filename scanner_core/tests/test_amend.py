@@ -0,0 +1,89 @@
+"""Unit tests for amended manifests: deltas, the shared live ID set and watch paths"""
+
+import os
+
+import pytest
+
+from scanner_core.amend import apply_amendment, manifest_delta, watch_path
+from scanner_core.compact import CompactIdSet
+from scanner_core.ledger import ScanLedger
+from scanner_core.store import release_ledger, shared_ledger
+
+CURRENT = {f"TBA{i:012d}" for i in range(100)}
+AMENDED = (CURRENT - {'TBA000000000000', 'TBA000000000001'}) | {'TBA999999999999'}
+
+
+@pytest.mark.parametrize('store', [set, CompactIdSet])
+def test_manifest_delta(store):
+    delta = manifest_delta(store(CURRENT), store(AMENDED))
+    assert delta.added == ['TBA999999999999']
+    assert sorted(delta.removed) == ['TBA000000000000', 'TBA000000000001']
+    assert delta.kept == 98 and delta.is_amendment
+
+    other = manifest_delta(store(CURRENT), store({f"AMZ{i:012d}" for i in range(100)}))
+    assert not other.is_amendment
+
+
+@pytest.mark.parametrize('store', [set, CompactIdSet])
+def test_apply_amendment_publishes_a_copy(tmp_path, store):
+    path = str(tmp_path / 'scans.db')
+    ledger = shared_ledger(CURRENT, path)
+    try:
+        current = ledger.share_ids(store(CURRENT))
+        ledger.record('TBA000000000000', current)
+
+        delta = apply_amendment(store(AMENDED), ledger)
+        assert delta.withdrawn == ['TBA000000000000']
+        assert ledger.withdrawn_codes() == ['TBA000000000000']
+        # Readers of the old set never see it change; the ledger hands out the new one
+        assert set(current) == CURRENT
+        assert ledger.valid_ids is not current and set(ledger.valid_ids) == AMENDED
+        # The revision resumes the same ledger
+        revision = shared_ledger(AMENDED, path)
+        assert revision is ledger
+        release_ledger(revision)
+    finally:
+        release_ledger(ledger)
+
+
+def test_apply_amendment_leaves_other_manifests_alone():
+    ledger = ScanLedger()
+    current = ledger.share_ids(set(CURRENT))
+    assert apply_amendment({f"AMZ{i:012d}" for i in range(100)}, ledger) is None
+    assert ledger.valid_ids is current
+    assert apply_amendment(set(CURRENT), ScanLedger()) is None  # nothing loaded yet
+
+
+def test_revisions_are_diffed_against_the_live_set():
+    ledger = ScanLedger()
+    ledger.share_ids(set(CURRENT))
+    apply_amendment(CURRENT | {'TBA900000000001'}, ledger)  # another station adds a parcel
+    ledger.record('TBA900000000001', ledger.valid_ids)
+    # This station still shows the original list when it uploads its own revision
+    delta = apply_amendment(CURRENT | {'TBA900000000002'}, ledger)
+    assert delta.added == ['TBA900000000002'] and delta.removed == ['TBA900000000001']
+    assert delta.withdrawn == ['TBA900000000001']
+
+
+def test_a_revision_applied_twice_changes_nothing_the_second_time():
+    ledger = ScanLedger()
+    ledger.share_ids(set(CURRENT))
+    first = apply_amendment(set(AMENDED), ledger)
+    published = ledger.valid_ids
+    second = apply_amendment(set(AMENDED), ledger)  # e.g. a second watcher on the same folder
+    assert first and not second and second is not None
+    assert ledger.valid_ids is published
+
+
+def test_watch_path_stays_inside_the_root(tmp_path):
+    root = tmp_path / 'drop'
+    (root / 'carrier').mkdir(parents=True)
+    (tmp_path / 'secret').mkdir()
+    os.symlink(tmp_path / 'secret', root / 'escape')
+
+    assert watch_path('carrier', str(root)) == os.path.realpath(root / 'carrier')
+    for path in ('..', '../secret', 'escape', str(tmp_path / 'secret')):
+        with pytest.raises(ValueError):
+            watch_path(path, str(root))
+    with pytest.raises(ValueError):
+        watch_path('carrier', None)
@@ -0,0 +1,40 @@
+"""Unit tests for the GS1 and UPU S10 check digits"""
+
+import pytest
+
+from scanner_core.checksum import (
+    GS1, MIN_CHECKED_IDS, S10, check_ok, checkable, gs1_check_ok, infer_check, s10_check_ok
+)
+
+
+@pytest.mark.parametrize('code', ['4006381333931', '036000291452', '96385074', '000012345600012349'])
+def test_gs1_valid(code):
+    assert gs1_check_ok(code)
+
+
+@pytest.mark.parametrize('code', ['4006381333932', '036000291453', 'ABC', '7', ''])
+def test_gs1_invalid(code):
+    assert not gs1_check_ok(code)
+
+
+def test_s10():
+    assert s10_check_ok('RR123456785GB')
+    assert not s10_check_ok('RR123456784GB')
+    assert not s10_check_ok('RR12345678GB')
+    assert check_ok('RR123456785GB', S10)
+
+
+def test_checkable_shapes():
+    assert checkable('999999999999999999')
+    assert checkable('AA999999999AA')
+    assert not checkable('AAA999999999999')
+    assert not checkable('9')
+
+
+def test_scheme_is_inferred_only_when_every_id_satisfies_it():
+    ids = [next(f"{body:012d}{d}" for d in '0123456789' if gs1_check_ok(f"{body:012d}{d}"))
+           for body in range(400_000_000_000, 400_000_000_000 + MIN_CHECKED_IDS)]
+    mask = '9' * 13
+    assert infer_check(ids, mask) == GS1
+    assert infer_check(ids[:-1] + [ids[-1][:-1] + str((int(ids[-1][-1]) + 1) % 10)], mask) is None
+    assert infer_check(ids[:MIN_CHECKED_IDS - 1], mask) is None  # too few to tell from chance
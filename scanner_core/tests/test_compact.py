@@ -0,0 +1,74 @@
+"""Unit tests for CompactIdSet: membership, batch lookups and amendments"""
+
+import random
+
+import pytest
+
+from scanner_core.compact import CompactIdSet
+
+rng = random.Random(0)
+# Numeric IDs of two lengths (leading zeros matter), alphanumeric IDs, and odd ones out
+IDS = ([f"{rng.randrange(10 ** 13):013d}" for _ in range(500)] +
+       [f"{rng.randrange(10 ** 5):018d}" for _ in range(50)] +
+       [f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(500)] +
+       ['X' * 25, 'ÄÖÜ-1', ''])
+
+
+@pytest.fixture(params=[0, 10], ids=['plain', 'bloom'])
+def ids(request):
+    return CompactIdSet(IDS, bloom_bits_per_id=request.param)
+
+
+def test_membership_matches_a_set(ids):
+    expected = set(IDS)
+    assert len(ids) == len(expected)
+    assert set(ids) == expected
+    assert all(code in ids for code in IDS)
+
+    misses = ['0' + IDS[0], IDS[0][1:], IDS[600][:-1] + 'Z', 'TBA', 'ÄÖÜ-2', 'nope']
+    assert not any(code in ids for code in misses if code not in expected)
+    assert 12345 not in ids
+
+
+def test_duplicates_are_counted_once():
+    ids = CompactIdSet(['TBA1', 'TBA1', '0042', '0042', '42'])
+    assert len(ids) == 3
+    assert '42' in ids and '0042' in ids and '042' not in ids
+
+
+def test_contains_many_matches_single_lookups(ids):
+    queries = IDS[::7] + [code[:-1] + 'Q' for code in IDS[::11]] + ['', '1', 'ÄÖÜ-1']
+    assert ids.contains_many(queries).tolist() == [code in ids for code in queries]
+
+
+def test_apply_delta_adds_and_removes(ids):
+    added, removed = ['NEW-000001', IDS[1]], [IDS[0], 'NEVER-LISTED']
+    ids.apply_delta(added, removed)
+
+    assert 'NEW-000001' in ids and IDS[1] in ids
+    assert IDS[0] not in ids
+    assert len(ids) == len(set(IDS))  # one real add, one real removal
+    assert set(ids) == (set(IDS) | {'NEW-000001'}) - {IDS[0]}
+    assert ids.contains_many(['NEW-000001', IDS[0], IDS[2]]).tolist() == [True, False, True]
+
+    # Undoing the amendment leaves nothing in the overlays
+    ids.apply_delta(removed[:1], added[:1])
+    assert set(ids) == set(IDS)
+    assert not ids._added and not ids._removed
+
+
+def test_copy_keeps_amendments_apart(ids):
+    amended = ids.copy()
+    amended.apply_delta(['NEW-000001'], [IDS[0]])
+    assert amended._numeric is ids._numeric  # packed arrays are shared
+    assert IDS[0] in ids and 'NEW-000001' not in ids
+    assert IDS[0] not in amended and 'NEW-000001' in amended
+
+
+def test_difference_respects_amendments():
+    old = CompactIdSet(IDS)
+    new = old.copy()
+    new.apply_delta(['NEW-000001'], [IDS[0], IDS[600]])
+    assert sorted(old.difference(new)) == sorted([IDS[0], IDS[600]])
+    assert new.difference(old) == ['NEW-000001']
+    assert sorted(CompactIdSet(IDS[:10]).difference(CompactIdSet(IDS[5:]))) == sorted(IDS[:5])
@@ -0,0 +1,45 @@
+"""Unit tests for ScanGate per-code debounce and K-of-M consensus"""
+
+from scanner_core.debounce import ScanGate
+
+
+def reads(*codes):
+    return [{'data': code, 'type': 'CODE128'} for code in codes]
+
+
+def accepted(gate, codes, now):
+    return [d['data'] for d in gate(reads(*codes), now)]
+
+
+def test_repeats_are_suppressed_until_the_code_leaves_view():
+    gate = ScanGate(ttl=1.0)
+    assert accepted(gate, ['A'], 0.0) == ['A']
+    assert accepted(gate, ['A', 'B'], 0.5) == ['B']  # a new code isn't blocked
+    assert accepted(gate, ['A'], 1.2) == []          # still in view: TTL refreshed at 0.5
+    assert accepted(gate, [], 2.0) == []
+    assert accepted(gate, ['A'], 2.5) == ['A']       # gone for over a TTL
+    assert gate.accepted == 3 and gate.suppressed == 2
+
+
+def test_consensus_needs_k_reads_in_the_last_m_frames():
+    gate = ScanGate(ttl=1.0, consensus=2, window=3)
+    assert accepted(gate, ['A'], 0.0) == []
+    assert gate.pending() == 1
+    assert accepted(gate, [], 0.1) == []
+    assert accepted(gate, ['A'], 0.2) == ['A']       # 2 reads within 3 frames
+
+
+def test_one_frame_misreads_never_pass_consensus():
+    gate = ScanGate(ttl=1.0, consensus=2, window=3)
+    assert accepted(gate, ['MISREAD'], 0.0) == []
+    for frame in range(1, 4):
+        assert accepted(gate, [], frame * 0.1) == []
+    assert accepted(gate, ['MISREAD'], 0.5) == []    # the first read fell out of the window
+    assert gate.accepted == 0
+
+
+def test_reset_forgets_recent_codes():
+    gate = ScanGate(ttl=10.0)
+    assert accepted(gate, ['A'], 0.0) == ['A']
+    gate.reset()
+    assert accepted(gate, ['A'], 0.1) == ['A']
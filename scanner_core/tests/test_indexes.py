@@ -0,0 +1,45 @@
+"""Unit tests for the indexes shared through a ledger's live ID set"""
+
+import threading
+
+from scanner_core.amend import apply_amendment
+from scanner_core.indexes import ManifestIndexes, shared_indexes
+from scanner_core.ledger import ScanLedger
+
+IDS = {f"TBA{i * 7919:012d}" for i in range(1, 500)}
+
+
+def test_no_indexes_before_a_manifest():
+    assert shared_indexes(ScanLedger()) is None
+
+
+def test_stations_share_one_build():
+    ledger = ScanLedger()
+    ledger.share_ids(IDS)
+    builds = []
+
+    def build(barcodes, previous):
+        builds.append(barcodes)
+        return ManifestIndexes.build(barcodes, previous)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ledger.indexes(build))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1 and all(result is results[0] for result in results)
+    assert results[0].id_filter.near_miss is results[0].near_miss
+
+
+def test_amendment_derives_new_indexes_from_the_old():
+    ledger = ScanLedger()
+    ledger.share_ids(set(IDS))
+    before = shared_indexes(ledger)
+    apply_amendment((IDS - {min(IDS)}) | {'TBA999999999999'}, ledger)
+
+    after = shared_indexes(ledger)
+    assert after is not before and after.barcodes is ledger.valid_ids
+    assert after.near_miss._groups is before.near_miss._groups  # only the added ID was indexed
+    assert after.near_miss.suggest('TBA999999999990') == 'TBA999999999999'
+    assert shared_indexes(ledger) is after
@@ -0,0 +1,88 @@
+"""Unit tests for ScanLedger: recording, duplicate detection and resume"""
+
+from scanner_core.classifier import DUPLICATE, INVALID, VALID
+from scanner_core.ledger import ScanLedger
+from scanner_core.store import ScanStore
+
+VALID_IDS = {'TBA000000000001', 'TBA000000000002', 'TBA000000000003'}
+
+
+def test_record_classifies_and_counts():
+    ledger = ScanLedger()
+    assert ledger.record('TBA000000000001', VALID_IDS, station='Door 1') == VALID
+    assert ledger.record('TBA000000000001', VALID_IDS, station='Door 2') == DUPLICATE
+    assert ledger.record('NOT-ON-LIST', VALID_IDS) == INVALID
+
+    assert len(ledger) == 3
+    assert ledger.counts() == {VALID: 1, DUPLICATE: 1, INVALID: 1}
+    assert 'TBA000000000001' in ledger
+    assert ledger.claimed_by('TBA000000000001') == 'Door 1'
+    assert ledger.station_counts()['Door 2'][DUPLICATE] == 1
+
+
+def test_record_from_the_same_source_is_logged_once():
+    ledger = ScanLedger()
+    assert ledger.record('TBA000000000002', VALID_IDS, source='upload-1') == VALID
+    # A rerun over the same upload returns the original status without a new event
+    assert ledger.record('TBA000000000002', VALID_IDS, source='upload-1') == VALID
+    assert len(ledger) == 1
+    assert ledger.record('TBA000000000002', VALID_IDS, source='upload-2') == DUPLICATE
+
+
+def test_resume_restores_events_claims_and_sources(tmp_path):
+    path = str(tmp_path / 'scans.db')
+    store = ScanStore('manifest', path)
+    ledger = ScanLedger(store)
+    ledger.record('TBA000000000001', VALID_IDS, source='upload-1', station='Door 1')
+    ledger.record('TBA000000000001', VALID_IDS, station='Door 2')
+    ledger.record('UNKNOWN', VALID_IDS)
+    ledger.close()
+
+    store = ScanStore('manifest', path)
+    resumed = ScanLedger.resume(store)
+    try:
+        assert [event['status'] for event in resumed.snapshot()] == [VALID, DUPLICATE, INVALID]
+        assert resumed.claimed_by('TBA000000000001') == 'Door 1'
+        assert resumed.record('TBA000000000001', VALID_IDS, source='upload-1') == VALID
+        assert len(resumed) == 3
+    finally:
+        resumed.close()
+
+
+def test_clear_forgets_everything():
+    ledger = ScanLedger()
+    ledger.record('TBA000000000001', VALID_IDS)
+    ledger.clear()
+    assert len(ledger) == 0
+    assert ledger.counts() == {VALID: 0, DUPLICATE: 0, INVALID: 0}
+    assert ledger.record('TBA000000000001', VALID_IDS) == VALID
+
+
+def test_withdraw_flags_claimed_ids_until_restored():
+    ledger = ScanLedger()
+    ledger.record('TBA000000000001', VALID_IDS)
+    ledger.record('TBA000000000002', VALID_IDS)
+
+    assert ledger.withdraw(['TBA000000000001', 'TBA000000000003']) == ['TBA000000000001']
+    assert ledger.withdraw(['TBA000000000001']) == []  # already flagged
+    assert ledger.withdrawn_codes() == ['TBA000000000001']
+    assert [event['withdrawn'] for event in ledger.snapshot()] == [True, False]
+
+    ledger.withdraw([], restored=['TBA000000000001'])
+    assert ledger.withdrawn_codes() == []
+
+
+def test_reconcile_against_a_revised_list():
+    ledger = ScanLedger()
+    ledger.record('TBA000000000001', VALID_IDS)
+    ledger.record('TBA000000000002', VALID_IDS)
+    assert ledger.reconcile({'TBA000000000002'}) == ['TBA000000000001']
+    ledger.reconcile(VALID_IDS)
+    assert ledger.withdrawn_codes() == []
+
+
+def test_share_ids_keeps_the_first_set():
+    ledger = ScanLedger()
+    first, second = set(VALID_IDS), set(VALID_IDS)
+    assert ledger.share_ids(first) is first
+    assert ledger.share_ids(second) is first
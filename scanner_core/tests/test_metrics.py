@@ -0,0 +1,43 @@
+"""Unit tests for the metrics registry: switching, concurrent updates and rendering"""
+
+import threading
+
+from scanner_core.metrics import Metrics
+
+
+def test_disabled_registry_records_nothing():
+    metrics = Metrics()
+    metrics.observe('decode', 0.01)
+    metrics.inc('frames_in')
+    metrics.set('queue', 3)
+    assert metrics.stage_rows() == [] and metrics.totals() == {}
+
+
+def test_updates_from_many_threads_are_all_counted():
+    metrics = Metrics(enabled=True)
+
+    def work():
+        for _ in range(20_000):
+            metrics.inc('decodes')
+            metrics.observe('decode', 0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.totals() == {'decodes': 80_000}
+    assert metrics.stage_rows()[0]['count'] == 80_000
+
+
+def test_renders_prometheus_and_csv():
+    metrics = Metrics(enabled=True)
+    metrics.observe('decode', 0.002)
+    metrics.inc('hits', 2)
+    metrics.set('queue', 1)
+    text = metrics.to_prometheus()
+    assert 'scanner_hits_total 2' in text and 'scanner_queue 1' in text
+    assert 'scanner_stage_seconds_count{stage="decode"} 1' in text
+    assert metrics.to_csv().splitlines()[1].startswith('decode,1,')
+    metrics.reset()
+    assert metrics.totals() == {} and metrics.stage_rows() == []
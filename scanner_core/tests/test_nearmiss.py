@@ -0,0 +1,75 @@
+"""Unit tests for NearMissIndex suggestions"""
+
+import random
+
+import pytest
+
+from scanner_core.compact import CompactIdSet
+from scanner_core.nearmiss import NearMissIndex
+
+rng = random.Random(7)
+IDS = sorted({f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(2000)})
+
+
+@pytest.fixture(params=[set, CompactIdSet], ids=['set', 'compact'])
+def index(request):
+    return NearMissIndex(request.param(IDS))
+
+
+def substitute(code: str, *positions: int) -> str:
+    chars = list(code)
+    for i in positions:
+        chars[i] = '0' if chars[i] != '0' else '1'
+    return ''.join(chars)
+
+
+def test_single_edits(index):
+    code = IDS[42]
+    assert index.suggest(substitute(code, 9)) == code
+    assert index.suggest(code[:6] + code[7:]) == code        # dropped character
+    assert index.suggest(code[:6] + 'X' + code[6:]) == code  # extra character
+
+
+def test_two_substitutions(index):
+    code = IDS[1000]
+    assert index.lookup(substitute(code, 5, 12))[0] == (code, 2)
+
+
+def test_manifest_ids_and_far_reads_get_no_suggestion(index):
+    assert index.suggest(IDS[0]) is None
+    assert index.suggest('SKU-12') is None
+    assert index.suggest('TBA') is None
+    assert index.lookup('TBÄ000000000000') == []
+
+
+def test_ties_are_not_suggested():
+    index = NearMissIndex(['TBA000000000010', 'TBA000000000020'])
+    assert index.suggest('TBA000000000030') is None
+
+
+def test_dense_ids_get_no_suggestion():
+    sequential = [f"TBA{400_000_000_000 + i:012d}" for i in range(1000)]
+    index = NearMissIndex(sequential)
+    # Nearest by one substitution, but its neighbours are just as plausible
+    assert index.lookup('TBA400000000X05')[0] == ('TBA400000000005', 1)
+    assert index.suggest('TBA400000000X05') is None
+
+
+@pytest.mark.parametrize('store', [set, CompactIdSet], ids=['set', 'compact'])
+def test_amended_index_shares_arrays(store):
+    index = NearMissIndex(store(IDS))
+    added, removed = ['TBA777777777777'], [IDS[42]]
+    amended = index.amended(store((set(IDS) | set(added)) - set(removed)), added, removed)
+    assert amended._groups is index._groups
+    assert amended.suggest('TBA777777777770') == 'TBA777777777777'
+    assert amended.suggest(substitute(IDS[42], 9)) is None
+    assert IDS[42] not in dict(amended.lookup(substitute(IDS[42], 5, 12)))
+    assert index.suggest(substitute(IDS[42], 9)) == IDS[42]  # the original is untouched
+
+
+def test_amended_index_is_rebuilt_after_many_changes():
+    index = NearMissIndex(IDS)
+    added = sorted({f"TBA{rng.randrange(10 ** 12):012d}" for _ in range(len(IDS) // 5)} - set(IDS))
+    amended = index.amended(set(IDS) | set(added), added, [])
+    assert amended._groups is not index._groups and not amended._added
+    assert amended.suggest(substitute(added[3], 9)) == added[3]
@@ -0,0 +1,101 @@
+"""Unit tests for IdFilter: symbology inference, shape and check-digit filtering"""
+
+import pickle
+import random
+
+from scanner_core.checksum import gs1_check_ok
+from scanner_core.nearmiss import NearMissIndex
+from scanner_core.prefilter import (
+    CODE39, CODE128, EAN13, I25, QRCODE, IdFilter, id_shape, infer_symbologies
+)
+
+AMAZON_IDS = {f"TBA{i:012d}" for i in range(500_000, 500_200)}
+
+
+def gs1(body: str) -> str:
+    """`body` with its GS1 check digit appended"""
+    return next(body + d for d in '0123456789' if gs1_check_ok(body + d))
+
+
+SSCC_IDS = {gs1(f"00{i:015d}") for i in range(10_000, 10_100)}
+
+
+def read(data, symbology=CODE128):
+    return {'data': data, 'type': symbology, 'location': (0, 0, 1, 1)}
+
+
+def test_id_shape():
+    assert id_shape('TBA0123') == 'AAA9999'
+    assert id_shape('ab-12') == 'aa-99'
+
+
+def test_symbologies_always_include_code128_and_qr():
+    symbologies = infer_symbologies({'AAA999999999999': 'TBA'}, AMAZON_IDS)
+    assert symbologies[:2] == (CODE128, QRCODE)
+    assert CODE39 in symbologies
+    assert EAN13 not in symbologies
+
+
+def test_digit_ids_enable_ean_and_i25():
+    ean = {gs1(f"40063813339{i}") for i in range(10)}
+    symbologies = IdFilter.from_barcodes(ean).symbologies
+    assert EAN13 in symbologies and QRCODE in symbologies
+    assert I25 not in symbologies  # 13 digits: odd length
+    assert I25 in IdFilter.from_barcodes(SSCC_IDS).symbologies
+
+
+def test_every_manifest_id_passes():
+    for ids in (AMAZON_IDS, SSCC_IDS):
+        id_filter = IdFilter.from_barcodes(ids)
+        assert id_filter([read(code) for code in ids]) == [read(code) for code in ids]
+
+
+def test_other_symbologies_and_shapes_are_dropped():
+    id_filter = IdFilter.from_barcodes(AMAZON_IDS)
+    kept, dropped = id_filter.split([
+        read('TBA000000500001'),
+        read('TBA000000500001', 'EAN8'),
+        read('SKU-123456'),
+        read('https://example.com/p/1', QRCODE),
+        read('TBA000000500002', QRCODE),
+    ])
+    assert [d['data'] for d in kept] == ['TBA000000500001', 'TBA000000500002']
+    assert [d['filtered'] for d in dropped] == ['symbology', 'shape', 'shape']
+
+
+def test_check_digit_failures_are_dropped_as_corrupt():
+    id_filter = IdFilter.from_barcodes(SSCC_IDS)
+    assert id_filter.checks
+    code = min(SSCC_IDS)
+    corrupt = code[:-1] + str((int(code[-1]) + 1) % 10)
+    assert id_filter([read(corrupt)]) == []
+    assert id_filter.corrupt == 1
+
+
+def test_too_many_shapes_keeps_only_the_symbology_restriction():
+    ids = {'A' * n for n in range(1, 40)}
+    id_filter = IdFilter.from_barcodes(ids)
+    assert id_filter.prefixes is None
+    assert id_filter.matches('anything at all')
+
+
+def test_rejected_near_misses_carry_the_closest_id():
+    # Sparse IDs, so the nearest one is unambiguous
+    rng = random.Random(3)
+    ids = {gs1(f"00{rng.randrange(10 ** 15):015d}") for _ in range(100)}
+    id_filter = IdFilter.from_barcodes(ids, near_miss=NearMissIndex(ids))
+    code = sorted(ids)[7]
+    dropped_digit = code[:8] + code[9:]
+    corrupt = code[:-3] + str((int(code[-3]) + 1) % 10) + code[-2:]
+    kept, dropped = id_filter.split([read(dropped_digit), read(corrupt)])
+    # A wrong-shape near miss is kept so it's reported with its suggestion;
+    # a corrupt read is still dropped, but names the label it came from
+    assert kept == [dict(read(dropped_digit), suggestion=code)]
+    assert dropped == [dict(read(corrupt), suggestion=code, filtered='check')]
+
+
+def test_pickled_filter_leaves_the_near_miss_index_behind():
+    id_filter = IdFilter.from_barcodes(AMAZON_IDS, near_miss=NearMissIndex(AMAZON_IDS))
+    copy = pickle.loads(pickle.dumps(id_filter))
+    assert copy.near_miss is None
+    assert copy.prefixes == id_filter.prefixes
@@ -0,0 +1,93 @@
+"""Unit tests for ScanStore group commit, clearing, failures and shared ledgers"""
+
+import sqlite3
+
+from scanner_core import store as store_module
+from scanner_core.ledger import ScanLedger
+from scanner_core.store import (
+    ScanStore, link_manifest, manifest_digest, release_ledger, resolve_manifest, shared_ledger
+)
+
+VALID_IDS = {f"TBA{i:012d}" for i in range(100)}
+
+
+def test_manifest_digest_ignores_order():
+    assert manifest_digest(['B', 'A']) == manifest_digest(['A', 'B'])
+    assert manifest_digest(['A']) != manifest_digest(['A', 'B'])
+
+
+def test_events_are_group_committed(tmp_path):
+    store = ScanStore('manifest', str(tmp_path / 'scans.db'), flush_interval=0.05)
+    ledger = ScanLedger(store)
+    for code in sorted(VALID_IDS):
+        ledger.record(code, VALID_IDS)
+    store.flush()
+    try:
+        assert store.written == len(VALID_IDS)
+        assert store.commits < len(VALID_IDS)
+        assert [event['barcode'] for event in store.load()] == sorted(VALID_IDS)
+    finally:
+        store.close()
+
+
+def test_clear_deletes_only_this_manifest(tmp_path):
+    path = str(tmp_path / 'scans.db')
+    first, second = ScanLedger(ScanStore('first', path)), ScanLedger(ScanStore('second', path))
+    first.record('TBA000000000001', VALID_IDS)
+    second.record('TBA000000000001', VALID_IDS)
+    first.clear()
+    first.record('TBA000000000002', VALID_IDS)
+    first.close()
+    second.close()
+
+    assert [event['barcode'] for event in ScanStore('first', path).load()] == ['TBA000000000002']
+    assert len(ScanStore('second', path).load()) == 1
+
+
+def test_failed_commits_are_retried_and_flush_returns(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, 'RETRY_MIN_SECONDS', 0.01)
+    store = ScanStore('manifest', str(tmp_path / 'scans.db'), flush_interval=0.01)
+    commit = store._commit
+    failures = []
+
+    def flaky_commit(connection, items):
+        if len(failures) < 2:
+            failures.append(1)
+            raise sqlite3.OperationalError('database is locked')
+        commit(connection, items)
+
+    monkeypatch.setattr(store, '_commit', flaky_commit)
+    ledger = ScanLedger(store)
+    ledger.record('TBA000000000001', VALID_IDS)
+    store.flush()  # returns although the first commit failed
+    assert store.failures >= 1
+    store.close()
+    assert store.last_error is None
+    assert store.written == 1
+    assert len(store.load()) == 1
+
+
+def test_shared_ledger_is_released_by_its_last_user(tmp_path):
+    path = str(tmp_path / 'scans.db')
+    first = shared_ledger(VALID_IDS, path)
+    second = shared_ledger(set(VALID_IDS), path)
+    assert first is second
+
+    release_ledger(first)
+    assert first.store._thread.is_alive()
+    release_ledger(second)
+    assert not first.store._thread.is_alive()
+    assert shared_ledger(VALID_IDS, path) is not first
+    release_ledger(ScanLedger())  # not shared: ignored
+
+
+def test_linked_revision_resumes_the_same_ledger(tmp_path):
+    path = str(tmp_path / 'scans.db')
+    ledger = shared_ledger(VALID_IDS, path)
+    revision = VALID_IDS | {'TBA999999999999'}
+    link_manifest(revision, ledger)
+    ledger.store.flush()
+    assert shared_ledger(revision, path) is ledger
+    assert resolve_manifest(manifest_digest(revision), path) == manifest_digest(VALID_IDS)
+    release_ledger(ledger)
+    release_ledger(ledger)
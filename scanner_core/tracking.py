@@ -0,0 +1,106 @@
+"""
+Region-of-interest tracking for the live camera path.
+
+After a successful read the label almost always stays in the same place for
+the next few frames, so RoiTracker decodes only a padded crop around the last
+barcode rectangles. It falls back to a full-frame scan every
+`full_scan_every` frames or after `max_misses` empty crops in a row.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .decoder import LIVE_MAX_WIDTH, ResizeBuffer, detect_barcodes_scaled
+
+
+class RoiTracker:
+    """Decode function that remembers where the last barcodes were"""
+
+    def __init__(self, full_decode: Optional[Callable] = None,
+                 roi_decode: Optional[Callable] = None,
+                 padding: float = 0.5, min_padding: int = 24,
+                 max_misses: int = 3, full_scan_every: int = 15):
+        # Both default to a downscaled decode into one preallocated buffer;
+        # the tracker is only ever called from a single decode thread
+        self.buffer = ResizeBuffer()
+        self.max_width = LIVE_MAX_WIDTH  # analysis width of the default decoders
+        self.id_filter = None            # IdFilter applied by the default decoders
+        self.full_decode = full_decode or self._decode_scaled  # used on the whole frame
+        self.roi_decode = roi_decode or self._decode_scaled    # used on the crop
+        self.padding = padding            # fraction of the box's long side added around it
+        self.min_padding = min_padding    # pixels
+        self.max_misses = max_misses
+        self.full_scan_every = full_scan_every
+
+        self.roi: Optional[Tuple[int, int, int, int]] = None  # x0, y0, x1, y1
+        self.misses = 0
+        self.frames_since_full = 0
+
+        # Counters, for diagnostics
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.roi_hits = 0
+
+    def _decode_scaled(self, frame) -> List[Dict]:
+        id_filter = self.id_filter
+        if id_filter is None:
+            return detect_barcodes_scaled(frame, self.max_width, buffer=self.buffer)
+        # Filter before tracking, so the ROI never locks onto a code we'd discard
+        return id_filter(detect_barcodes_scaled(frame, self.max_width, buffer=self.buffer,
+                                                symbols=id_filter.symbologies))
+
+    def reset(self):
+        """Forget the tracked region; the next frame gets a full scan"""
+        self.roi = None
+        self.misses = 0
+        self.frames_since_full = 0
+
+    def __call__(self, frame) -> List[Dict]:
+        if self.roi is not None and self.frames_since_full < self.full_scan_every:
+            self.frames_since_full += 1
+            detected = self._decode_roi(frame)
+            if detected:
+                self.misses = 0
+                self.roi_hits += 1
+                self._track(detected, frame.shape)
+                return detected
+            self.misses += 1
+            if self.misses < self.max_misses:
+                return detected
+
+        # Full-frame scan: periodic refresh, lost track, or nothing tracked yet
+        self.full_scans += 1
+        self.frames_since_full = 0
+        self.misses = 0
+        detected = self.full_decode(frame)
+        if detected:
+            self._track(detected, frame.shape)
+        else:
+            self.roi = None
+        return detected
+
+    def _decode_roi(self, frame) -> List[Dict]:
+        self.roi_scans += 1
+        x0, y0, x1, y1 = self.roi
+        detected = self.roi_decode(frame[y0:y1, x0:x1])
+
+        # Shift locations back into full-frame coordinates
+        for barcode_info in detected:
+            x, y, w, h = barcode_info['location']
+            barcode_info['location'] = (x + x0, y + y0, w, h)
+        return detected
+
+    def _track(self, detected: List[Dict], shape):
+        """Set the ROI to the padded union of the detected rectangles"""
+        height, width = shape[:2]
+        x0 = min(b['location'][0] for b in detected)
+        y0 = min(b['location'][1] for b in detected)
+        x1 = max(b['location'][0] + b['location'][2] for b in detected)
+        y1 = max(b['location'][1] + b['location'][3] for b in detected)
+
+        # 1D barcodes can come back only a few pixels tall, so pad both axes
+        # by the long side
+        pad = max(int(max(x1 - x0, y1 - y0) * self.padding), self.min_padding)
+        self.roi = (
+            max(x0 - pad, 0), max(y0 - pad, 0),
+            min(x1 + pad, width), min(y1 + pad, height)
+        )
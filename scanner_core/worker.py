@@ -0,0 +1,98 @@
+"""
+Background decoding for the live camera path.
+
+The WebRTC callback hands frames to a DecodeWorker through a single-slot
+"latest frame wins" mailbox: submitting a new frame replaces any frame that
+is still waiting, so stale frames are dropped instead of queued and decode
+latency stays bounded by one decode time. Results are delivered to a
+callback on the worker thread. A frame that fails to decode is logged and
+counted (`errors`, `last_error`) without stopping the worker.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .decoder import detect_barcodes_scaled
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeWorker:
+    """Decodes the most recently submitted frame on a daemon thread"""
+
+    def __init__(self, on_result: Callable[[List[Dict], float], None],
+                 decode: Callable = detect_barcodes_scaled,
+                 name: str = "barcode-decoder"):
+        self._decode = decode
+        self._on_result = on_result
+        self._cond = threading.Condition()
+        self._frame = None
+        self._submitted_at = 0.0
+        self._running = True
+
+        # Counters, read without locking for display
+        self.submitted = 0
+        self.dropped = 0
+        self.decoded = 0
+        self.last_latency = 0.0  # submit -> result, seconds
+        self.busy = False
+        self.errors = 0
+        self.last_error: Optional[str] = None  # most recent decode/callback failure
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame) -> None:
+        """Offer a frame for decoding; replaces any frame not yet picked up"""
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._submitted_at = time.perf_counter()
+            self.submitted += 1
+            self._cond.notify()
+
+    @property
+    def depth(self) -> int:
+        """Frames waiting or being decoded (0-2)"""
+        return (self._frame is not None) + self.busy
+
+    @property
+    def idle(self) -> bool:
+        """True when nothing is waiting and no decode is in progress"""
+        return self._frame is None and not self.busy
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        """Stop the worker thread, discarding any pending frame"""
+        with self._cond:
+            self._running = False
+            self._frame = None
+            self._cond.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._frame is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, submitted_at = self._frame, self._submitted_at
+                self._frame = None
+                self.busy = True
+
+            try:
+                detections = self._decode(frame)
+                self.decoded += 1
+                self.last_latency = time.perf_counter() - submitted_at
+                self._on_result(detections, submitted_at)
+            except Exception as e:
+                # Keep the worker alive; a bad frame must not stop scanning
+                logger.exception("Decode worker error")
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                self.busy = False
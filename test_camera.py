@@ -1,107 +1,324 @@
 #!/usr/bin/env python3
 """
-Quick camera performance test for the barcode scanner app
-Run this to test your camera before using the main app
+🚀 CAMERA + DECODE PROFILER
+===========================
+
+Profile the whole scanning pipeline per frame - capture, convert, resize,
+decode, classify - and report p50/p95/p99 latency and sustained FPS.
+Non-interactive, so it also runs in automation.
+
+Usage:
+   python test_camera.py                                  # camera 0, 10 s, live pipeline
+   python test_camera.py --source 1 --duration 30         # another camera, longer run
+   python test_camera.py --source clip.mp4 --variants current full_res bgr
+   python test_camera.py --source "snapshots/*.jpg" -o profile.json
+   python test_camera.py --source synthetic --variants all -o -   # JSON to stdout
+
+Sources: a camera index, a video file, an image directory or glob, or
+'synthetic' (labelled images from scanner_core/synthetic.py, whose codes are
+also used as the manifest). Variants run one after another on the same
+source for --duration seconds each.
 """
 
-import cv2
-import time
+import argparse
+import glob
+import json
+import os
+import platform
 import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+STAGES = ('capture', 'convert', 'resize', 'decode', 'classify')
+
+# name -> how a frame is handled after capture:
+#   gray    - decode the luma plane (the live path) instead of BGR
+#   width   - analysis width; None decodes at full resolution
+#   decoder - 'roi' (RoiTracker, the live path), 'full' or 'cascade'
+VARIANTS: Dict[str, Dict] = {
+    'current': {'gray': True, 'width': 640, 'decoder': 'roi'},
+    'no_roi': {'gray': True, 'width': 640, 'decoder': 'full'},
+    'width_480': {'gray': True, 'width': 480, 'decoder': 'roi'},
+    'width_960': {'gray': True, 'width': 960, 'decoder': 'roi'},
+    'full_res': {'gray': True, 'width': None, 'decoder': 'full'},
+    'bgr': {'gray': False, 'width': 640, 'decoder': 'full'},
+    'cascade': {'gray': True, 'width': None, 'decoder': 'cascade'},
+}
+
+
+class FrameSource:
+    """Frames from a camera, a video file or a list of images"""
+
+    def __init__(self, kind: str, description: str, capture=None, images=None, manifest=None):
+        self.kind = kind
+        self.description = description
+        self.capture = capture          # cv2.VideoCapture for cameras and videos
+        self.images = images or []      # preloaded frames for image and synthetic sources
+        self.manifest = manifest or set()
+        self._index = 0
+
+    def read(self):
+        """Next frame, or None if the source failed; files loop forever"""
+        if self.capture is not None:
+            ok, frame = self.capture.read()
+            if not ok and self.kind == 'video':
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self.capture.read()
+            return frame if ok else None
+        if not self.images:
+            return None
+        frame = self.images[self._index % len(self.images)]
+        self._index += 1
+        return frame
+
+    def rewind(self):
+        self._index = 0
+        if self.kind == 'video':
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def properties(self) -> Dict:
+        if self.kind == 'camera' or self.kind == 'video':
+            return {
+                'width': int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'fps': self.capture.get(cv2.CAP_PROP_FPS),
+            }
+        if self.images:
+            height, width = self.images[0].shape[:2]
+            return {'width': width, 'height': height, 'frames': len(self.images)}
+        return {}
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+
+
+def open_source(spec: str, synthetic_frames: int = 48, seed: int = 0) -> Optional[FrameSource]:
+    """Open a camera index, video file, image directory/glob or 'synthetic'"""
+    if spec.isdigit():
+        capture = cv2.VideoCapture(int(spec))
+        if not capture.isOpened():
+            return None
+        return FrameSource('camera', f"camera {spec}", capture=capture)
+
+    if spec == 'synthetic':
+        from scanner_core.synthetic import DISTORTIONS, SYMBOLOGIES, generate_corpus
+
+        per_class = max(1, synthetic_frames // (len(DISTORTIONS) * len(SYMBOLOGIES)))
+        # Camera frames are BGR; the samples are grayscale
+        samples = list(generate_corpus(per_class, seed))
+        images = [cv2.cvtColor(sample.image, cv2.COLOR_GRAY2BGR) for sample in samples]
+        return FrameSource('synthetic', f"synthetic ({len(images)} images, seed {seed})",
+                           images=images, manifest={sample.text for sample in samples})
+
+    if os.path.splitext(spec)[1].lower() in VIDEO_EXTENSIONS:
+        capture = cv2.VideoCapture(spec)
+        if not capture.isOpened():
+            return None
+        return FrameSource('video', spec, capture=capture)
+
+    pattern = os.path.join(spec, '*') if os.path.isdir(spec) else spec
+    paths = sorted(p for p in glob.glob(pattern, recursive=True)
+                   if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+    images = [image for image in (cv2.imread(p) for p in paths) if image is not None]
+    if not images:
+        return None
+    return FrameSource('images', f"{spec} ({len(images)} images)", images=images)
+
+
+def build_decoder(config: Dict) -> Callable:
+    """Decode function for a variant; frames arrive already converted and resized"""
+    from scanner_core import RoiTracker, decode_cascade, detect_barcodes
+
+    if config['decoder'] == 'roi':
+        return RoiTracker(full_decode=detect_barcodes, roi_decode=detect_barcodes)
+    if config['decoder'] == 'cascade':
+        return lambda frame: decode_cascade(frame)['detections']
+    return detect_barcodes
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def summarize(seconds: List[float]) -> Dict:
+    """Latency summary in milliseconds"""
+    values = sorted(seconds)
+    return {
+        'mean_ms': sum(values) / len(values) * 1000 if values else 0.0,
+        'p50_ms': percentile(values, 0.50) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+    }
+
+
+def profile_variant(source: FrameSource, config: Dict, duration: float,
+                    max_frames: Optional[int] = None) -> Dict:
+    """Run one pipeline variant on `source` for `duration` seconds"""
+    from scanner_core import ScanLedger, classify_detections
+
+    decode = build_decoder(config)
+    ledger = ScanLedger()
+    timings = {stage: [] for stage in STAGES}
+    totals = []
+    statuses: Dict[str, int] = {}
+    hits = 0
+    frames = 0
+
+    source.rewind()
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration and (max_frames is None or frames < max_frames):
+        t0 = time.perf_counter()
+        frame = source.read()
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        if config['gray'] and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t2 = time.perf_counter()
+        width = config['width']
+        if width and frame.shape[1] > width:
+            height = int(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height))
+        t3 = time.perf_counter()
+        detections = decode(frame)
+        t4 = time.perf_counter()
+        classify_detections(detections, source.manifest, ledger)
+        t5 = time.perf_counter()
+
+        for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            timings[stage].append(seconds)
+        totals.append(t5 - t0)
+        frames += 1
+        hits += bool(detections)
+        for detection in detections:
+            statuses[detection['status']] = statuses.get(detection['status'], 0) + 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        'config': config,
+        'frames': frames,
+        'elapsed_sec': elapsed,
+        'fps': frames / elapsed if elapsed else 0.0,
+        'hit_rate': hits / frames if frames else 0.0,
+        'statuses': statuses,
+        'total': summarize(totals),
+        'stages': {stage: summarize(values) for stage, values in timings.items()},
+    }
+
+
+def profile(source: FrameSource, variants: List[str], duration: float,
+            max_frames: Optional[int] = None) -> Dict:
+    """Profile each variant in turn; returns the JSON report"""
+    import numpy as np
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'source': source.description,
+            'kind': source.kind,
+            'properties': source.properties(),
+            'duration_sec': duration,
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'variants': {},
+    }
+    for name in variants:
+        print(f"⏱️  Profiling '{name}' for {duration:g} s...", file=sys.stderr)
+        report['variants'][name] = profile_variant(source, VARIANTS[name], duration, max_frames)
+    return report
+
+
+def print_summary(report: Dict, out=sys.stdout):
+    meta = report['meta']
+    print(f"\n📷 Source: {meta['source']}  {meta['properties']}", file=out)
+    print("\n📊 Performance Results (ms per frame):", file=out)
+    header = f"   {'variant':10s} {'fps':>7s} {'p50':>7s} {'p95':>7s} {'p99':>7s}  " + \
+             ' '.join(f"{stage:>8s}" for stage in STAGES)
+    print(header, file=out)
+    for name, result in report['variants'].items():
+        total = result['total']
+        stages = ' '.join(f"{result['stages'][stage]['p50_ms']:8.2f}" for stage in STAGES)
+        print(f"   {name:10s} {result['fps']:7.1f} {total['p50_ms']:7.1f} {total['p95_ms']:7.1f} "
+              f"{total['p99_ms']:7.1f}  {stages}", file=out)
+    print("   (stage columns are p50)", file=out)
+
+    if meta['kind'] != 'camera':
+        return
+    result = report['variants'].get('current') or next(iter(report['variants'].values()))
+    fps = result['fps']
+    print("\n💡 Recommendations:", file=out)
+    if fps > 20:
+        print("   ✅ Good performance! Camera should work well with the app.", file=out)
+    elif fps > 10:
+        print("   ⚠️  Moderate performance. App will work but may be slightly slow.", file=out)
+        print("   💭 Tips: Close other camera apps, ensure good lighting", file=out)
+    else:
+        print("   ❌ Poor performance. App may be very slow.", file=out)
+        print("   💭 Tips:", file=out)
+        print("      - Use external USB camera if possible", file=out)
+        print("      - Close all other applications", file=out)
+        print("      - Pick the 'Low' capture preset in the app", file=out)
+        print("      - Update camera drivers", file=out)
+
 
 def test_camera_performance():
-    """Test camera performance and provide optimization suggestions"""
+    """Quick check that camera 0 can feed the live pipeline"""
     print("🔍 Testing Camera Performance...")
     print("=" * 50)
-    
-    # Try to open camera
-    cap = cv2.VideoCapture(0)
-    
-    if not cap.isOpened():
+
+    source = open_source('0')
+    if source is None:
         print("❌ ERROR: Could not open camera!")
         print("💡 Try:")
         print("   - Check if camera is being used by another app")
         print("   - Make sure camera drivers are installed")
-        print("   - Try a different camera index (1, 2, etc.)")
+        print("   - Try a different camera index: --source 1")
         return False
-    
-    # Get camera properties
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    print(f"📷 Camera Properties:")
-    print(f"   Resolution: {width}x{height}")
-    print(f"   FPS: {fps}")
-    
-    # Test frame capture speed
-    print(f"\n⏱️  Testing frame capture speed...")
-    
-    frame_times = []
-    test_frames = 30
-    
-    for i in range(test_frames):
-        start_time = time.time()
-        ret, frame = cap.read()
-        end_time = time.time()
-        
-        if ret:
-            frame_times.append(end_time - start_time)
-        else:
-            print(f"❌ Failed to capture frame {i+1}")
-            break
-        
-        # Show progress
-        if (i + 1) % 10 == 0:
-            print(f"   Captured {i+1}/{test_frames} frames...")
-    
-    cap.release()
-    
-    if frame_times:
-        avg_time = sum(frame_times) / len(frame_times)
-        avg_fps = 1 / avg_time if avg_time > 0 else 0
-        
-        print(f"\n📊 Performance Results:")
-        print(f"   Average frame time: {avg_time:.3f} seconds")
-        print(f"   Average FPS: {avg_fps:.1f}")
-        
-        # Performance recommendations
-        print(f"\n💡 Recommendations:")
-        if avg_fps > 20:
-            print("   ✅ Good performance! Camera should work well with the app.")
-        elif avg_fps > 10:
-            print("   ⚠️  Moderate performance. App will work but may be slightly slow.")
-            print("   💭 Tips: Close other camera apps, ensure good lighting")
-        else:
-            print("   ❌ Poor performance. App may be very slow.")
-            print("   💭 Tips:")
-            print("      - Use external USB camera if possible")
-            print("      - Close all other applications")
-            print("      - Restart your computer")
-            print("      - Update camera drivers")
-        
-        return True
-    else:
+
+    try:
+        report = profile(source, ['current'], duration=3.0)
+    except ImportError as e:
+        print(f"❌ Scanner pipeline unavailable: {e}")
+        return False
+    finally:
+        source.release()
+
+    if not report['variants']['current']['frames']:
         print("❌ Could not capture any frames!")
         return False
+    print_summary(report)
+    return True
+
 
 def test_pyzbar():
     """Test if pyzbar can decode barcodes"""
-    print(f"\n🔍 Testing barcode detection...")
-    
+    print("\n🔍 Testing barcode detection...")
+
     try:
         from pyzbar import pyzbar
         print("✅ pyzbar library imported successfully")
-        
+
         # Try to create a simple test
         import numpy as np
-        
+
         # Create a simple test image (this won't actually have a barcode)
         test_image = np.zeros((100, 100, 3), dtype=np.uint8)
         barcodes = pyzbar.decode(test_image)
         print("✅ pyzbar decode function works")
-        
+
         return True
-        
+
     except ImportError as e:
         print(f"❌ pyzbar import failed: {e}")
         print("💡 Install with: pip install pyzbar")
@@ -110,31 +327,60 @@ def test_pyzbar():
         print(f"⚠️  pyzbar test failed: {e}")
         return False
 
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profile capture + decode per frame")
+    parser.add_argument('--source', default='0',
+                        help="Camera index, video file, image directory/glob or 'synthetic'")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per variant")
+    parser.add_argument('--max-frames', type=int, help="Stop each variant after this many frames")
+    parser.add_argument('--variants', nargs='+', default=['current'],
+                        choices=list(VARIANTS) + ['all'], help="Pipelines to compare")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic source")
+    parser.add_argument('-o', '--output', help="Write the JSON report here ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    # With JSON on stdout, everything human-readable goes to stderr
+    out = sys.stderr if args.output == '-' else sys.stdout
+    variants = list(VARIANTS) if 'all' in args.variants else args.variants
+
+    print("🚀 Barcode Scanner - Capture + Decode Profiler", file=out)
+    print("=" * 50, file=out)
+
+    try:
+        import scanner_core.decoder  # noqa: F401  (pulls in pyzbar and the zbar library)
+    except ImportError as e:
+        print(f"❌ Scanner pipeline unavailable: {e}", file=out)
+        print("💡 Install with: pip install -r requirements.txt (and the zbar library)", file=out)
+        return 1
+
+    source = open_source(args.source, seed=args.seed)
+    if source is None:
+        print(f"❌ ERROR: Could not open source '{args.source}'!", file=out)
+        if args.source.isdigit():
+            print("💡 Check that no other app is using the camera, or try another index", file=out)
+        return 1
+
+    try:
+        report = profile(source, variants, args.duration, args.max_frames)
+    finally:
+        source.release()
+
+    if not any(result['frames'] for result in report['variants'].values()):
+        print("❌ Could not capture any frames!", file=out)
+        return 1
+
+    print_summary(report, out)
+    if args.output == '-':
+        print(json.dumps(report, indent=2))
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\n💾 Report written to {args.output}", file=out)
+    print("=" * 50, file=out)
+    return 0
+
+
 if __name__ == "__main__":
-    print("🚀 Barcode Scanner - Camera Performance Test")
-    print("=" * 50)
-    
-    # Test camera
-    camera_ok = test_camera_performance()
-    
-    # Test pyzbar
-    pyzbar_ok = test_pyzbar()
-    
-    # Summary
-    print("\n" + "=" * 50)
-    print("📋 SUMMARY:")
-    
-    if camera_ok and pyzbar_ok:
-        print("🎉 All tests passed! Your setup should work well.")
-        print("\n🚀 Ready to run the barcode scanner app!")
-        print("   Command: streamlit run app.py")
-    else:
-        print("⚠️  Some issues detected. Check the recommendations above.")
-        if not camera_ok:
-            print("   📷 Camera issues found")
-        if not pyzbar_ok:
-            print("   📦 Barcode detection library issues found")
-    
-    print("=" * 50)
-    
-    input("\nPress Enter to exit...")
+    sys.exit(main())